@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: batch.py
+Description: Batch entrypoint running scripted conversations from JSONL through the planner.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • CLI over health_wellness_agent.batch: --concurrency, --resume, --fake (offline model)
+# • Results appended to the output JSONL as each conversation finishes
+# • Throughput / latency report printed at the end (and optionally saved as JSON)
+#
+# Usage:
+#   python batch.py conversations.jsonl -o results.jsonl --concurrency 32 --resume
+#   input lines look like {"id": "c1", "uid": 7, "turns": ["I want to lose 5kg in 2 months", "make me a meal plan"]}
+
+import argparse, asyncio, json, os, sys, warnings
+from dotenv import load_dotenv
+
+warnings.filterwarnings("ignore", category=DeprecationWarning, module="pydantic")
+
+from agents import RunConfig
+from health_wellness_agent.agent import get_planner_agent
+from health_wellness_agent.answer_cache import AnswerCache
+from health_wellness_agent.batch import BatchRunner, completed_ids, read_conversations
+from health_wellness_agent.fanout import SpecialistFanOut, install as install_fanout
+from health_wellness_agent.fast_path import FastPathRouter
+from health_wellness_agent.guardrails import SafetyClassifier
+from health_wellness_agent.profiling import TurnProfiler
+from health_wellness_agent.tools.plan_cache import warm_in_background
+
+async def main() -> int:
+    load_dotenv()                               # needs OPENAI_API_KEY unless --fake
+    parser = argparse.ArgumentParser(description="Run scripted conversations in bulk")
+    parser.add_argument("input", help="JSONL of {id?, uid, name?, turns: [...]}")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("HWA_BATCH_CONCURRENCY", "16")))
+    parser.add_argument("--resume", action="store_true", help="skip ids already finished in --output")
+    parser.add_argument("--fake", action="store_true", help="use the offline scripted model")
+    parser.add_argument("--no-fast-path", action="store_true")
+    parser.add_argument("--answer-cache", action="store_true", help="share answers to general questions")
+    parser.add_argument("--report", help="also write the summary here as JSON")
+    parser.add_argument("--progress", type=int, default=100, help="print progress every N conversations")
+    args = parser.parse_args()
+
+    if args.fake:
+        from health_wellness_agent.models.fake import FakeModelProvider
+        run_config = RunConfig(model_provider=FakeModelProvider(), tracing_disabled=True)
+    else:
+        from health_wellness_agent.models.access import ModelAccessProvider, ModelPolicy
+        run_config = RunConfig(model_provider=ModelAccessProvider(policy=ModelPolicy.from_env()))
+
+    skip = completed_ids(args.output) if args.resume else set()
+    if skip:
+        print(f"[Batch] resuming: {len(skip)} conversations already done")
+    fanout = SpecialistFanOut(run_config=run_config)
+    install_fanout(fanout)                      # consult_specialists uses the same models
+    runner = BatchRunner(
+        get_planner_agent(),
+        concurrency=args.concurrency,
+        run_config=run_config,
+        fast_path=None if args.no_fast_path else FastPathRouter(),
+        guardrails=[SafetyClassifier().guardrail()],
+        answer_cache=AnswerCache() if args.answer_cache else None,
+        fanout=fanout,
+        profiler=TurnProfiler(),                # off unless HWA_PROFILE_EVERY / _UIDS is set
+    )
+    warm_in_background()
+    with open(args.output, "a" if args.resume else "w", encoding="utf-8") as out:
+        report = await runner.run(read_conversations(args.input), out, skip, args.progress)
+
+    summary = report.summary()
+    print(json.dumps(summary, indent=2))
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2)
+    return 1 if report.errors else 0
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    try:
+        sys.exit(asyncio.run(main()))
+    except KeyboardInterrupt:
+        print("\n[Batch] interrupted — rerun with --resume to continue")
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: bench_cluster.py
+Description: Multi-process scaling benchmark — offline (FakeModel) chat turns through the
+Supervisor with 1, 2, … N uid-sharded workers, to check throughput grows with cores.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • A worker factory serving ChatServer on the scripted offline model (no network, CPU-bound
+#   tool turns: meal and workout plans), against a throwaway SQLite session store
+# • Fixed-concurrency SSE load over many uids through the supervisor's front door
+# • Turns/s and speed-up per worker count, saved as JSON in benchmarks/results
+#
+# Usage:
+#   python benchmarks/bench_cluster.py [--workers 1,2,4] [--turns 600] [--concurrency 32]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(ROOT))
+
+from agents import RunConfig  # noqa: E402
+
+from health_wellness_agent.agent import get_planner_agent  # noqa: E402
+from health_wellness_agent.cluster import Supervisor  # noqa: E402
+from health_wellness_agent.models.fake import FakeModelProvider  # noqa: E402
+from health_wellness_agent.server import ChatServer, ServerConfig  # noqa: E402
+from health_wellness_agent.session_store import SessionStore, SQLiteBackend  # noqa: E402
+
+PROMPTS = ("make me a meal plan", "suggest a workout", "log my weight", "how do I stay motivated?")
+
+
+def fake_worker(spec, shard):
+    """Worker factory (module-level so spawned processes can unpickle it)."""
+    store = SessionStore(SQLiteBackend(os.environ["HWA_BENCH_DB"]))
+    return ChatServer(
+        get_planner_agent(),
+        store,
+        ServerConfig(host=spec.host, port=spec.port, max_concurrent_turns=256),
+        run_config=RunConfig(model_provider=FakeModelProvider(), tracing_disabled=True),
+        shard=shard,
+    )
+
+
+async def _turn(port: int, uid: int, message: str) -> bool:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"message": message}).encode()
+    writer.write(f"POST /sessions/{uid}/messages HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                 + body)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    return raw.startswith(b"HTTP/1.1 200") and b"event: error" not in raw
+
+
+async def run_load(port: int, turns: int, concurrency: int, users: int) -> Dict[str, float]:
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(turns):
+        queue.put_nowait(i)
+    latencies: List[float] = []
+    errors = 0
+
+    async def client() -> None:
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            started = time.perf_counter()
+            ok = await _turn(port, i % users, PROMPTS[i % len(PROMPTS)])
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "turns": turns,
+        "errors": errors,
+        "throughput_tps": round(turns / elapsed, 1),
+        "turn_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "turn_p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 1),
+    }
+
+
+async def bench(args: argparse.Namespace) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    for n in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            os.environ["HWA_BENCH_DB"] = os.path.join(tmp, "sessions.db")
+            supervisor = Supervisor(fake_worker, workers=n, port=args.port, base_port=args.port + 1)
+            await supervisor.start()
+            try:
+                await run_load(args.port, min(args.turns, 50), args.concurrency, args.users)   # warm-up
+                row = await run_load(args.port, args.turns, args.concurrency, args.users)
+                row["restarts"] = supervisor.stats["restarts"]
+            finally:
+                await supervisor.close()
+        base = next(iter(results.values()), row)["throughput_tps"]
+        row["speedup"] = round(row["throughput_tps"] / base, 2) if base else 0.0
+        results[str(n)] = row
+        print(f"workers={n:<3} tps={row['throughput_tps']:<8} speed-up={row['speedup']:<5}"
+              f" p50/p99 = {row['turn_p50_ms']}/{row['turn_p99_ms']} ms  errors={row['errors']}")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Multi-process scaling benchmark")
+    parser.add_argument("--workers", type=lambda s: [int(x) for x in s.split(",")],
+                        default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--turns", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8390)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "cluster_latest.json")
+    args = parser.parse_args()
+    args.workers = sorted(set(args.workers))
+
+    results = asyncio.run(bench(args))
+    payload = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(payload, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: bench_model_access.py
+Description: Model-access benchmark — streamed turns against the fault-injecting stand-in server,
+plain OpenAI provider vs ModelAccessProvider (pooling, rate limits, jittered retries, hedging).
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • A fixed-concurrency load of streamed single-agent turns through Runner.run_streamed
+# • Time-to-first-token and turn latency percentiles, error counts and access-layer stats
+# • JSON results in benchmarks/results (same layout as the other benchmarks)
+#
+# Usage:
+#   python benchmarks/bench_model_access.py [--turns 400] [--concurrency 16] [--rate-limit 0.05]
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+sys.path.insert(0, str(ROOT))
+
+from agents import Agent, OpenAIProvider, RunConfig, Runner  # noqa: E402
+from openai import AsyncOpenAI  # noqa: E402
+
+from health_wellness_agent.models.access import ModelAccessProvider, ModelPolicy, pooled_client  # noqa: E402
+from health_wellness_agent.models.standin import Faults, StandInServer  # noqa: E402
+
+
+def _pct(samples: List[float], p: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))] if ordered else 0.0
+
+
+async def run_load(provider, turns: int, concurrency: int) -> Dict[str, float]:
+    agent = Agent(name="Bench", instructions="Answer briefly.", model="gpt-4o-mini")
+    config = RunConfig(model_provider=provider, tracing_disabled=True)
+    ttft: List[float] = []
+    total: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(turns):
+        queue.put_nowait(i)
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            first = None
+            try:
+                result = Runner.run_streamed(agent, "How often should I train?", run_config=config)
+                async for event in result.stream_events():
+                    if first is None and event.type == "raw_response_event" \
+                            and getattr(event.data, "type", "") == "response.output_text.delta":
+                        first = time.perf_counter() - started
+            except Exception:
+                errors += 1
+                continue
+            ttft.append(first or 0.0)
+            total.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "turns": turns,
+        "errors": errors,
+        "throughput_tps": round(len(total) / elapsed, 1),
+        **{f"ttft_p{int(p * 100)}_ms": round(_pct(ttft, p) * 1000, 1) for p in (0.5, 0.95, 0.99)},
+        **{f"turn_p{int(p * 100)}_ms": round(_pct(total, p) * 1000, 1) for p in (0.5, 0.95, 0.99)},
+    }
+
+
+async def bench(args: argparse.Namespace) -> Dict[str, dict]:
+    results: Dict[str, dict] = {}
+    faults = Faults(latency_median=args.latency, slow_rate=args.slow_rate, slow_extra=args.slow_extra,
+                    rate_limit=args.rate_limit, retry_after=args.retry_after)
+
+    server = await StandInServer(faults).start()
+    plain = OpenAIProvider(openai_client=AsyncOpenAI(base_url=server.base_url, api_key="standin"))
+    results["plain"] = {**await run_load(plain, args.turns, args.concurrency), "server": dict(server.stats)}
+    await server.stop()
+
+    server = await StandInServer(faults).start()
+    managed = ModelAccessProvider(
+        base=OpenAIProvider(openai_client=pooled_client(server.base_url, "standin")),
+        policy=ModelPolicy(rate=args.rps, burst=args.concurrency * 2),
+    )
+    results["managed"] = {
+        **await run_load(managed, args.turns, args.concurrency),
+        "server": dict(server.stats),
+        "access": managed.stats(),
+    }
+    await server.stop()
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Model-access layer benchmark")
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rps", type=float, default=500.0, help="managed token-bucket rate")
+    parser.add_argument("--latency", type=float, default=0.08)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-extra", type=float, default=1.0)
+    parser.add_argument("--rate-limit", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.05)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "model_access_latest.json")
+    args = parser.parse_args()
+
+    logging.getLogger("openai.agents").setLevel(logging.CRITICAL)   # one line per 429 otherwise
+    results = asyncio.run(bench(args))
+
+    payload = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(payload, indent=2))
+
+    for name, row in results.items():
+        print(f"{name:<8} errors={row['errors']:<4} tps={row['throughput_tps']:<7}"
+              f" ttft p50/p95/p99 = {row['ttft_p50_ms']}/{row['ttft_p95_ms']}/{row['ttft_p99_ms']} ms"
+              f"  conns={row['server']['connections']}")
+    for model, stats in results["managed"]["access"].items():
+        print(f"  {model}: {stats}")
+    print(f"\nresults → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: bench_overhead.py
+Description: Offline framework-overhead benchmarks for PlannerAgent turns, driven by the
+deterministic FakeModel so no network or API key is needed.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Per-turn overhead, per-tool dispatch cost, handoff cost and streaming throughput
+# • JSON results file plus a --baseline comparison that fails on regressions
+#
+# Usage:
+#   python benchmarks/bench_overhead.py                       # writes benchmarks/results/latest.json
+#   python benchmarks/bench_overhead.py --baseline benchmarks/results/baseline.json
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from agents import RunConfig, Runner
+
+from health_wellness_agent.agent import PlannerAgent
+from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.hooks import TraceCollector, TracingRunHooks
+from health_wellness_agent.models.fake import (
+    DEFAULT_SCRIPT, FakeModel, FakeModelProvider, ScriptRule, ScriptStep,
+)
+from health_wellness_agent.utils.streaming import stream_deltas
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+TOOL_PROMPTS = {
+    "goal_analyzer": "I want to lose 5 kg",
+    "meal_planner": "make me a meal plan",
+    "workout_recommender": "suggest a workout",
+    "scheduler": "remind me on monday",
+    "tracker": "log my weight",
+}
+HANDOFF_PROMPTS = {
+    "InjurySupportAgent": "my knee has pain",
+    "NutritionExpertAgent": "I am diabetic",
+}
+
+
+def _summary(samples_ns: List[int]) -> Dict[str, float]:
+    us = sorted(s / 1_000 for s in samples_ns)
+    return {
+        "n": len(us),
+        "mean_us": round(statistics.fmean(us), 2),
+        "p50_us": round(us[len(us) // 2], 2),
+        "p95_us": round(us[min(len(us) - 1, int(len(us) * 0.95))], 2),
+    }
+
+
+async def _time_turns(make_turn: Callable, iterations: int, warmup: int) -> List[int]:
+    for _ in range(warmup):
+        await make_turn()
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter_ns()
+        await make_turn()
+        samples.append(time.perf_counter_ns() - t0)
+    return samples
+
+
+async def run_suite(iterations: int, warmup: int) -> Dict[str, dict]:
+    run_config = RunConfig(model_provider=FakeModelProvider(), tracing_disabled=True)
+    agent = PlannerAgent()
+
+    def turn(prompt: str, hooks=None) -> Callable:
+        async def _go():
+            ctx = UserSessionContext(name="bench", uid=1)
+            await Runner.run(agent, prompt, context=ctx, run_config=run_config, hooks=hooks)
+        return _go
+
+    async def dispatch(prompt: str, kind: str, matches: Callable[[str], bool]) -> Dict[str, float]:
+        """The tool call / handoff itself, from the hooks' spans (a separate, traced pass)."""
+        collector = TraceCollector(capacity=16 * (iterations + warmup))     # several spans per turn
+        await _time_turns(turn(prompt, TracingRunHooks(collector)), iterations, warmup)
+        spans = [s for s in collector.spans if s.kind == kind and matches(s.name)]
+        return _summary([s.end_ns - s.start_ns for s in spans[-iterations:]])
+
+    results: Dict[str, dict] = {}
+    results["turn.text"] = _summary(await _time_turns(turn("hello"), iterations, warmup))
+
+    for tool, prompt in TOOL_PROMPTS.items():
+        samples = await _time_turns(turn(prompt), iterations, warmup)
+        results[f"turn.tool.{tool}"] = _summary(samples)
+        results[f"dispatch.tool.{tool}"] = await dispatch(prompt, "tool", tool.__eq__)
+    for target, prompt in HANDOFF_PROMPTS.items():
+        samples = await _time_turns(turn(prompt), iterations, warmup)
+        results[f"turn.handoff.{target}"] = _summary(samples)
+        results[f"dispatch.handoff.{target}"] = await dispatch(
+            prompt, "handoff", lambda name, t=target: name.endswith(f"->{t}")
+        )
+
+    # Streaming throughput: one long reply, one word per delta.
+    words = 2_000
+    long_script = (ScriptRule(r".*", (ScriptStep("word " * words),)),) + DEFAULT_SCRIPT
+    stream_config = RunConfig(
+        model_provider=FakeModelProvider(FakeModel(script=long_script)),
+        tracing_disabled=True,
+    )
+    rates = []
+    for i in range(warmup + max(1, iterations // 10)):
+        ctx = UserSessionContext(name="bench", uid=1)
+        t0 = time.perf_counter()
+        n = 0
+        async for kind, _ in stream_deltas(agent, "stream", ctx, stream_config):
+            n += kind == "delta"
+        if i >= warmup:
+            rates.append(n / (time.perf_counter() - t0))
+    results["stream.throughput"] = {
+        "deltas_per_turn": words,
+        "deltas_per_s": round(statistics.median(rates), 1),
+    }
+    return results
+
+
+def compare(current: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Return human-readable regressions beyond `threshold` (fractional)."""
+    problems = []
+    for key, cur in current.items():
+        old = baseline.get(key)
+        if not old:
+            continue
+        if "p50_us" in cur and "p50_us" in old and old["p50_us"] > 0:
+            change = cur["p50_us"] / old["p50_us"] - 1
+            if change > threshold:
+                problems.append(f"{key}: p50 {old['p50_us']}µs → {cur['p50_us']}µs (+{change:.0%})")
+        if "deltas_per_s" in cur and "deltas_per_s" in old and old["deltas_per_s"] > 0:
+            change = 1 - cur["deltas_per_s"] / old["deltas_per_s"]
+            if change > threshold:
+                problems.append(
+                    f"{key}: {old['deltas_per_s']}/s → {cur['deltas_per_s']}/s (-{change:.0%})"
+                )
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Offline PlannerAgent overhead benchmarks")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "latest.json")
+    parser.add_argument("--baseline", type=Path, help="fail if slower than this results file")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown")
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+    results = asyncio.run(run_suite(args.iterations, args.warmup))
+
+    payload = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": args.iterations,
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(payload, indent=2))
+
+    width = max(len(k) for k in results)
+    for key, row in results.items():
+        print(f"{key:<{width}}  " + "  ".join(f"{k}={v}" for k, v in row.items()))
+    print(f"\nresults → {args.output}")
+
+    if args.baseline:
+        problems = compare(results, json.loads(args.baseline.read_text())["results"], args.threshold)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
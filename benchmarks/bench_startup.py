@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: bench_startup.py
+Description: Cold-start benchmark — import time, agent-graph construction and first-turn
+readiness, each measured in a fresh interpreter.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Fresh-subprocess timing of each startup stage (median over --runs)
+# • The slowest modules from `python -X importtime`
+# • JSON results plus --baseline regression check (same format as bench_overhead)
+#
+# Usage:
+#   python benchmarks/bench_startup.py [--runs 7] [--baseline benchmarks/results/startup_baseline.json]
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# Each stage runs in its own interpreter and prints its elapsed seconds.
+_PRELUDE = "import time, sys; t0 = time.perf_counter()\n"
+STAGES: Dict[str, str] = {
+    "import.package": "import health_wellness_agent",
+    "import.context": "import health_wellness_agent.context",
+    "import.fast_path": "import health_wellness_agent.fast_path",
+    "import.agent": "import health_wellness_agent.agent",
+    "ready.agent_graph": (
+        "from health_wellness_agent.agent import get_planner_agent\n"
+        "get_planner_agent()"
+    ),
+    "ready.first_turn": (
+        "import asyncio\n"
+        "from agents import RunConfig, Runner\n"
+        "from health_wellness_agent.agent import get_planner_agent\n"
+        "from health_wellness_agent.context import UserSessionContext\n"
+        "from health_wellness_agent.models.fake import FakeModelProvider\n"
+        "rc = RunConfig(model_provider=FakeModelProvider(), tracing_disabled=True)\n"
+        "asyncio.run(Runner.run(get_planner_agent(), 'log my weight',\n"
+        "    context=UserSessionContext(name='b', uid=1), run_config=rc))"
+    ),
+    "ready.first_handoff": (
+        "import asyncio\n"
+        "from agents import RunConfig, Runner\n"
+        "from health_wellness_agent.agent import get_planner_agent\n"
+        "from health_wellness_agent.context import UserSessionContext\n"
+        "from health_wellness_agent.models.fake import FakeModelProvider\n"
+        "rc = RunConfig(model_provider=FakeModelProvider(), tracing_disabled=True)\n"
+        "asyncio.run(Runner.run(get_planner_agent(), 'my knee has pain',\n"
+        "    context=UserSessionContext(name='b', uid=1), run_config=rc))"
+    ),
+}
+_EPILOGUE = "\nprint(time.perf_counter() - t0)\n"
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("OPENAI_API_KEY", "sk-offline-benchmark")
+    return env
+
+
+def time_stage(code: str, runs: int) -> List[float]:
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", _PRELUDE + code + _EPILOGUE],
+            capture_output=True, text=True, env=_env(), check=True,
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def slowest_imports(module: str, top: int = 10, max_depth: int = 2) -> List[Dict[str, object]]:
+    """Largest cumulative import times (µs) reported by -X importtime."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=_env(), check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line.split(":", 1)[1].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth > max_depth:
+            continue
+        rows.append({
+            "module": name.strip(), "depth": depth,
+            "cumulative_us": int(cum_us), "self_us": int(self_us),
+        })
+    rows.sort(key=lambda r: r["cumulative_us"], reverse=True)
+    return rows[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Cold-start benchmarks")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--output", type=Path, default=RESULTS_DIR / "startup_latest.json")
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    args = parser.parse_args()
+
+    # Warm the bytecode cache so the first stage isn't charged for compilation.
+    time_stage(STAGES["ready.first_handoff"], 1)
+
+    results: Dict[str, dict] = {}
+    for name, code in STAGES.items():
+        samples = sorted(time_stage(code, args.runs))
+        results[name] = {
+            "n": len(samples),
+            "p50_us": round(statistics.median(samples) * 1e6, 1),
+            "min_us": round(samples[0] * 1e6, 1),
+        }
+
+    payload = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+        "slowest_imports": slowest_imports("health_wellness_agent.agent"),
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(payload, indent=2))
+
+    width = max(len(k) for k in results)
+    for key, row in results.items():
+        print(f"{key:<{width}}  p50={row['p50_us'] / 1000:8.1f} ms  min={row['min_us'] / 1000:8.1f} ms")
+    print("\nslowest imports (cumulative):")
+    for row in payload["slowest_imports"]:
+        print(f"  {row['cumulative_us'] / 1000:8.1f} ms  {row['module']}")
+    print(f"\nresults → {args.output}")
+
+    if args.baseline:
+        from bench_overhead import compare
+        problems = compare(results, json.loads(args.baseline.read_text())["results"], args.threshold)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        return 1 if problems else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,30 +11,73 @@ Date Created: 2025-07-01
 # In this file I have implemented:
 # • CLI wrapper to launch planner agent with real-time streaming
 # • Clean and simple command-line input loop
+# • Sessions loaded from / persisted to the write-behind SessionStore
+# • SDK import and agent construction warm up in the background while the user types
+#   (then the common meal / workout plans)
 
-import asyncio, warnings, sys
+import asyncio, warnings, sys, os, threading
 from dotenv import load_dotenv
 
 warnings.filterwarnings("ignore", category=DeprecationWarning, module="pydantic")
 
-from health_wellness_agent.context import UserSessionContext
-from health_wellness_agent.agent import PlannerAgent
-from health_wellness_agent.utils.streaming import stream_response
-from agents import RunContextWrapper
+_ready = threading.Event()
+_warm_up_error: list = []
+
+def _warm_up():
+    # Import the SDK and build the shared agent graph while the user types.
+    try:
+        from health_wellness_agent.agent import get_planner_agent
+        from health_wellness_agent.utils import streaming  # noqa: F401
+        get_planner_agent()
+    except BaseException as exc:                # surfaced by the input loop, not lost with the thread
+        _warm_up_error.append(exc)
+        return
+    finally:
+        _ready.set()
+    from health_wellness_agent.tools.plan_cache import warm_in_background
+    warm_in_background()                        # common meal / workout plans, after the agent is ready
 
 async def main():
     load_dotenv()                               # needs OPENAI_API_KEY
-    ctx = UserSessionContext(name="Guest", uid=1)
-    agent = PlannerAgent()
-    wrapper = RunContextWrapper(ctx)
-
+    threading.Thread(target=_warm_up, daemon=True).start()
     print(">>> Health & Wellness Agent (type 'quit' to exit)")
-    while True:
-        user = input("\nYou: ").strip()
-        if user.lower() in {"quit", "exit"}:
-            print("Goodbye!")
-            break
-        await stream_response(agent, user, wrapper)
+
+    from health_wellness_agent.session_store import SessionStore, SQLiteBackend
+    store = SessionStore(SQLiteBackend(os.getenv("HWA_SESSION_DB", "sessions.db")))
+    uid = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    ctx = store.get(uid, name="Guest")
+    hooks = fast_path = guardrails = profiler = None
+
+    try:
+        while True:
+            user = (await asyncio.to_thread(input, "\nYou: ")).strip()
+            if user.lower() in {"quit", "exit"}:
+                print("Goodbye!")
+                break
+            if hooks is None:
+                await asyncio.to_thread(_ready.wait)
+                if _warm_up_error:
+                    raise _warm_up_error[0]
+                from health_wellness_agent.agent import get_planner_agent
+                from health_wellness_agent.fanout import active_fanout
+                from health_wellness_agent.fast_path import FastPathRouter
+                from health_wellness_agent.guardrails import SafetyClassifier
+                from health_wellness_agent.hooks import TracingRunHooks
+                from health_wellness_agent.profiling import TurnProfiler
+                from health_wellness_agent.utils.streaming import stream_response
+                agent, hooks, fast_path = get_planner_agent(), TracingRunHooks(), FastPathRouter()
+                guardrails = [SafetyClassifier().guardrail()]
+                profiler = TurnProfiler()       # off unless HWA_PROFILE_EVERY / _UIDS is set
+            await stream_response(
+                agent, user, ctx, hooks=hooks, fast_path=fast_path, guardrails=guardrails,
+                fanout=active_fanout(), profiler=profiler,
+            )
+    finally:
+        store.close()
+        if profiler is not None:
+            await profiler.flush()
+        if hooks is not None and os.getenv("HWA_TRACE_FILE"):
+            hooks.collector.dump_jsonl(os.environ["HWA_TRACE_FILE"])
 
 if __name__ == "__main__":
     if sys.platform == "win32":
@@ -0,0 +1,15 @@
+# Heavy modules (agents SDK, openai, tools) load on first attribute access.
+
+_LAZY = {
+    "PlannerAgent": "health_wellness_agent.agent",
+    "get_planner_agent": "health_wellness_agent.agent",
+    "UserSessionContext": "health_wellness_agent.context",
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+    return getattr(import_module(module), name)
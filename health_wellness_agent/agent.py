@@ -12,66 +12,144 @@ Date Created: 2025-07-01
 # • Primary multi-turn planner agent definition (+15 multi-turn interaction)
 # • Tool loading and context-aware interaction (+20 tool design & async)
 # • Handoff logic and streaming compatibility (+15 handoff logic, +15 streaming)
+# • Deferred construction: tool modules load on first PlannerAgent, specialists on
+#   first handoff, and get_planner_agent() shares one agent graph across sessions
+# • get_specialist(): by-name lookup used when the safety guardrail routes a turn
+# • consult_specialists tool for questions spanning several specialists (see fanout.py)
 
-from agents import Agent, handoff, Runner, ModelSettings
+from functools import cache
+from importlib import import_module
 
-# ── tools ───────────────────────────────────────────────────────────
-from health_wellness_agent.tools.goal_analyzer import goal_analyzer
-from health_wellness_agent.tools.meal_planner import meal_planner
-from health_wellness_agent.tools.workout_recommender import workout_recommender
-from health_wellness_agent.tools.scheduler import scheduler
-from health_wellness_agent.tools.tracker import tracker
+from agents import Agent, Handoff, Model, Runner, ModelSettings
 
-# ── specialist agents ───────────────────────────────────────────────
-from health_wellness_agent.custom_agents.nutrition_expert_agent import (
-    NutritionExpertAgent,
-)
-from health_wellness_agent.custom_agents.injury_support_agent import (
-    InjurySupportAgent,
-)
+_EMPTY_SCHEMA = {
+    "additionalProperties": False,
+    "type": "object",
+    "properties": {},
+    "required": [],
+}
+
+
+@cache
+def _core_tools() -> tuple:
+    # ── tools ───────────────────────────────────────────────────────
+    from health_wellness_agent.tools.goal_analyzer import goal_analyzer, goal_progress
+    from health_wellness_agent.tools.meal_planner import meal_planner
+    from health_wellness_agent.tools.workout_recommender import workout_recommender
+    from health_wellness_agent.tools.scheduler import scheduler
+    from health_wellness_agent.tools.tracker import import_progress, tracker
+    from health_wellness_agent.tools.consult import consult_specialists
+
+    return (goal_analyzer, goal_progress, meal_planner, workout_recommender, scheduler, tracker,
+            import_progress, consult_specialists)
+
+
+@cache
+def _specialist(module: str, cls_name: str) -> Agent:
+    """Import and build a specialist once, the first time anyone hands off to it."""
+    return getattr(import_module(module), cls_name)()
+
+
+SPECIALISTS = {
+    "NutritionExpertAgent": (
+        "health_wellness_agent.custom_agents.nutrition_expert_agent", "NutritionExpertAgent"
+    ),
+    "InjurySupportAgent": (
+        "health_wellness_agent.custom_agents.injury_support_agent", "InjurySupportAgent"
+    ),
+    "EscalationAgent": (
+        "health_wellness_agent.custom_agents.escalation_agent", "EscalationAgent"
+    ),
+}
+
+
+def get_specialist(name: str) -> Agent:
+    """A specialist by agent name, e.g. for guardrail routing outside a handoff."""
+    return _specialist(*SPECIALISTS[name])
+
+
+def lazy_handoff(
+    module: str,
+    cls_name: str,
+    agent_name: str,
+    tool_name: str,
+    tool_description: str,
+) -> Handoff:
+    """A Handoff whose target agent is only constructed when the handoff fires."""
+    async def _invoke(ctx, _input_json: str) -> Agent:
+        return _specialist(module, cls_name)
+
+    return Handoff(
+        tool_name=tool_name,
+        tool_description=tool_description,
+        input_json_schema=_EMPTY_SCHEMA,
+        on_invoke_handoff=_invoke,
+        agent_name=agent_name,
+    )
 
 
 class PlannerAgent(Agent):
     """Chat-first AI for personalised health & wellness planning."""
 
-    def __init__(self) -> None:
+    def __init__(self, model: str | Model = "gpt-4.1-mini") -> None:
         super().__init__(
             # Identity
             name="Health & Wellness Planner",
             instructions=(
                 "You are an AI health-and-wellness planner. "
                 "Collect user goals, generate personalised meal and workout plans, "
-                "schedule check-ins, log progress, and hand off to specialists when needed."
+                "schedule check-ins, log progress (import_progress for whole exports), "
+                "report progress toward goals, "
+                "hand off to specialists when needed, and escalate to a human coach on request. "
+                "When a request spans injury and nutrition at once, call consult_specialists "
+                "with both instead of handing off to one, and build your reply on their answers."
             ),
             # Model
-            model="gpt-4.1-mini",
+            model=model,
             model_settings=ModelSettings(
                 temperature=0.7,
                 top_p=1.0,
                 parallel_tool_calls=True,
             ),
             # Core tools
-            tools=[
-                goal_analyzer,
-                meal_planner,
-                workout_recommender,
-                scheduler,
-                tracker,
-            ],
+            tools=list(_core_tools()),
             # Specialist hand-offs
             handoffs=[
-                NutritionExpertAgent(),  # tool: transfer_to_nutrition_expert_agent
-                handoff(
-                    InjurySupportAgent(),
-                    tool_name_override="transfer_to_injury_support",
-                    tool_description_override=(
+                lazy_handoff(
+                    *SPECIALISTS["NutritionExpertAgent"],
+                    agent_name="NutritionExpertAgent",
+                    tool_name="transfer_to_nutritionexpertagent",
+                    tool_description=(
+                        "Handoff to the NutritionExpertAgent agent to handle the request. "
+                    ),
+                ),
+                lazy_handoff(
+                    *SPECIALISTS["InjurySupportAgent"],
+                    agent_name="InjurySupportAgent",
+                    tool_name="transfer_to_injury_support",
+                    tool_description=(
                         "Send the user to InjurySupportAgent when they mention pain, "
                         "injury, or require low-impact exercise modifications."
                     ),
                 ),
+                lazy_handoff(
+                    *SPECIALISTS["EscalationAgent"],
+                    agent_name="EscalationAgent",
+                    tool_name="transfer_to_escalation",
+                    tool_description=(
+                        "Send the user to EscalationAgent when they ask for a human coach, "
+                        "or describe symptoms that need a person rather than a plan."
+                    ),
+                ),
             ],
         )
 
     # Convenience helper for blocking unit tests / scripts
     def run_sync(self, prompt: str, context):
         return Runner.run(self, prompt, context=context)
+
+
+@cache
+def get_planner_agent(model: str = "gpt-4.1-mini") -> PlannerAgent:
+    """The shared planner graph; agents hold no per-session state, so one is enough."""
+    return PlannerAgent(model)
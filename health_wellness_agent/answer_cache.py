@@ -0,0 +1,196 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: answer_cache.py
+Description: Shared cache of model answers to general questions ("how much protein should I
+eat?"), keyed on the normalised question plus the session fields that change the answer.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • normalize_question(): case, punctuation, pleasantries and contractions folded away
+# • Session fingerprint over diet_preferences / injury_notes, so a vegan with a bad knee
+#   never gets the answer written for someone else
+# • Bypass rules: personal details, follow-ups ("what about that?"), any turn that
+#   called a tool and any answer written with earlier conversation in view are never stored
+# • AnswerCache: TTL + LRU over recorded stream chunks, replayed through stream_deltas,
+#   with hit-rate counters for /health and /metrics
+
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+
+_CONTRACTIONS = {
+    "what's": "what is", "whats": "what is", "how's": "how is", "it's": "it is",
+    "isn't": "is not", "aren't": "are not", "don't": "do not", "doesn't": "does not",
+    "can't": "can not", "cannot": "can not", "shouldn't": "should not", "i'm": "i am",
+}
+_PLEASANTRIES = re.compile(
+    r"^(?:(?:hi|hey|hello|ok|okay|so|quick question|please|coach)\b[\s,]*)+"
+    r"|(?:\b(?:please|thanks|thank you|thx)\s*)+$"
+)
+_FILLERS = re.compile(
+    r"^(?:(?:can|could|would) you (?:please )?(?:tell|explain to) me |do you know |"
+    r"i (?:want|would like|wanted) to know |i was wondering )"
+)
+_PUNCT = re.compile(r"[^\w\s']+")
+
+# Anything that makes the answer about *this* user or *this* conversation.
+_PERSONAL = re.compile(
+    r"\b(?:my|me|mine|myself|i am|i've|i have|i was|i weigh|i'm|today|yesterday|tonight|"
+    r"tomorrow|this week|last week|plan|schedule|remind|log|track)\b|\d",
+    re.IGNORECASE,
+)
+_FOLLOW_UP = re.compile(
+    r"^(?:and|but|also|what about|how about|ok so)\b|\b(?:that|those|them|it|above|again|instead)\b[\s?.!]*$",
+    re.IGNORECASE,
+)
+_UNCACHEABLE_ITEMS = frozenset({"tool_call_item", "tool_call_output_item", "mcp_call_item",
+                                "mcp_approval_request_item"})
+
+
+def normalize_question(text: str) -> str:
+    """'Hey, how much PROTEIN should I eat??' → 'how much protein should i eat'."""
+    text = " ".join(text.lower().replace("’", "'").split())
+    text = " ".join(_CONTRACTIONS.get(w, w) for w in text.split())
+    text = " ".join(_PUNCT.sub(" ", text).split())
+    text = _PLEASANTRIES.sub("", text).strip()
+    text = _FILLERS.sub("", text).strip()
+    return text
+
+
+def session_fingerprint(session: Any) -> Tuple[str, str]:
+    """The session fields that change a general answer, in canonical form."""
+    diet = " ".join(sorted(set(_PUNCT.sub(" ", (session.diet_preferences or "").lower()).split())))
+    injury = " ".join(_PUNCT.sub(" ", (session.injury_notes or "").lower()).split())
+    return diet, injury
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    chunks: Tuple[Tuple[str, str], ...]         # ("delta" | "message_end" | "agent", text)
+    items: Tuple[Dict[str, Any], ...]           # history items recorded for the turn
+    created: float
+
+
+class AnswerCache:
+    """
+    LRU of answers with a fixed time-to-live. `key()` decides whether a turn
+    may use the cache at all; `store()` refuses turns that ran tools or that
+    the model answered with the user's earlier conversation in its input (the
+    key does not cover it, so it could leak to whoever asks next). Safe to
+    share between sessions and threads.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 2048,
+        ttl: float = 6 * 3600.0,
+        min_words: int = 3,
+        max_words: int = 30,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.min_words = min_words
+        self.max_words = max_words
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            "lookups": 0, "hits": 0, "misses": 0, "bypassed": 0,
+            "stored": 0, "refused": 0, "expired": 0, "evicted": 0,
+        }
+
+    # ── policy ──────────────────────────────────────────────────────
+    def key(self, agent: Any, prompt: str, session: Any) -> Optional[Hashable]:
+        """Cache key for this turn, or None when the turn must go to the model."""
+        question = normalize_question(prompt)
+        words = len(question.split())
+        if (
+            not self.min_words <= words <= self.max_words
+            or _PERSONAL.search(question)
+            or _FOLLOW_UP.search(question)
+        ):
+            self.stats["bypassed"] += 1
+            return None
+        return getattr(agent, "name", str(agent)), question, session_fingerprint(session)
+
+    # ── storage ─────────────────────────────────────────────────────
+    def get(self, key: Hashable) -> Optional[CachedAnswer]:
+        self.stats["lookups"] += 1
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() - entry.created > self.ttl:
+                del self._entries[key]
+                self.stats["expired"] += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        self.stats["hits" if entry is not None else "misses"] += 1
+        return entry
+
+    def store(
+        self,
+        key: Hashable,
+        chunks: Sequence[Tuple[str, str]],
+        new_items: Sequence[Any],
+        run_input: Sequence[Any],
+    ) -> bool:
+        """
+        Keep a finished turn, unless it called a tool, produced no text, or its
+        `run_input` held more than the question itself.
+        """
+        if len(run_input) > 1 \
+                or any(getattr(item, "type", None) in _UNCACHEABLE_ITEMS for item in new_items) \
+                or not any(kind == "delta" and text for kind, text in chunks):
+            self.stats["refused"] += 1
+            return False
+        entry = CachedAnswer(
+            tuple(chunks), tuple(item.to_input_item() for item in new_items), self.clock()
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evicted"] += 1
+        self.stats["stored"] += 1
+        return True
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] = lambda _k: True) -> int:
+        """Drop matching entries (all by default), e.g. after an agent prompt change."""
+        with self._lock:
+            doomed = [k for k in self._entries if predicate(k)]
+            for k in doomed:
+                del self._entries[k]
+        return len(doomed)
+
+    # ── metrics ─────────────────────────────────────────────────────
+    @property
+    def hit_rate(self) -> float:
+        return self.stats["hits"] / self.stats["lookups"] if self.stats["lookups"] else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self), "hit_rate": round(self.hit_rate, 4)}
+
+    def openmetrics_lines(self, prefix: str = "hwa") -> List[str]:
+        """Counters and gauges in OpenMetrics text form, without the trailing # EOF."""
+        lines = []
+        for name in ("lookups", "hits", "misses", "bypassed", "stored", "refused", "expired", "evicted"):
+            lines.append(f"# TYPE {prefix}_answer_cache_{name} counter")
+            lines.append(f"{prefix}_answer_cache_{name}_total {self.stats[name]}")
+        lines.append(f"# TYPE {prefix}_answer_cache_entries gauge")
+        lines.append(f"{prefix}_answer_cache_entries {len(self)}")
+        lines.append(f"# TYPE {prefix}_answer_cache_hit_ratio gauge")
+        lines.append(f"{prefix}_answer_cache_hit_ratio {self.hit_rate:.6f}")
+        return lines
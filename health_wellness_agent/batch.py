@@ -0,0 +1,242 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: batch.py
+Description: Offline batch runner — scripted conversations from JSONL through the planner,
+many at once, with results streamed to JSONL and crash-safe resume.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • read_conversations(): lazy JSONL reader ({"id"?, "uid", "name"?, "turns": [...]})
+# • completed_ids(): resume support — finished ids from an existing output file,
+#   tolerating a torn last line from a crash
+# • BatchRunner: bounded worker pool over stream_deltas, one fresh UserSessionContext
+#   per conversation, one JSONL record per conversation written as soon as it finishes
+# • BatchReport: throughput plus conversation / turn latency percentiles
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, TextIO
+
+from agents import InputGuardrail, RunConfig, RunHooks
+
+from health_wellness_agent.answer_cache import AnswerCache
+from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.fanout import SpecialistFanOut
+from health_wellness_agent.fast_path import FastPathRouter
+from health_wellness_agent.profiling import TurnProfiler
+from health_wellness_agent.utils.streaming import stream_deltas
+
+# Session fields written with each result, e.g. for plan pre-generation.
+RESULT_FIELDS = ("goal", "diet_preferences", "injury_notes", "meal_plan", "workout_plan", "checkins")
+
+
+@dataclass(frozen=True)
+class Conversation:
+    id: str
+    uid: int
+    name: str
+    turns: Sequence[str]
+
+
+def read_conversations(path: str) -> Iterator[Conversation]:
+    """Yield conversations lazily; blank lines and malformed records are reported and skipped."""
+    with open(path, encoding="utf-8") as fh:
+        for line_no, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+                turns = raw["turns"]
+                if isinstance(turns, str) or not all(isinstance(t, str) for t in turns):
+                    raise TypeError("turns must be a list of strings")
+                uid = int(raw["uid"])
+            except (ValueError, KeyError, TypeError) as exc:
+                print(f"[Batch] {path}:{line_no} skipped: {exc}")
+                continue
+            yield Conversation(
+                id=str(raw.get("id") or f"{uid}:{line_no}"),
+                uid=uid,
+                name=str(raw.get("name") or "Batch"),
+                turns=tuple(turns),
+            )
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids already finished successfully in `path`. A torn final line (crash mid-
+    write) is cut off so appended records start on a clean line.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    good_end = 0
+    with open(path, "rb") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            good_end += len(line)
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+            else:
+                done.discard(str(record["id"]))      # last record for an id wins
+    if good_end < os.path.getsize(path):
+        with open(path, "rb+") as fh:
+            fh.truncate(good_end)
+    return done
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+    return {"p50_ms": round(pick(0.5) * 1000, 1), "p95_ms": round(pick(0.95) * 1000, 1),
+            "p99_ms": round(pick(0.99) * 1000, 1), "max_ms": round(ordered[-1] * 1000, 1)}
+
+
+@dataclass
+class BatchReport:
+    conversations: int = 0
+    turns: int = 0
+    errors: int = 0
+    skipped: int = 0
+    elapsed_s: float = 0.0
+    conversation_latency: List[float] = field(default_factory=list, repr=False)
+    turn_latency: List[float] = field(default_factory=list, repr=False)
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = self.elapsed_s or 1e-9
+        return {
+            "conversations": self.conversations,
+            "turns": self.turns,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "conversations_per_s": round(self.conversations / elapsed, 2),
+            "turns_per_s": round(self.turns / elapsed, 2),
+            "conversation_latency": _percentiles(self.conversation_latency),
+            "turn_latency": _percentiles(self.turn_latency),
+        }
+
+
+class BatchRunner:
+    """
+    Run conversations through `agent` with at most `concurrency` in flight.
+    Every conversation gets its own UserSessionContext, so uids never share
+    state; the turns within one conversation run strictly in order.
+    """
+
+    def __init__(
+        self,
+        agent,
+        concurrency: int = 16,
+        run_config: Optional[RunConfig] = None,
+        hooks: Optional[RunHooks] = None,
+        fast_path: Optional[FastPathRouter] = None,
+        guardrails: Optional[Sequence[InputGuardrail]] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        fanout: Optional[SpecialistFanOut] = None,
+        profiler: Optional[TurnProfiler] = None,
+    ) -> None:
+        self.agent = agent
+        self.concurrency = max(1, concurrency)
+        self.run_config = run_config
+        self.hooks = hooks
+        self.fast_path = fast_path
+        self.guardrails = guardrails
+        self.answer_cache = answer_cache
+        self.fanout = fanout
+        self.profiler = profiler
+
+    async def run_one(self, convo: Conversation) -> Dict[str, Any]:
+        session = UserSessionContext(name=convo.name, uid=convo.uid)
+        record: Dict[str, Any] = {"id": convo.id, "uid": convo.uid, "status": "ok", "turns": []}
+        started = time.perf_counter()
+        try:
+            for prompt in convo.turns:
+                turn_started = time.perf_counter()
+                reply: List[str] = []
+                agents: List[str] = []
+                first = None
+                async for kind, text in stream_deltas(
+                    self.agent, prompt, session,
+                    run_config=self.run_config, hooks=self.hooks, fast_path=self.fast_path,
+                    guardrails=self.guardrails, answer_cache=self.answer_cache, fanout=self.fanout,
+                    profiler=self.profiler,
+                ):
+                    if kind == "delta":
+                        if first is None:
+                            first = time.perf_counter() - turn_started
+                        reply.append(text)
+                    elif kind == "agent":
+                        agents.append(text)
+                    elif kind == "message_end" and reply and not reply[-1].endswith("\n"):
+                        reply.append("\n")
+                record["turns"].append({
+                    "user": prompt,
+                    "reply": "".join(reply).strip(),
+                    "agents": agents,
+                    "ttft_ms": round((first or 0.0) * 1000, 1),
+                    "latency_ms": round((time.perf_counter() - turn_started) * 1000, 1),
+                })
+        except Exception as exc:                        # one bad conversation never stops the batch
+            record["status"] = "error"
+            record["error"] = f"{type(exc).__name__}: {exc}"
+        record["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        record["session"] = session.model_dump(mode="json", include=set(RESULT_FIELDS))
+        return record
+
+    async def run(
+        self,
+        conversations: Iterator[Conversation],
+        out: TextIO,
+        skip: Set[str] = frozenset(),
+        progress_every: int = 0,
+    ) -> BatchReport:
+        """
+        Pull conversations lazily (at most `concurrency` buffered), append one
+        JSON line per finished conversation and flush it, so a crash loses
+        only what was in flight.
+        """
+        report = BatchReport()
+        queue: "asyncio.Queue[Optional[Conversation]]" = asyncio.Queue(maxsize=self.concurrency)
+        started = time.perf_counter()
+
+        async def feed() -> None:
+            for convo in conversations:
+                if convo.id in skip:
+                    report.skipped += 1
+                    continue
+                await queue.put(convo)
+            for _ in range(self.concurrency):
+                await queue.put(None)
+
+        async def work() -> None:
+            while (convo := await queue.get()) is not None:
+                record = await self.run_one(convo)
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                report.conversations += 1
+                report.turns += len(record["turns"])
+                report.errors += record["status"] != "ok"
+                report.conversation_latency.append(record["latency_ms"] / 1000)
+                report.turn_latency.extend(t["latency_ms"] / 1000 for t in record["turns"])
+                if progress_every and report.conversations % progress_every == 0:
+                    rate = report.conversations / (time.perf_counter() - started)
+                    print(f"[Batch] {report.conversations} done ({rate:.1f}/s, {report.errors} errors)")
+
+        await asyncio.gather(feed(), *(work() for _ in range(self.concurrency)))
+        if self.profiler is not None:
+            await self.profiler.flush()
+        report.elapsed_s = time.perf_counter() - started
+        return report
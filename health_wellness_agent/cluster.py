@@ -0,0 +1,625 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: cluster.py
+Description: Multi-process serving — a supervisor that runs N ChatServer workers and routes
+every session uid to one fixed worker by consistent hashing, so session state never crosses
+processes and each worker has a core (and a GIL) of its own.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • HashRing: consistent hashing with virtual nodes (stable across processes, so the
+#   supervisor and every worker agree on owners without talking to each other)
+# • Shard: a worker's view of the ring; SessionStore and ChatServer use it to serve owned uids only
+# • Supervisor: spawns workers, proxies /sessions/{uid}/... to the owner, restarts crashed
+#   workers with backoff, and aggregates /health and /metrics across workers
+# • Rebalancing on scale(n): requests for moving uids wait, in-flight ones drain, old owners
+#   flush and release the sessions, then routing flips to the new ring
+# • Cluster-wide limits (Shard.limits) are re-split on every ring update, and a moving
+#   user's escalation ticket is handed to the new owner before routing flips
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import multiprocessing as mp
+import re
+import signal
+import time
+from bisect import bisect
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+_ROUTE_UID = re.compile(r"^/sessions/(\d+)/")
+_SAMPLE_SUFFIXES = ("_bucket", "_count", "_sum", "_created", "_total")
+
+
+# ────────────────────────────────────────────────────────────────────
+# Consistent hashing
+# ────────────────────────────────────────────────────────────────────
+
+def _point(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Each node owns `vnodes` points on a 64-bit ring; a uid belongs to the
+    first point clockwise of its hash. Adding or removing one node moves
+    only ~1/N of the uids, and only to or from that node.
+    """
+
+    def __init__(self, nodes: Iterable[str] = (), vnodes: int = 160) -> None:
+        self.vnodes = vnodes
+        self._nodes: List[str] = []
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return list(self._nodes)
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def add(self, node: str) -> None:
+        if node not in self._nodes:
+            self._nodes.append(node)
+            self._rebuild()
+
+    def remove(self, node: str) -> None:
+        if node in self._nodes:
+            self._nodes.remove(node)
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        ring = sorted((_point(f"{node}#{i}"), node) for node in self._nodes for i in range(self.vnodes))
+        self._points = [p for p, _ in ring]
+        self._owners = [n for _, n in ring]
+
+    def node_for(self, uid: int) -> str:
+        if not self._points:
+            raise LookupError("hash ring is empty")
+        idx = bisect(self._points, _point(str(uid)))
+        return self._owners[idx % len(self._owners)]
+
+    def copy(self) -> "HashRing":
+        return HashRing(self._nodes, self.vnodes)
+
+
+class Shard:
+    """
+    One worker's slice of the ring. `owns` is safe to hand out as a filter; it
+    follows updates. `limits` holds cluster-wide totals (set by the worker
+    factory); `split()` is this worker's share of one at the current size.
+    `peers` maps worker names to (host, port).
+    """
+
+    def __init__(
+        self, name: str, nodes: Sequence[str], vnodes: int = 160,
+        peers: Optional[Dict[str, Tuple[str, int]]] = None,
+    ) -> None:
+        self.name = name
+        self.ring = HashRing(nodes, vnodes)
+        self.peers: Dict[str, Tuple[str, int]] = dict(peers or {})
+        self.limits: Dict[str, int] = {}
+
+    def owns(self, uid: int) -> bool:
+        return self.ring.node_for(uid) == self.name
+
+    def split(self, total: int) -> int:
+        return max(1, total // max(1, len(self.ring)))
+
+    def update(self, nodes: Sequence[str], peers: Optional[Dict[str, Tuple[str, int]]] = None) -> None:
+        self.ring = HashRing(nodes, self.ring.vnodes)
+        if peers is not None:
+            self.peers = {str(name): (str(host), int(port)) for name, (host, port) in peers.items()}
+
+
+# ────────────────────────────────────────────────────────────────────
+# Worker processes
+# ────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class WorkerSpec:
+    name: str
+    host: str
+    port: int
+    nodes: Tuple[str, ...]          # ring membership at spawn time
+    vnodes: int = 160
+    peers: Tuple[Tuple[str, str, int], ...] = ()    # (name, host, port) of the other workers
+
+
+# factory(spec, shard) -> ChatServer listening on spec.host:spec.port with `shard=shard`.
+# It must be importable by name (spawned workers unpickle it), i.e. a module-level function.
+WorkerFactory = Callable[[WorkerSpec, Shard], Any]
+
+
+def _worker_main(spec: WorkerSpec, factory: WorkerFactory) -> None:
+    async def run() -> None:
+        peers = {name: (host, port) for name, host, port in spec.peers}
+        server = factory(spec, Shard(spec.name, spec.nodes, spec.vnodes, peers))
+        if asyncio.iscoroutine(server):
+            server = await server
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):     # Windows
+                signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+        await server.start()
+        try:
+            await stop.wait()
+        finally:
+            await server.close()
+            server.store.close()                            # final flush before exit
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+@dataclass
+class _Worker:
+    spec: WorkerSpec
+    process: Optional[mp.process.BaseProcess] = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event)
+    started_at: float = 0.0
+    restarts: int = 0
+    restarting: bool = False
+    retiring: bool = False
+    in_flight: Counter = field(default_factory=Counter)     # uid -> proxied requests
+
+
+async def _http(host: str, port: int, method: str, path: str, body: Optional[dict] = None,
+                timeout: float = 5.0) -> Tuple[int, bytes]:
+    """One request on a fresh connection (the workers close after every response)."""
+    async def call() -> Tuple[int, bytes]:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            data = json.dumps(body).encode() if body is not None else b""
+            writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                         f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, payload = raw.partition(b"\r\n\r\n")
+        return int(head.split(b" ", 2)[1]), payload
+    return await asyncio.wait_for(call(), timeout)
+
+
+# ────────────────────────────────────────────────────────────────────
+# Supervisor
+# ────────────────────────────────────────────────────────────────────
+
+class Supervisor:
+    """
+    Front door on host:port; workers listen on consecutive ports from
+    `base_port`. Requests under /sessions/{uid}/ are piped byte-for-byte to
+    the owning worker; everything else besides /health and /metrics goes to
+    the first worker.
+    """
+
+    def __init__(
+        self,
+        factory: WorkerFactory,
+        workers: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        base_port: int = 9100,
+        vnodes: int = 160,
+        ready_timeout: float = 30.0,
+        drain_timeout: float = 30.0,
+        max_restart_delay: float = 30.0,
+    ) -> None:
+        self.factory = factory
+        self.target = workers or mp.cpu_count()
+        self.host = host
+        self.port = port
+        self.base_port = base_port
+        self.vnodes = vnodes
+        self.ready_timeout = ready_timeout
+        self.drain_timeout = drain_timeout
+        self.max_restart_delay = max_restart_delay
+        self.ring = HashRing((), vnodes)
+        self.workers: Dict[str, _Worker] = {}
+        self.stats = {"requests": 0, "unavailable": 0, "upstream_errors": 0, "restarts": 0,
+                      "rebalances": 0, "moved_hot": 0}
+        self._ctx = mp.get_context("spawn")                 # no forked locks / event loops
+        self._seq = 0
+        self._next_ring: Optional[HashRing] = None
+        self._rebalanced = asyncio.Event()
+        self._rebalanced.set()
+        self._scale_lock = asyncio.Lock()
+        self._server: Optional[asyncio.base_events.Server] = None
+        self._monitor: Optional[asyncio.Task] = None
+
+    # ── lifecycle ───────────────────────────────────────────────────
+    async def start(self) -> None:
+        names = [self._new_name() for _ in range(self.target)]
+        for name in names:
+            self.ring.add(name)
+        for name in names:
+            self._spawn(name)
+        await asyncio.gather(*(self._wait_ready(self.workers[n]) for n in names))
+        self._monitor = asyncio.create_task(self._watch(), name="supervisor-monitor")
+        self._server = await asyncio.start_server(self._handle_conn, self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+        if self._monitor is not None:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+        await asyncio.gather(*(self._stop(w) for w in list(self.workers.values())))
+        self.workers.clear()
+
+    def _new_name(self) -> str:
+        self._seq += 1
+        return f"w{self._seq - 1}"
+
+    def _free_port(self) -> int:
+        used = {w.spec.port for w in self.workers.values()}
+        port = self.base_port
+        while port in used:
+            port += 1
+        return port
+
+    def _spawn(self, name: str, port: Optional[int] = None, nodes: Optional[Sequence[str]] = None) -> _Worker:
+        peers = tuple((n, w.spec.host, w.spec.port) for n, w in self.workers.items() if n != name)
+        spec = WorkerSpec(name, "127.0.0.1", port or self._free_port(),
+                          tuple(nodes or self.ring.nodes), self.vnodes, peers)
+        worker = self.workers.get(name) or _Worker(spec)
+        worker.spec = spec
+        worker.ready.clear()
+        worker.process = self._ctx.Process(
+            target=_worker_main, args=(spec, self.factory), name=f"hwa-{name}", daemon=True
+        )
+        worker.process.start()
+        worker.started_at = time.monotonic()
+        self.workers[name] = worker
+        return worker
+
+    async def _wait_ready(self, worker: _Worker) -> None:
+        deadline = time.monotonic() + self.ready_timeout
+        while time.monotonic() < deadline:
+            if worker.process is None or not worker.process.is_alive():
+                raise RuntimeError(f"worker {worker.spec.name} exited during start-up")
+            try:
+                status, _ = await _http(worker.spec.host, worker.spec.port, "GET", "/health", timeout=1.0)
+                if status == 200:
+                    worker.ready.set()
+                    return
+            except (OSError, asyncio.TimeoutError):
+                pass
+            await asyncio.sleep(0.1)
+        raise RuntimeError(f"worker {worker.spec.name} not ready after {self.ready_timeout:.0f}s")
+
+    async def _stop(self, worker: _Worker, timeout: float = 10.0) -> None:
+        worker.ready.clear()
+        proc = worker.process
+        if proc is None:
+            return
+        if proc.is_alive():
+            proc.terminate()                                # SIGTERM → close + final flush
+            await asyncio.to_thread(proc.join, timeout)
+            if proc.is_alive():
+                proc.kill()
+                await asyncio.to_thread(proc.join, 1.0)
+
+    # ── crash recovery ──────────────────────────────────────────────
+    async def _watch(self) -> None:
+        """Restart any worker that dies, with exponential backoff per worker."""
+        while True:
+            await asyncio.sleep(0.5)
+            for worker in list(self.workers.values()):
+                proc = worker.process
+                if worker.retiring or worker.restarting or proc is None or proc.is_alive():
+                    continue
+                self._begin_restart(worker)
+
+    def _begin_restart(self, worker: _Worker) -> None:
+        worker.ready.clear()
+        worker.restarting = True
+        asyncio.create_task(self._restart(worker))
+
+    async def _restart(self, worker: _Worker) -> None:
+        name = worker.spec.name
+        code = worker.process.exitcode if worker.process else None
+        uptime = time.monotonic() - worker.started_at
+        if uptime > 60:
+            worker.restarts = 0                             # it was healthy for a while
+        delay = min(self.max_restart_delay, 0.5 * 2 ** worker.restarts)
+        worker.restarts += 1
+        self.stats["restarts"] += 1
+        print(f"[Supervisor] worker {name} exited (code {code}); restarting in {delay:.1f}s")
+        try:
+            await asyncio.sleep(delay)
+            if worker.retiring or name not in self.workers:
+                return
+            # Same name and port: its uids stay put and reload from the shared store.
+            self._spawn(name, worker.spec.port)
+            await self._wait_ready(worker)
+        except RuntimeError as exc:
+            print(f"[Supervisor] {exc}")                    # _watch tries again
+        finally:
+            worker.restarting = False
+
+    # ── scaling ─────────────────────────────────────────────────────
+    async def scale(self, n: int) -> Dict[str, Any]:
+        """Grow or shrink to `n` workers, moving only the uids whose owner changes."""
+        n = max(1, n)
+        async with self._scale_lock:
+            current = [name for name, w in self.workers.items() if not w.retiring]
+            if n == len(current):
+                return {"workers": current, "moved_hot": 0}
+            new_ring = self.ring.copy()
+            added: List[str] = []
+            removed = current[n:] if n < len(current) else []
+            for name in removed:
+                new_ring.remove(name)
+            while len(new_ring) < n:
+                name = self._new_name()
+                new_ring.add(name)
+                added.append(name)
+            # New workers start already knowing the new ring, but get no traffic yet.
+            for name in added:
+                self._spawn(name, nodes=new_ring.nodes)
+            await asyncio.gather(*(self._wait_ready(self.workers[name]) for name in added))
+            for name in removed:
+                self.workers[name].retiring = True
+            moved = await self._rebalance(new_ring)
+            for name in removed:
+                await self._stop(self.workers.pop(name))
+            print(f"[Supervisor] scaled to {len(self.ring)} workers "
+                  f"(+{len(added)} -{len(removed)}, {moved} hot sessions handed over)")
+            return {"workers": self.ring.nodes, "moved_hot": moved}
+
+    async def _rebalance(self, new_ring: HashRing) -> int:
+        old_ring = self.ring
+        self._next_ring = new_ring
+        self._rebalanced.clear()                            # moving uids queue up from here
+        try:
+            deadline = time.monotonic() + self.drain_timeout
+            while time.monotonic() < deadline and any(
+                old_ring.node_for(uid) != new_ring.node_for(uid)
+                for w in self.workers.values() for uid, c in w.in_flight.items() if c
+            ):
+                await asyncio.sleep(0.05)
+            # Old owners flush and drop what they no longer own before anyone else loads it.
+            peers = {name: (w.spec.host, w.spec.port) for name, w in self.workers.items()}
+            results = await asyncio.gather(*(
+                _http(w.spec.host, w.spec.port, "POST", "/cluster/ring",
+                      {"nodes": new_ring.nodes, "peers": peers}, timeout=self.drain_timeout)
+                for w in self.workers.values() if w.ready.is_set()
+            ), return_exceptions=True)
+            moved = 0
+            tickets: Dict[str, List[dict]] = {}
+            for res in results:
+                if isinstance(res, Exception):
+                    print(f"[Supervisor] ring update failed: {res}")
+                    continue
+                status, payload = res
+                if status == 200:
+                    data = json.loads(payload)
+                    moved += data.get("released", 0)
+                    for record in data.get("tickets", ()):
+                        tickets.setdefault(new_ring.node_for(int(record["uid"])), []).append(record)
+            # Escalation tickets follow their users, still before routing flips.
+            results = await asyncio.gather(*(
+                _http(self.workers[name].spec.host, self.workers[name].spec.port, "POST",
+                      "/cluster/escalations", {"tickets": records}, timeout=self.drain_timeout)
+                for name, records in tickets.items() if name in self.workers
+            ), return_exceptions=True)
+            for res in results:
+                if isinstance(res, Exception) or res[0] != 200:
+                    print(f"[Supervisor] escalation hand-over failed: {res}")
+            self.ring = new_ring
+            self.stats["rebalances"] += 1
+            self.stats["moved_hot"] += moved
+            return moved
+        finally:
+            self._next_ring = None
+            self._rebalanced.set()
+
+    # ── routing ─────────────────────────────────────────────────────
+    async def _owner(self, uid: Optional[int]) -> _Worker:
+        if uid is not None and self._next_ring is not None:
+            if self._next_ring.node_for(uid) != self.ring.node_for(uid):
+                await self._rebalanced.wait()
+        name = self.ring.node_for(uid) if uid is not None else self.ring.nodes[0]
+        worker = self.workers[name]
+        if not worker.ready.is_set():                       # restarting: hold the request briefly
+            await asyncio.wait_for(worker.ready.wait(), self.ready_timeout)
+        return worker
+
+    async def _handle_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            try:
+                method, path, _ = head.split(b"\r\n", 1)[0].decode("latin-1").split(" ", 2)
+            except ValueError:
+                return
+            if path == "/health":
+                await self._send(writer, 200, "application/json", json.dumps(await self.health()))
+                return
+            if path == "/metrics":
+                await self._send(writer, 200, "application/openmetrics-text; version=1.0.0; charset=utf-8",
+                                 await self.metrics())
+                return
+            match = _ROUTE_UID.match(path)
+            uid = int(match.group(1)) if match else None
+            try:
+                worker = await self._owner(uid)
+            except (asyncio.TimeoutError, KeyError, LookupError):
+                self.stats["unavailable"] += 1
+                await self._send(writer, 503, "application/json", '{"error": "worker unavailable"}')
+                return
+            self.stats["requests"] += 1
+            worker.in_flight[uid] += 1
+            try:
+                await self._pipe(worker, head, reader, writer)
+            finally:
+                worker.in_flight[uid] -= 1
+                if not worker.in_flight[uid]:
+                    del worker.in_flight[uid]
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            pass
+        finally:
+            writer.close()
+
+    async def _pipe(self, worker: _Worker, head: bytes, reader: asyncio.StreamReader,
+                    writer: asyncio.StreamWriter) -> None:
+        try:
+            up_reader, up_writer = await self._connect(worker)
+        except (OSError, asyncio.TimeoutError):
+            self.stats["unavailable"] += 1
+            await self._send(writer, 503, "application/json", '{"error": "worker unavailable"}')
+            return
+
+        sent = 0
+
+        async def copy(src: asyncio.StreamReader, dst: asyncio.StreamWriter) -> None:
+            nonlocal sent
+            while chunk := await src.read(65536):
+                dst.write(chunk)
+                if dst is writer:
+                    sent += len(chunk)
+                await dst.drain()                          # backpressure end to end
+            if dst.can_write_eof():
+                try:
+                    dst.write_eof()
+                except (OSError, RuntimeError):
+                    pass
+
+        up_writer.write(head)
+        upload = asyncio.create_task(copy(reader, up_writer))
+        try:
+            await copy(up_reader, writer)                   # the worker closes when it's done
+        except ConnectionResetError:
+            # The worker died mid-request. Turns are not idempotent, so no replay:
+            # tell the client if it has not seen a byte yet; _watch restarts the worker.
+            self.stats["upstream_errors"] += 1
+            if not sent:
+                await self._send(writer, 502, "application/json", '{"error": "worker failed, retry"}')
+        finally:
+            upload.cancel()
+            await asyncio.gather(upload, return_exceptions=True)
+            up_writer.close()
+
+    async def _connect(self, worker: _Worker) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        """Connect to `worker`; if it just died, restart it now and wait rather than fail."""
+        try:
+            return await asyncio.open_connection(worker.spec.host, worker.spec.port)
+        except OSError:
+            proc = worker.process
+            if worker.retiring or proc is None or proc.is_alive():
+                raise
+        if not worker.restarting:
+            self._begin_restart(worker)
+        await asyncio.wait_for(worker.ready.wait(), self.ready_timeout)
+        return await asyncio.open_connection(worker.spec.host, worker.spec.port)
+
+    @staticmethod
+    async def _send(writer: asyncio.StreamWriter, status: int, content_type: str, body: str) -> None:
+        data = body.encode()
+        reason = {200: "OK", 502: "Bad Gateway", 503: "Service Unavailable"}.get(status, "")
+        writer.write(
+            f"HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+
+    # ── aggregation ─────────────────────────────────────────────────
+    async def _collect(self, path: str) -> Dict[str, Any]:
+        live = [w for w in self.workers.values() if w.ready.is_set()]
+        results = await asyncio.gather(
+            *(_http(w.spec.host, w.spec.port, "GET", path, timeout=2.0) for w in live),
+            return_exceptions=True,
+        )
+        return {w.spec.name: r for w, r in zip(live, results)}
+
+    async def health(self) -> Dict[str, Any]:
+        per_worker: Dict[str, Any] = {}
+        totals: Dict[str, float] = {}
+        for name, res in (await self._collect("/health")).items():
+            if isinstance(res, Exception) or res[0] != 200:
+                per_worker[name] = {"status": "unreachable"}
+                continue
+            data = json.loads(res[1])
+            per_worker[name] = data
+            for key in ("turns", "active", "rejected", "aborted"):
+                totals[key] = totals.get(key, 0) + data.get(key, 0)
+        for name, worker in self.workers.items():
+            per_worker.setdefault(name, {"status": "restarting" if not worker.retiring else "retiring"})
+            per_worker[name]["pid"] = worker.process.pid if worker.process else None
+            per_worker[name]["restarts"] = worker.restarts
+        up = sum(1 for w in self.workers.values() if w.ready.is_set())
+        return {
+            "status": "ok" if up == len(self.workers) else "degraded",
+            "workers_up": up,
+            "workers": per_worker,
+            "ring": self.ring.nodes,
+            **totals,
+            "supervisor": dict(self.stats),
+        }
+
+    async def metrics(self) -> str:
+        """Every worker's OpenMetrics, one family at a time, samples labelled worker="…"."""
+        families: Dict[str, List[str]] = {}
+        meta: Dict[str, List[str]] = {}
+        for name, res in (await self._collect("/metrics")).items():
+            if isinstance(res, Exception) or res[0] != 200:
+                continue
+            family = None
+            for line in res[1].decode().splitlines():
+                if not line or line == "# EOF":
+                    continue
+                if line.startswith("#"):
+                    parts = line.split(" ", 3)
+                    if len(parts) >= 3:
+                        family = parts[2]
+                        lines = meta.setdefault(family, [])
+                        if line not in lines:
+                            lines.append(line)
+                        families.setdefault(family, [])
+                    continue
+                families.setdefault(family or _family(line), []).append(_label(line, "worker", name))
+        out = [f"# TYPE hwa_supervisor_{k} counter\nhwa_supervisor_{k}_total {v}"
+               for k, v in self.stats.items()]
+        out.append(f"# TYPE hwa_workers_up gauge\nhwa_workers_up "
+                   f"{sum(1 for w in self.workers.values() if w.ready.is_set())}")
+        for family, samples in families.items():
+            out.extend(meta.get(family, []))
+            out.extend(samples)
+        return "\n".join(out) + "\n# EOF\n"
+
+
+def _family(sample: str) -> str:
+    name = re.split(r"[{ ]", sample, 1)[0]
+    for suffix in _SAMPLE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def _label(sample: str, key: str, value: str) -> str:
+    brace, space = sample.find("{"), sample.find(" ")
+    if brace != -1 and brace < space:
+        return f'{sample[:brace + 1]}{key}="{value}",{sample[brace + 1:]}'.replace(",}", "}")
+    return f'{sample[:space]}{{{key}="{value}"}}{sample[space:]}'
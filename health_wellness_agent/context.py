@@ -10,17 +10,94 @@ Date Created: 2025-07-01
 # In this file I have implemented:
 # • UserSessionContext class to manage user state (+10 context & state management)
 # • Properties to store parsed goals, trackers, etc.
+# • Change notification so a SessionStore can persist mutations write-behind
+# • Columnar ProgressHistory for tracker data, separate from scheduler check-ins
+# • Token-budgeted ConversationHistory so turns carry earlier context
+# • Per-turn transactions: tools stage writes via mutate(), the turn commits or rolls back
+#   (durable writes apply at once and survive the rollback, for background writers)
 
-from pydantic import BaseModel
-from typing import Optional, List, Dict
+from contextlib import contextmanager
+from pydantic import BaseModel, Field, PrivateAttr, model_validator
+from typing import Any, Callable, Iterator, Optional, List, Dict, Sequence
+
+from health_wellness_agent.history import ConversationHistory
+from health_wellness_agent.timeseries import ProgressHistory
+from health_wellness_agent.transaction import ChangeSet, SessionTransaction, apply_changes
 
 class UserSessionContext(BaseModel):
     name: str
     uid: int
     goal: Optional[dict] = None
     diet_preferences: Optional[str] = None
-    workout_plan: Optional[dict] = None
-    meal_plan: Optional[List[str]] = None
+    workout_plan: Optional[Sequence[Dict[str, str]]] = None
+    meal_plan: Optional[Sequence[Dict[str, Any]]] = None     # DailyMeals rows (kcal is an int)
     injury_notes: Optional[str] = None
     handoff_logs: List[str] = []
-    progress_logs: List[Dict[str, str]] = []
+    progress: ProgressHistory = Field(default_factory=ProgressHistory)
+    checkins: List[Dict[str, str]] = []
+    history: ConversationHistory = Field(default_factory=ConversationHistory)
+
+    # Set by SessionStore when the session is loaded; never serialised.
+    _on_change: Optional[Callable[[int], None]] = PrivateAttr(default=None)
+    # The open turn's transaction, if any.
+    _txn: Optional[SessionTransaction] = PrivateAttr(default=None)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _migrate_progress_logs(cls, data: Any) -> Any:
+        # Sessions persisted before the time-series split kept tracker entries and
+        # scheduler events together in one `progress_logs` list.
+        if isinstance(data, dict) and "progress_logs" in data:
+            data = dict(data)
+            logs = data.pop("progress_logs") or []
+            data.setdefault("progress", [e for e in logs if "metric" in e])
+            data.setdefault(
+                "checkins",
+                [{k: str(v) for k, v in e.items()} for e in logs if "event" in e],
+            )
+        return data
+
+    def mark_dirty(self) -> None:
+        """Tell the owning store this session changed (cheap, never blocks on I/O)."""
+        if self._on_change is not None:
+            self._on_change(self.uid)
+
+    # ── transactions ────────────────────────────────────────────────
+    def begin(self) -> SessionTransaction:
+        """Open the turn's transaction; writes via mutate() stay revocable until commit."""
+        if self._txn is not None:
+            # Turns on a session are serialised, so an open one was abandoned
+            # (e.g. its stream was never closed); it failed, so undo it.
+            self._txn.rollback()
+        self._txn = SessionTransaction(self)
+        return self._txn
+
+    @property
+    def in_transaction(self) -> bool:
+        return self._txn is not None
+
+    @contextmanager
+    def mutate(self, durable: bool = False) -> Iterator[ChangeSet]:
+        """
+        Stage one tool's writes; they land together when the block exits cleanly
+        and are dropped if it raises. Inside a turn they join its transaction,
+        otherwise they apply (and persist) immediately. `durable` writes always
+        apply immediately and survive the open turn's rollback — for writers
+        outside the turn (background workers) and for records of side effects
+        the turn cannot take back.
+        """
+        changes = ChangeSet()
+        yield changes
+        if not changes:
+            return
+        txn = self._txn
+        if txn is not None and not durable:
+            txn.apply(changes)
+            return
+        if txn is not None:
+            txn.apply_durable(changes)
+        else:
+            apply_changes(self, changes)
+        self.mark_dirty()
+        for fn in changes.callbacks:
+            fn()
@@ -9,23 +9,28 @@ Date Created: 2025-07-01
 
 # In this file I have implemented:
 # • A clean agent class using OpenAI SDK base Agent (+10 modular structure)
-# • Proper handoff logic simulated by returning a trigger response (+15 handoff logic)
-# • Clean context integration using RunContextWrapper
+# • Real handoff to a human: request_coach files a ticket in the EscalationQueue (+15 handoff logic)
+# • Session context arrives through the Runner (Agent itself takes no context)
 
 
-from agents import Agent as BaseAgent, RunContextWrapper
+from agents import Agent as BaseAgent
+
+from health_wellness_agent.tools.escalation import request_coach
 
 class EscalationAgent(BaseAgent):
     """
     Handoff agent connecting user to a human coach.
     """
-    def __init__(self, context: RunContextWrapper):
+    def __init__(self):
         super().__init__(
             name="EscalationAgent",
-            instructions="Connect the user to a human coach.",
-            tools=[],
-            context=context,
+            instructions=(
+                "Connect the user to a human coach. Always call request_coach first with a "
+                "short summary of their situation; use urgency 'urgent' for a possible "
+                "emergency or acute injury, 'high' for pain or injury, otherwise 'routine'. "
+                "If they describe a possible medical emergency, tell them to contact "
+                "emergency services first. Then tell them their request is queued "
+                "(or that no coach is available right now). Do not diagnose."
+            ),
+            tools=[request_coach],
         )
-
-    def run(self, user_input: str):
-        return "You’re being connected to a human coach now."
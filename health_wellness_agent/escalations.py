@@ -0,0 +1,573 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: escalations.py
+Description: Human-coach escalation queue — prioritised, SLA-tracked tickets dispatched fairly
+to a pool of coach workers, with queue-depth and wait-time metrics.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • EscalationQueue: min-heap on (priority, SLA deadline) so urgent cases always go first
+#   and, within a class, the ticket closest to breaching its SLA goes next
+# • One open ticket per user — repeat requests merge and can only raise the priority
+# • Longest-idle-first dispatch across coach workers, with coaches reserved for urgent
+#   cases so their wait stays bounded when the general pool is saturated
+# • Failing handlers back off and retry, up to max_attempts, then the ticket closes as failed;
+#   only the wait for a coach to acknowledge a case is timed out, never the case itself
+# • Outcomes written to the session's handoff_logs; snapshot() / OpenMetrics for ops
+# • resize() for cluster rebalances; release() / adopt() hand a moving user's ticket to the
+#   new owner, so there is still one open ticket per user across workers
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, TextIO, Tuple
+
+PRIORITIES: Tuple[str, ...] = ("urgent", "high", "routine")
+DEFAULT_SLA: Dict[str, float] = {"urgent": 120.0, "high": 15 * 60.0, "routine": 4 * 3600.0}
+
+
+@dataclass
+class Ticket:
+    id: int
+    uid: int
+    priority: str
+    reason: str
+    created: float                      # queue clock (monotonic)
+    deadline: float                     # created + SLA of the current priority
+    opened_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec="seconds"))
+    status: str = "queued"              # queued → assigned (→ retrying → queued) → resolved | cancelled | failed | moved
+    coach: Optional[str] = None
+    held_by: Optional[str] = None       # placeholder: another worker's coach has this case
+    claimed: Optional[float] = None
+    outcome: Optional[str] = None
+    attempts: int = 0
+    acknowledged: Optional[float] = None
+    _ack: asyncio.Event = field(default_factory=asyncio.Event, repr=False, compare=False)
+
+    @property
+    def rank(self) -> int:
+        return PRIORITIES.index(self.priority)
+
+    def acknowledge(self) -> None:
+        """A coach has the case; from here on it may take as long as it needs."""
+        if self.acknowledged is None:
+            self.acknowledged = time.monotonic()
+        self._ack.set()
+
+
+# ────────────────────────────────────────────────────────────────────
+# Coach handlers
+# ────────────────────────────────────────────────────────────────────
+
+class CoachHandler:
+    """
+    Delivers a ticket to a human coach; returns the outcome once they are done.
+    Handlers that hand the case to a person should call `ticket.acknowledge()`
+    when that person picks it up, or the queue reassigns it after `ack_timeout`.
+    """
+
+    async def handle(self, coach: str, ticket: Ticket) -> str:
+        raise NotImplementedError
+
+
+class ConsoleCoach(CoachHandler):
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self.stream = stream or sys.stdout
+
+    async def handle(self, coach: str, ticket: Ticket) -> str:
+        self.stream.write(
+            f"[Escalation] #{ticket.id} uid={ticket.uid} ({ticket.priority}) → {coach}: "
+            f"{ticket.reason}\n"
+        )
+        self.stream.flush()
+        return "coach notified"
+
+
+class QueueCoach(CoachHandler):
+    """
+    Hands (coach, ticket, future) to an asyncio.Queue for a coach dashboard;
+    the dashboard calls `ticket.acknowledge()` when a coach opens the case and
+    sets the future's result to the outcome when it closes.
+    """
+
+    def __init__(self, queue: "asyncio.Queue[Tuple[str, Ticket, asyncio.Future]]") -> None:
+        self.queue = queue
+
+    async def handle(self, coach: str, ticket: Ticket) -> str:
+        done = asyncio.get_running_loop().create_future()
+        await self.queue.put((coach, ticket, done))
+        return await done
+
+
+# ────────────────────────────────────────────────────────────────────
+# Queue
+# ────────────────────────────────────────────────────────────────────
+
+class EscalationQueue:
+    """
+    Heap entries are `(rank, deadline, seq, ticket_id)`; raising a ticket's
+    priority pushes a fresh entry and the old one is skipped when popped.
+
+    Every coach that is waiting for work sits in one FIFO, so the coach idle
+    longest gets the next ticket. `reserved_urgent` coaches only take urgent
+    tickets: with r of them and urgent cases taking at most T each, an urgent
+    ticket with k urgent tickets ahead of it waits at most ceil((k + 1) / r) · T
+    even when every other coach is busy with routine work.
+
+    A case that nobody acknowledges within `ack_timeout`, or whose handler
+    fails, goes back in the queue after an exponential backoff; after
+    `max_attempts` deliveries it is closed as failed.
+
+    In a cluster, `owns` is the worker's shard filter: a ticket that closes
+    after its user moved to another worker is passed to `forward` instead of
+    being logged on a session this worker no longer holds.
+    """
+
+    def __init__(
+        self,
+        coaches: int | Sequence[str] = 4,
+        handler: Optional[CoachHandler] = None,
+        reserved_urgent: int = 1,
+        sla: Optional[Dict[str, float]] = None,
+        ack_timeout: float = 600.0,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+        max_retry_delay: float = 60.0,
+        store=None,
+        clock: Callable[[], float] = time.monotonic,
+        wait_window: int = 1024,
+    ) -> None:
+        names = [f"coach-{i + 1}" for i in range(coaches)] if isinstance(coaches, int) else list(coaches)
+        if not names:
+            raise ValueError("EscalationQueue needs at least one coach")
+        self.reserved_urgent = max(reserved_urgent, 0)
+        self.coaches: List[Tuple[str, bool]] = self._reserve(names)   # (name, urgent_only)
+        self.handler = handler or ConsoleCoach()
+        self.sla = {**DEFAULT_SLA, **(sla or {})}
+        self.ack_timeout = ack_timeout
+        self.max_attempts = max(1, max_attempts)
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.store = store
+        self.clock = clock
+        self.owns: Optional[Callable[[int], bool]] = None
+        self.forward: Optional[Callable[[Ticket], None]] = None
+
+        self._heap: List[Tuple[int, float, int, int]] = []
+        self._live: Dict[int, int] = {}                 # ticket id → seq of its heap entry
+        self._tickets: Dict[int, Ticket] = {}           # every open ticket, by id
+        self._open: Dict[int, Ticket] = {}              # uid → open ticket
+        self._idle: Deque[Tuple[str, bool, asyncio.Future]] = deque()
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._tasks: Dict[str, asyncio.Task] = {}        # coach → worker task
+        self._retries: Dict[int, asyncio.TimerHandle] = {}   # ticket id → pending requeue
+        self.waits: Dict[str, Deque[float]] = {p: deque(maxlen=wait_window) for p in PRIORITIES}
+        self.stats = {
+            "submitted": 0, "merged": 0, "upgraded": 0, "resolved": 0,
+            "cancelled": 0, "requeued": 0, "failed": 0, "sla_breaches": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    # ── submission ──────────────────────────────────────────────────
+    def submit(self, uid: int, reason: str, priority: str = "routine", session=None) -> Ticket:
+        """Open (or merge into) the user's ticket and dispatch it if a coach is free."""
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown priority {priority!r}")
+        now = self.clock()
+        ticket = self._open.get(uid)
+        if ticket is not None:
+            self.stats["merged"] += 1
+            if self._merge(ticket, reason, priority, now):
+                self._log(uid, f"escalation #{ticket.id} raised to {priority}: {reason}", session)
+            self._dispatch()
+            return ticket
+
+        ticket = Ticket(
+            id=next(self._ids), uid=uid, priority=priority, reason=reason,
+            created=now, deadline=now + self.sla[priority],
+        )
+        self._open[uid] = ticket
+        self._tickets[ticket.id] = ticket
+        self.stats["submitted"] += 1
+        self._push(ticket)
+        self._log(uid, f"escalation #{ticket.id} queued ({priority}): {reason}", session)
+        self._dispatch()
+        return ticket
+
+    def _merge(self, ticket: Ticket, reason: str, priority: str, now: float) -> bool:
+        """Fold a repeat request into the open ticket; True if it raised the priority."""
+        if reason and reason not in ticket.reason:
+            ticket.reason = f"{ticket.reason}; {reason}"
+        if PRIORITIES.index(priority) >= ticket.rank:
+            return False
+        self.stats["upgraded"] += 1
+        ticket.priority = priority
+        ticket.deadline = min(ticket.deadline, now + self.sla[priority])
+        if ticket.id in self._live:
+            self._push(ticket)
+        return True
+
+    def cancel(self, uid: int, reason: str = "cancelled by user") -> bool:
+        """Withdraw the user's ticket if no coach has picked it up yet."""
+        ticket = self._open.get(uid)
+        if ticket is None or ticket.status not in ("queued", "retrying"):
+            return False
+        self._live.pop(ticket.id, None)
+        retry = self._retries.pop(ticket.id, None)
+        if retry is not None:
+            retry.cancel()
+        self._close(ticket, "cancelled", reason)
+        self.stats["cancelled"] += 1
+        return True
+
+    def open_ticket(self, uid: int) -> Optional[Ticket]:
+        return self._open.get(uid)
+
+    def position(self, ticket: Ticket) -> int:
+        """How many queued tickets will be offered to a coach before this one."""
+        key = (ticket.rank, ticket.deadline)
+        return sum(
+            1 for tid in self._live
+            if (t := self._tickets[tid]) is not ticket and (t.rank, t.deadline) < key
+        )
+
+    # ── heap ────────────────────────────────────────────────────────
+    def _push(self, ticket: Ticket) -> None:
+        seq = next(self._seq)
+        self._live[ticket.id] = seq
+        heapq.heappush(self._heap, (ticket.rank, ticket.deadline, seq, ticket.id))
+
+    def _peek(self) -> Optional[Ticket]:
+        heap = self._heap
+        while heap and self._live.get(heap[0][3]) != heap[0][2]:
+            heapq.heappop(heap)                             # stale (upgraded / cancelled)
+        return self._tickets[heap[0][3]] if heap else None
+
+    def _pop(self) -> Ticket:
+        _, _, _, tid = heapq.heappop(self._heap)
+        del self._live[tid]
+        return self._tickets[tid]
+
+    # ── dispatch ────────────────────────────────────────────────────
+    def _dispatch(self) -> None:
+        """Match queued tickets to idle coaches, longest-idle coach first."""
+        while self._idle:
+            ticket = self._peek()
+            if ticket is None:
+                return
+            for i, (coach, urgent_only, fut) in enumerate(self._idle):
+                if fut.done():                              # worker was stopped
+                    continue
+                if urgent_only and ticket.priority != "urgent":
+                    continue
+                del self._idle[i]
+                fut.set_result(self._assign(self._pop(), coach))
+                break
+            else:
+                # Only urgent-reserved coaches are idle and the best ticket isn't urgent.
+                self._idle = deque(entry for entry in self._idle if not entry[2].done())
+                return
+
+    def _assign(self, ticket: Ticket, coach: str) -> Ticket:
+        now = self.clock()
+        ticket.status, ticket.coach, ticket.claimed = "assigned", coach, now
+        ticket.attempts += 1
+        if ticket.attempts == 1:
+            self.waits[ticket.priority].append(now - ticket.created)
+            if now > ticket.deadline:
+                self.stats["sla_breaches"] += 1
+        return ticket
+
+    async def _claim(self, coach: str, urgent_only: bool) -> Optional[Ticket]:
+        ticket = self._peek()
+        if ticket is not None and not self._idle and (not urgent_only or ticket.priority == "urgent"):
+            return self._assign(self._pop(), coach)
+        fut = asyncio.get_running_loop().create_future()
+        self._idle.append((coach, urgent_only, fut))
+        self._dispatch()
+        return await fut
+
+    async def _handle(self, coach: str, ticket: Ticket) -> str:
+        """The handler's outcome; only the wait for acknowledgement is capped."""
+        ticket._ack.clear()
+        task = asyncio.ensure_future(self.handler.handle(coach, ticket))
+        acked = asyncio.ensure_future(ticket._ack.wait())
+        try:
+            await asyncio.wait((task, acked), timeout=self.ack_timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not task.done() and not acked.done():
+                raise TimeoutError(f"not acknowledged within {self.ack_timeout:g}s")
+            return await task
+        finally:
+            acked.cancel()
+            task.cancel()                               # no-op once it has finished
+
+    async def _work(self, coach: str) -> None:
+        while True:
+            urgent_only = dict(self.coaches).get(coach)
+            if urgent_only is None:                     # retired by resize()
+                self._tasks.pop(coach, None)
+                return
+            ticket = await self._claim(coach, urgent_only)
+            if ticket is None:                          # woken by resize() to re-check its role
+                continue
+            try:
+                outcome = await self._handle(coach, ticket)
+            except asyncio.CancelledError:
+                self._requeue(ticket)
+                raise
+            except Exception as exc:
+                print(f"[EscalationQueue] {coach} failed on #{ticket.id}: {exc!r}")
+                self._retry(ticket)
+            else:
+                self._close(ticket, "resolved", outcome)
+                self.stats["resolved"] += 1
+            await asyncio.sleep(0)          # a handler that fails at once must not starve the loop
+
+    def _retry(self, ticket: Ticket) -> None:
+        """Back off, then requeue with the original deadline (first in line for its class)."""
+        if ticket.status != "assigned":
+            return
+        if ticket.attempts >= self.max_attempts:
+            self._close(ticket, "failed", f"no coach could take it after {ticket.attempts} attempts")
+            self.stats["failed"] += 1
+            return
+        ticket.status, ticket.coach, ticket.claimed = "retrying", None, None
+        delay = min(self.retry_delay * 2 ** (ticket.attempts - 1), self.max_retry_delay)
+        self._retries[ticket.id] = asyncio.get_running_loop().call_later(
+            delay, self._requeue, ticket
+        )
+
+    def _requeue(self, ticket: Ticket) -> None:
+        self._retries.pop(ticket.id, None)
+        if ticket.status not in ("assigned", "retrying"):
+            return
+        ticket.status, ticket.coach, ticket.claimed = "queued", None, None
+        self.stats["requeued"] += 1
+        self._push(ticket)
+        self._dispatch()
+
+    def _close(self, ticket: Ticket, status: str, outcome: str) -> None:
+        if ticket.status == "moved":                    # handed to another worker already
+            return
+        ticket.status, ticket.outcome = status, outcome
+        self._tickets.pop(ticket.id, None)
+        if self._open.get(ticket.uid) is ticket:
+            del self._open[ticket.uid]
+        if self.owns is not None and self.forward is not None and not self.owns(ticket.uid):
+            self.forward(ticket)                        # the user's session lives elsewhere now
+            return
+        by = f" by {ticket.coach}" if ticket.coach else ""
+        self._log(ticket.uid, f"escalation #{ticket.id} {status}{by}: {outcome}")
+
+    def _log(self, uid: int, message: str, session=None) -> None:
+        # Durable: coach workers log from their own tasks, and must not join (and be
+        # rolled back with) a turn the user happens to have open; a submit's ticket
+        # exists whatever that turn does, so its log entry stays too.
+        if session is None and self.store is not None:
+            session = self.store.get(uid)
+        if session is not None:
+            with session.mutate(durable=True) as changes:
+                changes.append("handoff_logs", message)
+
+    # ── cluster hand-over ───────────────────────────────────────────
+    def release(self, owns: Callable[[int], bool], holder: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Take the tickets of users this worker no longer owns out of the queue,
+        as records for the new owner's adopt(). A case one of our coaches is
+        working on stays here until it closes; with `holder` (this worker's
+        name) the new owner keeps a placeholder for it meanwhile, otherwise
+        (this worker is retiring) it is handed over to be delivered again.
+        """
+        now = self.clock()
+        records: List[Dict[str, Any]] = []
+        for uid, ticket in list(self._open.items()):
+            if owns(uid):
+                continue
+            record = {
+                "uid": uid, "priority": ticket.priority, "reason": ticket.reason,
+                "sla_left": max(0.0, ticket.deadline - now), "opened_at": ticket.opened_at,
+                "held_by": ticket.held_by,
+            }
+            if ticket.held_by is None and ticket.status == "assigned" and holder is not None:
+                records.append({**record, "held_by": holder})
+                continue
+            self._live.pop(ticket.id, None)
+            retry = self._retries.pop(ticket.id, None)
+            if retry is not None:
+                retry.cancel()
+            ticket.status = "moved"
+            self._tickets.pop(ticket.id, None)
+            del self._open[uid]
+            records.append(record)
+        return records
+
+    def adopt(self, records: Sequence[Dict[str, Any]], holder: Optional[str] = None) -> int:
+        """Take over tickets another worker released; returns how many were opened here."""
+        now = self.clock()
+        adopted = 0
+        for record in records:
+            uid, held_by = int(record["uid"]), record.get("held_by")
+            priority = record["priority"] if record.get("priority") in PRIORITIES else "routine"
+            ticket = self._open.get(uid)
+            if ticket is not None:
+                self._merge(ticket, str(record.get("reason", "")), priority, now)
+                continue
+            if held_by is not None and held_by == holder:
+                continue                                # our own case, already closed here
+            sla_left = float(record.get("sla_left", self.sla[priority]))
+            ticket = Ticket(
+                id=next(self._ids), uid=uid, priority=priority, reason=str(record.get("reason", "")),
+                created=now + sla_left - self.sla[priority], deadline=now + sla_left,
+            )
+            if record.get("opened_at"):
+                ticket.opened_at = str(record["opened_at"])
+            self._open[uid] = ticket
+            self._tickets[ticket.id] = ticket
+            if held_by is not None:
+                ticket.status, ticket.coach, ticket.held_by = "assigned", held_by, held_by
+            else:
+                self._push(ticket)
+            adopted += 1
+        self._dispatch()
+        return adopted
+
+    def close_held(self, uid: int, status: str, outcome: str, coach: Optional[str] = None) -> bool:
+        """The worker holding this user's case reports it closed; log it and free the user."""
+        ticket = self._open.get(uid)
+        if ticket is None or ticket.held_by is None:
+            return False
+        ticket.coach = coach or ticket.coach
+        self._close(ticket, status, outcome)
+        return True
+
+    # ── lifecycle ───────────────────────────────────────────────────
+    def _reserve(self, names: Sequence[str]) -> List[Tuple[str, bool]]:
+        reserved = min(self.reserved_urgent, len(names) - 1) if len(names) > 1 else 0
+        return [(name, i < reserved) for i, name in enumerate(names)]
+
+    def _spawn(self, coach: str) -> None:
+        self._tasks[coach] = asyncio.create_task(self._work(coach), name=f"escalation-{coach}")
+
+    def start(self) -> List[asyncio.Task]:
+        if not self._tasks:
+            for name, _ in self.coaches:
+                self._spawn(name)
+        return list(self._tasks.values())
+
+    def resize(self, coaches: int) -> None:
+        """
+        Grow or shrink the pool to `coaches` (e.g. this worker's share after a
+        rebalance). Retired coaches finish the case they have first.
+        """
+        names = [name for name, _ in self.coaches][:max(1, coaches)]
+        n = len(self.coaches)
+        while len(names) < coaches:
+            n += 1
+            if f"coach-{n}" not in names:
+                names.append(f"coach-{n}")
+        old = dict(self.coaches)
+        self.coaches = self._reserve(names)
+        if self._tasks:
+            for name, _ in self.coaches:
+                if name not in self._tasks:
+                    self._spawn(name)
+        roles = dict(self.coaches)
+        for coach, urgent_only, fut in self._idle:
+            if not fut.done() and roles.get(coach) != old.get(coach):
+                fut.set_result(None)                    # re-checks its role (or retires)
+        self._idle = deque(entry for entry in self._idle if not entry[2].done())
+        self._dispatch()
+
+    async def stop(self) -> None:
+        tasks, self._tasks = list(self._tasks.values()), {}
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for _, _, fut in self._idle:
+            fut.cancel()
+        self._idle.clear()
+
+    # ── metrics ─────────────────────────────────────────────────────
+    def depth(self) -> Dict[str, int]:
+        counts = {p: 0 for p in PRIORITIES}
+        for tid in self._live:
+            counts[self._tickets[tid].priority] += 1
+        return counts
+
+    def snapshot(self) -> Dict[str, object]:
+        now = self.clock()
+        oldest = {p: 0.0 for p in PRIORITIES}
+        for tid in self._live:
+            t = self._tickets[tid]
+            oldest[t.priority] = max(oldest[t.priority], now - t.created)
+        waits = {}
+        for p, samples in self.waits.items():
+            ordered = sorted(samples)
+            if ordered:
+                waits[p] = {
+                    "p50_s": round(ordered[len(ordered) // 2], 3),
+                    "p95_s": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+                    "max_s": round(ordered[-1], 3),
+                }
+        return {
+            "depth": self.depth(),
+            "oldest_wait_s": {p: round(v, 3) for p, v in oldest.items()},
+            "wait": waits,
+            "assigned": len(self._open) - len(self._live),
+            "idle_coaches": sum(1 for *_, fut in self._idle if not fut.done()),
+            "coaches": len(self.coaches),
+            **self.stats,
+        }
+
+    def openmetrics_lines(self, prefix: str = "hwa") -> List[str]:
+        """Gauges and counters in OpenMetrics text form, without the trailing # EOF."""
+        snap = self.snapshot()
+        lines = [f"# TYPE {prefix}_escalation_queue_depth gauge"]
+        lines += [f'{prefix}_escalation_queue_depth{{priority="{p}"}} {n}' for p, n in snap["depth"].items()]
+        lines.append(f"# TYPE {prefix}_escalation_oldest_wait_seconds gauge")
+        lines += [
+            f'{prefix}_escalation_oldest_wait_seconds{{priority="{p}"}} {v}'
+            for p, v in snap["oldest_wait_s"].items()
+        ]
+        lines.append(f"# TYPE {prefix}_escalation_wait_seconds summary")
+        for p, samples in self.waits.items():
+            ordered = sorted(samples)
+            for q in (0.5, 0.95):
+                if ordered:
+                    value = ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+                    lines.append(f'{prefix}_escalation_wait_seconds{{priority="{p}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{prefix}_escalation_wait_seconds_sum{{priority="{p}"}} {sum(ordered):.6f}')
+            lines.append(f'{prefix}_escalation_wait_seconds_count{{priority="{p}"}} {len(ordered)}')
+        for name in ("resolved", "requeued", "failed", "sla_breaches"):
+            lines.append(f"# TYPE {prefix}_escalation_{name} counter")
+            lines.append(f"{prefix}_escalation_{name}_total {self.stats[name]}")
+        return lines
+
+
+_ACTIVE: Optional[EscalationQueue] = None
+
+
+def install(queue: Optional[EscalationQueue]) -> None:
+    global _ACTIVE
+    _ACTIVE = queue
+
+
+def active_queue() -> Optional[EscalationQueue]:
+    return _ACTIVE
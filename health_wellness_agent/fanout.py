@@ -0,0 +1,190 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: fanout.py
+Description: Concurrent specialist fan-out — questions that span injury and nutrition go to
+both specialists at once under one deadline, and their answers are merged into one reply.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • select(): which specialists a message needs (what it mentions, plus what the profile
+#   already records when the user asks for a plan)
+# • SpecialistFanOut.stream(): every specialist runs concurrently; answers are streamed as
+#   sections in the order they finish, and stragglers are cancelled at the shared deadline
+# • consult(): the same, merged into one string for the consult_specialists tool
+# • install() / active_fanout(): the process-wide instance the tool uses (as escalations does)
+
+from __future__ import annotations
+
+import asyncio
+import os
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from agents import RunConfig, RunHooks, Runner
+
+from health_wellness_agent.guardrails import INJURY, SafetyClassifier, SafetyVerdict
+from health_wellness_agent.hooks import TracingRunHooks, new_run
+
+PANEL: Dict[str, str] = {                           # specialist → section heading
+    "InjurySupportAgent": "Injury & recovery",
+    "NutritionExpertAgent": "Nutrition",
+}
+
+_NUTRITION = re.compile(
+    r"\b(diabet\w*|blood sugar|insulin|glucose|a1c|vegan\w*|vegetarian\w*|allerg\w*|"
+    r"intoleran\w*|gluten|celiac|coeliac|lactose|cholesterol|nutrition\w*|diet\w*|"
+    r"meals?|food|eat(ing)?|calorie\w*|protein|carbs?|macros?)\b"
+)
+_PLAN = re.compile(r"\b(plan\w*|week\w*|schedule|routine|program\w*|what should i)\b")
+
+DEFAULT_DEADLINE = float(os.getenv("HWA_FANOUT_DEADLINE", "8.0"))
+
+
+def select(text: str, session: Any, verdict: Optional[SafetyVerdict] = None,
+           classifier: Optional[SafetyClassifier] = None) -> List[str]:
+    """
+    The specialists this message needs. A domain counts if the message raises
+    it, or if the profile records it and the user is asking for a plan.
+    """
+    text = text.lower()
+    if verdict is None:
+        verdict = (classifier or SafetyClassifier()).classify(text)
+    planning = bool(_PLAN.search(text))
+    panel = []
+    if verdict.category == INJURY or (planning and getattr(session, "injury_notes", None)):
+        panel.append("InjurySupportAgent")
+    if _NUTRITION.search(text) or (planning and getattr(session, "diet_preferences", None)):
+        panel.append("NutritionExpertAgent")
+    return panel
+
+
+def brief(session: Any) -> str:
+    """The profile facts a specialist needs, since it does not see the conversation."""
+    facts = []
+    goal = getattr(session, "goal", None)
+    if goal:
+        facts.append(f"goal: {goal.get('quantity', '')} {goal.get('metric', '')} "
+                     f"in {goal.get('duration', '')}".replace("  ", " "))
+    if getattr(session, "diet_preferences", None):
+        facts.append(f"diet: {session.diet_preferences}")
+    if getattr(session, "injury_notes", None):
+        facts.append(f"injuries: {session.injury_notes}")
+    return ("User profile — " + "; ".join(facts)) if facts else ""
+
+
+class SpecialistFanOut:
+    """
+    Ask several specialists at once. Total latency is the slowest answer that
+    makes the deadline, not the sum; an answer that misses it is cancelled
+    and the reply says which part is missing.
+    """
+
+    def __init__(
+        self,
+        deadline: float = DEFAULT_DEADLINE,
+        run_config: Optional[RunConfig] = None,
+        hooks: Optional[RunHooks] = None,
+        classifier: Optional[SafetyClassifier] = None,
+    ) -> None:
+        self.deadline = deadline
+        self.run_config = run_config
+        self.hooks = hooks
+        self.classifier = classifier or SafetyClassifier()
+        self.stats = {"fanouts": 0, "answered": 0, "timed_out": 0, "failed": 0}
+
+    def select(self, text: str, session: Any, verdict: Optional[SafetyVerdict] = None) -> List[str]:
+        return select(text, session, verdict, self.classifier)
+
+    async def _ask(self, name: str, question: str, session: Any) -> str:
+        from health_wellness_agent.agent import get_specialist
+        profile = brief(session)
+        run = new_run()                     # each specialist runs in its own task / context
+        try:
+            result = await Runner.run(
+                get_specialist(name),
+                input=f"{profile}\n\n{question}" if profile else question,
+                context=session,
+                run_config=self.run_config,
+                hooks=self.hooks,
+            )
+        finally:
+            if isinstance(self.hooks, TracingRunHooks):
+                self.hooks.end_run(run)
+        return str(result.final_output).strip()
+
+    async def stream(
+        self,
+        question: str,
+        session: Any,
+        names: Sequence[str],
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Yield ("agent", name) and ("delta", section) for each answer as it
+        lands, a note for any that missed the deadline, then ("message_end", "").
+        """
+        loop = asyncio.get_running_loop()
+        stop_at = loop.time() + (self.deadline if deadline is None else deadline)
+        tasks = {asyncio.ensure_future(self._ask(name, question, session)): name for name in names}
+        pending = set(tasks)
+        self.stats["fanouts"] += 1
+        try:
+            while pending:
+                remaining = stop_at - loop.time()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    name = tasks[task]
+                    try:
+                        text = task.result()
+                    except Exception as exc:
+                        self.stats["failed"] += 1
+                        print(f"[FanOut] {name} failed: {exc}")
+                        continue
+                    self.stats["answered"] += 1
+                    yield "agent", name
+                    yield "delta", f"### {PANEL.get(name, name)}\n{text}\n\n"
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        missing = [tasks[t] for t in pending] + [
+            tasks[t] for t in tasks if t.done() and not t.cancelled() and t.exception() is not None
+        ]
+        self.stats["timed_out"] += len(pending)
+        if missing:
+            parts = " and ".join(PANEL.get(n, n).lower() for n in missing)
+            yield "delta", f"_(No {parts} advice this time — ask again and I'll get it.)_\n"
+        yield "message_end", ""
+
+    async def consult(self, question: str, session: Any, names: Sequence[str],
+                      deadline: Optional[float] = None) -> str:
+        """Every specialist's answer merged into one text (for a tool result)."""
+        parts = [text async for kind, text in self.stream(question, session, names, deadline)
+                 if kind == "delta"]
+        return "".join(parts).strip()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"deadline_s": self.deadline, **self.stats}
+
+
+_ACTIVE: Optional[SpecialistFanOut] = None
+
+
+def install(fanout: Optional[SpecialistFanOut]) -> None:
+    global _ACTIVE
+    _ACTIVE = fanout
+
+
+def active_fanout() -> SpecialistFanOut:
+    """The installed fan-out, or a default one (default model provider) if none is."""
+    global _ACTIVE
+    if _ACTIVE is None:
+        _ACTIVE = SpecialistFanOut()
+    return _ACTIVE
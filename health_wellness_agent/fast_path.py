@@ -0,0 +1,161 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: fast_path.py
+Description: Rule-based intent/slot parser that answers clearly structured requests
+(reminders, progress logs, weight goals) locally, without a model round trip.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Anchored regex grammars that fill SchedulerInput / ProgressInput / GoalInput
+# • Direct invocation of the scheduler / tracker / goal_analyzer logic + templated replies
+# • Fall-through to the model for anything ambiguous, with hit-rate counters
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+from pydantic import ValidationError
+
+from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.tools.goal_analyzer import GoalInput, store_goal
+from health_wellness_agent.tools.scheduler import SchedulerInput, schedule_checkin
+from health_wellness_agent.tools.tracker import ProgressInput, record_progress
+
+_WEEKDAYS = {
+    "mon": "monday", "tue": "tuesday", "tues": "tuesday", "wed": "wednesday",
+    "thu": "thursday", "thur": "thursday", "thurs": "thursday", "fri": "friday",
+    "sat": "saturday", "sun": "sunday",
+}
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12,
+}
+_UNITS = {
+    "kg": "kg", "kgs": "kg", "kilo": "kg", "kilos": "kg", "kilograms": "kg",
+    "lb": "lbs", "lbs": "lbs", "pound": "lbs", "pounds": "lbs",
+}
+
+# Anchored end to end: extra clauses ("... and make me a meal plan") fall through.
+_SCHEDULE = re.compile(
+    r"^(?:please\s+)?(?:remind\s+me|check\s+in(?:\s+with\s+me)?|schedule\s+(?:a\s+)?check-?in)"
+    r"\s+(?:every\s+|on\s+)?(?P<day>mon|tues?|wed|thu(?:rs?)?|fri|sat|sun)(?:day|nesday|urday)?s?"
+    r"(?:\s+(?:at\s+)?(?P<hour>\d{1,2})(?::00)?\s*(?P<ampm>am|pm)?)?"
+    r"(?:\s+please)?\s*[.!]?$",
+    re.IGNORECASE,
+)
+_LOG = re.compile(
+    r"^(?:please\s+)?(?:log|record|track)\s+(?:my\s+)?(?P<metric>[a-z][a-z _-]{1,30}?)"
+    r"\s*(?:is|was|of|at|=|:)?\s*(?P<value>\d+(?:\.\d+)?)\s*(?P<unit>[a-z%]{1,8})?\s*[.!]?$",
+    re.IGNORECASE,
+)
+_GOAL = re.compile(
+    r"^(?:i\s+(?:want|need|would\s+like)\s+to\s+|i'd\s+like\s+to\s+|help\s+me\s+|my\s+goal\s+is\s+to\s+)?"
+    r"(?P<verb>lose|drop|gain|put\s+on)\s+(?P<qty>\d+(?:\.\d+)?)\s*(?P<unit>[a-z]+)"
+    r"\s+(?:in|over|within)\s+(?:the\s+next\s+)?(?P<n>\d+|[a-z]+)\s+(?P<span>days?|weeks?|months?|years?)"
+    r"\s*[.!]?$",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class FastPathResult:
+    intent: str
+    reply: str
+
+
+class FastPathRouter:
+    """
+    Tries each grammar in turn; a turn is only handled when a grammar matches
+    the *whole* message and the slots validate against the tool's Pydantic
+    model. Everything else returns None and goes to the model.
+    """
+
+    def __init__(self) -> None:
+        self.stats: Dict[str, int] = {"turns": 0, "handled": 0}
+        self._handlers: Dict[str, Callable[[UserSessionContext, str], Optional[str]]] = {
+            "scheduler": self._schedule,
+            "tracker": self._log,
+            "goal_analyzer": self._goal,
+        }
+
+    @property
+    def hit_rate(self) -> float:
+        return self.stats["handled"] / self.stats["turns"] if self.stats["turns"] else 0.0
+
+    def try_handle(self, session: UserSessionContext, text: str) -> Optional[FastPathResult]:
+        self.stats["turns"] += 1
+        text = " ".join(text.split())
+        for intent, handler in self._handlers.items():
+            try:
+                reply = handler(session, text)
+            except ValidationError:
+                reply = None
+            if reply is not None:
+                self.stats["handled"] += 1
+                self.stats[intent] = self.stats.get(intent, 0) + 1
+                return FastPathResult(intent, reply)
+        return None
+
+    # ── grammars ────────────────────────────────────────────────────
+    @staticmethod
+    def _schedule(session: UserSessionContext, text: str) -> Optional[str]:
+        m = _SCHEDULE.match(text)
+        if not m:
+            return None
+        hour = 9
+        if m["hour"]:
+            hour = int(m["hour"])
+            ampm = (m["ampm"] or "").lower()
+            if ampm == "pm" and hour < 12:
+                hour += 12
+            elif ampm == "am" and hour == 12:
+                hour = 0
+        day = _WEEKDAYS[m["day"].lower()]
+        out = schedule_checkin(session, SchedulerInput(weekday=day, hour_24=hour))
+        return (
+            f"Done — I'll check in every {day.capitalize()} at {hour:02d}:00. "
+            f"Next check-in: {out['next_checkin'][:16].replace('T', ' ')}."
+        )
+
+    @staticmethod
+    def _log(session: UserSessionContext, text: str) -> Optional[str]:
+        m = _LOG.match(text)
+        if not m:
+            return None
+        metric = m["metric"].strip().replace(" ", "_").replace("-", "_").lower()
+        unit = (m["unit"] or "").lower()
+        notes = f"unit: {unit}" if unit else None
+        out = record_progress(
+            session, ProgressInput(metric=metric, value=float(m["value"]), notes=notes)
+        )
+        shown = f"{m['value']} {unit}".strip()
+        return f"Logged {metric.replace('_', ' ')}: {shown} ({out['log_count']} entries so far)."
+
+    @staticmethod
+    def _goal(session: UserSessionContext, text: str) -> Optional[str]:
+        m = _GOAL.match(text)
+        if not m:
+            return None
+        unit = _UNITS.get(m["unit"].lower())
+        n = m["n"].lower()
+        count = int(n) if n.isdigit() else _NUMBER_WORDS.get(n)
+        if unit is None or not count:
+            return None
+        span = m["span"].lower().rstrip("s")
+        duration = f"{count} {span}{'s' if count != 1 else ''}"
+        verb = " ".join(m["verb"].lower().split())
+        direction = "gain" if verb in ("gain", "put on") else "lose"
+        out = store_goal(
+            session,
+            GoalInput(quantity=float(m["qty"]), metric=unit, duration=duration, direction=direction),
+        )
+        goal = out["parsed_goal"]
+        return (
+            f"Goal saved: {verb} {goal['quantity']:g} {goal['metric']} in {goal['duration']}. "
+            "Want a meal or workout plan to go with it?"
+        )
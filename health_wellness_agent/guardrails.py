@@ -2,7 +2,8 @@
 # SPDX-License-Identifier: MIT
 """
 Filename: guardrails.py
-Description: Adds input validation logic using Pydantic models.
+Description: Adds input validation logic using Pydantic models, and a fast local safety
+classifier that routes injury / medical-emergency messages to the right specialist.
 Author: Zohaib Javed
 Date Created: 2025-07-01
 """
@@ -10,6 +11,14 @@ Date Created: 2025-07-01
 # In this file I have implemented:
 # • Pydantic models for goal parsing and type safety (+15 guardrails)
 # • Clean input/output validation for tools and agents
+# • SafetyClassifier: Aho–Corasick keyword automaton + a small rule set (negation,
+#   prevention questions, pain needs a body part) → emergency / medical / injury
+# • safety_guardrail(): the classifier as an SDK InputGuardrail that trips with a route
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 from pydantic import BaseModel, Field
 
@@ -21,3 +30,227 @@ class GoalInput(BaseModel):
 
 class ToolOutput(BaseModel):
     data: dict
+
+
+# ────────────────────────────────────────────────────────────────────
+# Safety lexicon
+# ────────────────────────────────────────────────────────────────────
+# A trailing "*" matches any word ending ("injur*" → injury, injured, injuries).
+
+EMERGENCY = "emergency"
+MEDICAL = "medical"
+INJURY = "injury"
+PAIN = "pain"                       # injury only when a body part is named alongside
+
+_LEXICON: Dict[str, Tuple[str, ...]] = {
+    EMERGENCY: (
+        "chest pain", "chest pains", "chest tightness", "tight chest", "crushing chest",
+        "can't breathe", "cannot breathe", "can not breathe", "unable to breathe",
+        "trouble breathing", "difficulty breathing", "struggling to breathe",
+        "heart attack", "face drooping", "slurred speech", "passed out", "fainted",
+        "blacked out", "unconscious", "seizure*", "overdos*", "suicid*", "kill myself",
+        "end my life", "self harm", "self-harm", "harm myself", "harming myself",
+        "anaphyla*", "throat is closing", "throat closing", "coughing blood",
+        "coughing up blood", "vomiting blood", "severe bleeding", "won't stop bleeding",
+    ),
+    MEDICAL: (
+        "dizzy", "dizziness", "lightheaded", "light-headed", "palpitation*",
+        "irregular heartbeat", "heart racing", "eating disorder", "bulimi*", "anorexi*",
+        "binge and purge", "purging", "starving myself", "numbness", "numb", "tingling",
+    ),
+    INJURY: (
+        "injur*", "sprain*", "strained", "pulled a muscle", "pulled muscle", "pulled my",
+        "torn", "tore my", "fractur*", "broke my", "broken", "dislocat*", "tendinitis",
+        "tendonitis", "bursitis", "plantar fasciitis", "shin splints", "sciatica",
+        "herniated", "slipped disc", "whiplash", "rotator cuff", "tennis elbow",
+        "runner's knee", "hurt my", "hurts", "it hurts", "swollen",
+    ),
+    PAIN: ("pain", "pains", "painful", "ache", "aches", "aching", "achy", "hurting"),
+}
+
+_ROUTES: Dict[str, str] = {
+    EMERGENCY: "EscalationAgent",
+    MEDICAL: "EscalationAgent",
+    INJURY: "InjurySupportAgent",
+}
+_PRIORITY = (EMERGENCY, MEDICAL, INJURY)
+
+EMERGENCY_NOTICE = (
+    "This sounds like it could be a medical emergency. Please call your local emergency "
+    "number (e.g. 911 / 112 / 999) or get to the nearest emergency department now. "
+    "I'm connecting you with a human coach."
+)
+
+_NEGATIONS = frozenset({"no", "not", "never", "without", "zero", "free", "isn't", "wasn't", "don't"})
+_PREVENTION = frozenset({"avoid", "avoiding", "prevent", "preventing", "prevention", "risk", "reduce"})
+_BODY_PARTS = frozenset({
+    "knee", "knees", "back", "spine", "neck", "shoulder", "shoulders", "wrist", "wrists",
+    "ankle", "ankles", "foot", "feet", "heel", "hip", "hips", "elbow", "elbows", "shin",
+    "shins", "hamstring", "hamstrings", "calf", "calves", "groin", "arm", "arms", "leg",
+    "legs", "joint", "joints", "muscle", "muscles", "tendon", "achilles", "quad", "quads",
+})
+_WORD = re.compile(r"[a-z0-9']+")
+_SENTENCE = re.compile(r"[.!?;\n]+")
+
+
+# ────────────────────────────────────────────────────────────────────
+# Keyword automaton
+# ────────────────────────────────────────────────────────────────────
+
+class KeywordAutomaton:
+    """
+    Aho–Corasick over characters: every phrase is found in one left-to-right
+    pass, however many phrases there are. Matches must start and (unless the
+    phrase ends in "*") end on a word boundary.
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, str]]) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[str, str, int, bool]]] = [[]]
+        for phrase, label in phrases:
+            prefix = phrase.endswith("*")
+            text = phrase.rstrip("*")
+            node = 0
+            for ch in text:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append((text, label, len(text), prefix))
+
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int, str, str]]:
+        """(start, end, phrase, label) for every boundary-respecting match."""
+        found = []
+        node, n = 0, len(text)
+        goto, fail, out = self._goto, self._fail, self._out
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for phrase, label, length, prefix in out[node]:
+                start, end = i - length + 1, i + 1
+                if start > 0 and text[start - 1].isalnum():
+                    continue
+                if not prefix and end < n and text[end].isalnum():
+                    continue
+                found.append((start, end, phrase, label))
+        return found
+
+
+# ────────────────────────────────────────────────────────────────────
+# Classifier
+# ────────────────────────────────────────────────────────────────────
+
+class SafetyVerdict(NamedTuple):
+    category: Optional[str] = None          # emergency / medical / injury
+    route: Optional[str] = None             # specialist agent name
+    matches: Tuple[str, ...] = ()
+    notice: Optional[str] = None            # shown before the specialist answers
+
+    @property
+    def tripped(self) -> bool:
+        return self.route is not None
+
+
+SAFE = SafetyVerdict()
+
+
+class SafetyClassifier:
+    """
+    Keyword hits filtered by a few rules, evaluated per sentence:
+      • a negation just before the hit ("no pain", "pain-free") discards it
+      • prevention questions ("how do I avoid injury?") discard injury hits
+      • bare pain words count as injury only next to a body part ("my knee aches")
+    Emergency outranks medical, which outranks injury.
+    """
+
+    NEGATION_WINDOW = 3     # words
+
+    def __init__(self, lexicon: Dict[str, Tuple[str, ...]] = _LEXICON) -> None:
+        self.automaton = KeywordAutomaton(
+            (phrase, label) for label, phrases in lexicon.items() for phrase in phrases
+        )
+        self.stats = {"checked": 0, EMERGENCY: 0, MEDICAL: 0, INJURY: 0}
+
+    def _negated(self, sentence: str, start: int, end: int) -> bool:
+        before = _WORD.findall(sentence[:start])[-self.NEGATION_WINDOW:]
+        return bool(_NEGATIONS.intersection(before)) or sentence[end:end + 5] == "-free"
+
+    def classify(self, text: str) -> SafetyVerdict:
+        self.stats["checked"] += 1
+        text = text.lower().replace("’", "'")
+        hits: Dict[str, List[str]] = {}
+        for sentence in _SENTENCE.split(text):
+            matches = self.automaton.find(sentence)
+            if not matches:
+                continue
+            words = set(_WORD.findall(sentence))
+            preventive = bool(_PREVENTION & words)
+            for start, end, phrase, label in matches:
+                if self._negated(sentence, start, end):
+                    continue
+                if label == PAIN:
+                    if not _BODY_PARTS & words:
+                        continue
+                    label = INJURY
+                if label == INJURY and preventive:
+                    continue
+                hits.setdefault(label, []).append(phrase)
+
+        for category in _PRIORITY:
+            if category in hits:
+                self.stats[category] += 1
+                return SafetyVerdict(
+                    category, _ROUTES[category], tuple(hits[category]),
+                    EMERGENCY_NOTICE if category == EMERGENCY else None,
+                )
+        return SAFE
+
+    def guardrail(self):
+        """This classifier as an SDK input guardrail (trips with the verdict as output_info)."""
+        return safety_guardrail(self)
+
+
+def _latest_user_text(input) -> str:
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content")
+            if isinstance(content, list):
+                content = " ".join(c.get("text", "") for c in content if isinstance(c, dict))
+            return str(content or "")
+    return ""
+
+
+def safety_guardrail(classifier: Optional[SafetyClassifier] = None):
+    """
+    InputGuardrail named "safety_router". Only the newest user message is
+    classified, so earlier turns about an old injury don't keep re-routing.
+    """
+    from agents import GuardrailFunctionOutput, input_guardrail
+
+    classifier = classifier or SafetyClassifier()
+
+    @input_guardrail(name="safety_router")
+    def _screen(ctx, agent, input) -> GuardrailFunctionOutput:
+        verdict = classifier.classify(_latest_user_text(input))
+        return GuardrailFunctionOutput(output_info=verdict, tripwire_triggered=verdict.tripped)
+
+    return _screen
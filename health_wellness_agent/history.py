@@ -0,0 +1,173 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: history.py
+Description: Token-budgeted conversation history attached to UserSessionContext, keeping
+recent turns verbatim and folding older turns and bulky tool outputs into summaries.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • ConversationHistory (pydantic, persisted with the session) with running token counts
+# • Compaction of large tool outputs (7-day meal/workout plans) into one-line references,
+#   keeping the digest of compact-encoded plans
+# • Incremental folding of the oldest turns into a bounded summary under a token budget
+
+from __future__ import annotations
+
+import ast
+import json
+import re
+from typing import Any, Dict, List
+
+from pydantic import BaseModel
+
+
+_ENCODED_HEAD = re.compile(r"^\w+#[0-9a-f]{8} rows=\d+ ")
+_ENCODED_SCALAR = re.compile(r"^\w+: ")
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token; cheap and close enough for budgeting."""
+    return len(text) // 4 + 1
+
+
+def _item_text(item: Dict[str, Any]) -> str:
+    """Plain text of a Responses input item, for counting and summarising."""
+    content = item.get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(
+            str(c.get("text") or c.get("refusal") or "") for c in content if isinstance(c, dict)
+        )
+    if item.get("type") == "function_call":
+        return f"{item.get('name', '')}({item.get('arguments', '')})"
+    if item.get("type") == "function_call_output":
+        return str(item.get("output", ""))
+    return ""
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1] + "…"
+
+
+def compact_tool_output(output: str, max_tokens: int) -> str:
+    """Replace an oversized tool result with a short description of what it held."""
+    if estimate_tokens(output) <= max_tokens:
+        return output
+    head, *lines = output.split("\n")
+    if _ENCODED_HEAD.match(head):                # tools/encoding.py table: keep the reference
+        scalars = [_shorten(line, 60) for line in lines if _ENCODED_SCALAR.match(line)]
+        return "[compacted tool output] " + "; ".join(
+            [head.split(" cols=")[0] + " (stored in session context)", *scalars]
+        )
+    try:
+        data = json.loads(output)
+    except ValueError:
+        try:                                    # the SDK sends str(dict) for dict results
+            data = ast.literal_eval(output)
+        except (ValueError, SyntaxError):
+            data = None
+    if isinstance(data, dict):
+        parts = []
+        for key, value in data.items():
+            if isinstance(value, (list, tuple)):
+                parts.append(f"{key}: {len(value)} entries (stored in session context)")
+            else:
+                parts.append(f"{key}: {_shorten(json.dumps(value, default=str), 60)}")
+        return "[compacted tool output] " + "; ".join(parts)
+    return "[compacted tool output] " + _shorten(output, max_tokens * 2)
+
+
+class HistoryTurn(BaseModel):
+    items: List[Dict[str, Any]]
+    tokens: int
+
+
+class ConversationHistory(BaseModel):
+    """
+    Recent turns are replayed verbatim; when the running total exceeds
+    `token_budget`, the oldest turns (beyond `keep_recent_turns`) are folded
+    into `summary`. Only newly recorded items are ever tokenised.
+    """
+    token_budget: int = 3000
+    keep_recent_turns: int = 3
+    max_tool_output_tokens: int = 150
+    max_summary_lines: int = 20
+
+    summary: List[str] = []
+    summary_tokens: int = 0
+    turns: List[HistoryTurn] = []
+    total_tokens: int = 0
+
+    def build_input(self, prompt: str) -> List[Dict[str, Any]]:
+        """Input items for the next turn: summary, recent turns, then the new prompt."""
+        items: List[Dict[str, Any]] = []
+        if self.summary:
+            items.append({
+                "role": "system",
+                "content": "Summary of earlier conversation:\n" + "\n".join(self.summary),
+            })
+        for turn in self.turns:
+            items.extend(turn.items)
+        items.append({"role": "user", "content": prompt})
+        return items
+
+    def record_turn(self, prompt: str, new_items: List[Dict[str, Any]]) -> None:
+        """Append one finished turn (user prompt + run items) and compact if needed."""
+        items: List[Dict[str, Any]] = [{"role": "user", "content": prompt}]
+        for item in new_items:
+            if item.get("type") == "function_call_output":
+                item = dict(item)
+                item["output"] = compact_tool_output(
+                    str(item.get("output", "")), self.max_tool_output_tokens
+                )
+            items.append(item)
+        tokens = sum(estimate_tokens(_item_text(i)) + 4 for i in items)
+        self.turns.append(HistoryTurn(items=items, tokens=tokens))
+        self.total_tokens += tokens
+        self._compact()
+
+    def clear(self) -> None:
+        self.summary, self.turns = [], []
+        self.summary_tokens = self.total_tokens = 0
+
+    # ── internals ───────────────────────────────────────────────────
+    def _compact(self) -> None:
+        while self.total_tokens > self.token_budget and len(self.turns) > self.keep_recent_turns:
+            turn = self.turns.pop(0)
+            self.total_tokens -= turn.tokens
+            line = self._summarise(turn)
+            line_tokens = estimate_tokens(line)
+            self.summary.append(line)
+            self.summary_tokens += line_tokens
+            self.total_tokens += line_tokens
+
+        # Recent turns are never dropped; if they alone blow the budget, shed summary.
+        while self.summary and (
+            len(self.summary) > self.max_summary_lines or self.total_tokens > self.token_budget
+        ):
+            dropped = estimate_tokens(self.summary.pop(0))
+            self.summary_tokens -= dropped
+            self.total_tokens -= dropped
+
+    @staticmethod
+    def _summarise(turn: HistoryTurn) -> str:
+        user = assistant = ""
+        tools: List[str] = []
+        for item in turn.items:
+            if item.get("role") == "user" and not user:
+                user = _item_text(item)
+            elif item.get("role") == "assistant":
+                assistant = _item_text(item)
+            elif item.get("type") == "function_call":
+                tools.append(str(item.get("name", "")))
+        line = f"- User: {_shorten(user, 100)}"
+        if tools:
+            line += f" | tools: {', '.join(tools)}"
+        if assistant:
+            line += f" | Assistant: {_shorten(assistant, 140)}"
+        return line
@@ -2,28 +2,224 @@
 # SPDX-License-Identifier: MIT
 """
 Filename: hooks.py
-Description: Implements lifecycle hooks for logging agent/tool activity.
+Description: Implements lifecycle hooks that trace agent/tool/handoff activity into spans
+and latency histograms.
 Author: Zohaib Javed
 Date Created: 2025-07-01
 """
 
 # In this file I have implemented:
-# • Agent and tool lifecycle hook classes (+10 lifecycle hook usage)
-# • Real-time event logging for agent/tool start/end
+# • Run lifecycle hooks (+10 lifecycle hook usage) that record spans instead of printing
+# • Bounded ring buffer of recent spans (deque appends are atomic, no explicit lock)
+# • Per-agent / per-tool / per-handoff latency histograms and error counters
+# • Export as OpenMetrics text or JSONL
+# • Open spans are keyed by run (new_run()), and end_run() closes whatever a cancelled
+#   run left open, so a long-lived server never accumulates them
 
-from agents import RunHooks, AgentHooks
+from __future__ import annotations
+
+import contextvars
+import itertools
+import json
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from agents import RunHooks
 from health_wellness_agent.context import UserSessionContext
 
-class LoggingRunHooks(RunHooks):
-    def on_agent_start(self, agent, context):
-        print(f"[HOOK] {agent.name} starting")
+# Prometheus-style latency bucket upper bounds, in seconds.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+_TOOL_ERROR_PREFIX = "An error occurred while running the tool"
+
+
+class Span(NamedTuple):
+    kind: str               # "agent" | "tool" | "handoff"
+    name: str
+    agent: str
+    start_ns: int
+    end_ns: int
+    error: bool = False
+
+    @property
+    def seconds(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e9
+
+
+class LatencyHistogram:
+    """Fixed-bucket cumulative histogram; `observe` is one bisect and two adds."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)      # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        target, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+
+class TraceCollector:
+    """Keeps the last `capacity` spans and aggregates every span into histograms."""
+
+    def __init__(self, capacity: int = 10_000, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.spans: Deque[Span] = deque(maxlen=capacity)
+        self.buckets = buckets
+        self.histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+        self.errors: Counter = Counter()
+
+    def record(self, span: Span) -> None:
+        self.spans.append(span)
+        key = (span.kind, span.name)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = LatencyHistogram(self.buckets)
+        hist.observe(span.seconds)
+        if span.error:
+            self.errors[key] += 1
+
+    # ── export ──────────────────────────────────────────────────────
+    def to_openmetrics(self, prefix: str = "hwa") -> str:
+        lines = [
+            f"# TYPE {prefix}_span_seconds histogram",
+            f"# HELP {prefix}_span_seconds Latency of agent turns, tool calls and handoffs.",
+        ]
+        for (kind, name), h in sorted(self.histograms.items()):
+            labels = f'kind="{kind}",name="{_escape(name)}"'
+            cumulative = 0
+            for bound, c in zip(self.buckets, h.counts):
+                cumulative += c
+                lines.append(f'{prefix}_span_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_span_seconds_bucket{{{labels},le="+Inf"}} {h.count}')
+            lines.append(f"{prefix}_span_seconds_sum{{{labels}}} {h.sum:.6f}")
+            lines.append(f"{prefix}_span_seconds_count{{{labels}}} {h.count}")
+        lines.append(f"# TYPE {prefix}_span_errors counter")
+        for (kind, name), n in sorted(self.errors.items()):
+            lines.append(f'{prefix}_span_errors_total{{kind="{kind}",name="{_escape(name)}"}} {n}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def iter_jsonl(self) -> Iterable[str]:
+        for s in list(self.spans):
+            yield json.dumps({
+                "kind": s.kind, "name": s.name, "agent": s.agent,
+                "start_ns": s.start_ns, "duration_ms": round(s.seconds * 1000, 3),
+                "error": s.error,
+            })
+
+    def dump_jsonl(self, path: str) -> int:
+        n = 0
+        with open(path, "a", encoding="utf-8") as fh:
+            for line in self.iter_jsonl():
+                fh.write(line + "\n")
+                n += 1
+        return n
+
+
+_RUN: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("hwa_run", default=None)
+_RUN_IDS = itertools.count(1)
+
+
+def new_run() -> int:
+    """
+    Give the runs started from this context on a fresh id (the SDK's run task
+    inherits it); hooks key open spans on it. Returns the id for end_run().
+    """
+    run = next(_RUN_IDS)
+    _RUN.set(run)
+    return run
+
+
+def _sid(context) -> Any:
+    # Tool hooks get a fresh ToolContext per call, so key spans on the run; runs
+    # started without new_run() fall back to the shared session object.
+    run = _RUN.get()
+    return run if run is not None else id(getattr(context, "context", context))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+DEFAULT_COLLECTOR = TraceCollector()
+
+
+class TracingRunHooks(RunHooks[UserSessionContext]):
+    """
+    Records spans for every agent turn, tool call and handoff. Open spans are
+    keyed by run (and tool call id), so one instance can be shared by
+    concurrent sessions; call end_run() when a run finishes or is cancelled.
+    """
+
+    def __init__(self, collector: Optional[TraceCollector] = None) -> None:
+        self.collector = collector or DEFAULT_COLLECTOR
+        self._open: Dict[Any, Tuple[str, str, int]] = {}
+
+    async def on_agent_start(self, context, agent) -> None:
+        now = time.perf_counter_ns()
+        pending = self._open.pop(("handoff", _sid(context)), None)
+        if pending is not None:
+            name, source, start = pending
+            self.collector.record(Span("handoff", name, source, start, now))
+        self._open[("agent", _sid(context), agent.name)] = (agent.name, agent.name, now)
+
+    async def on_agent_end(self, context, agent, output) -> None:
+        self._close(("agent", _sid(context), agent.name), "agent")
+        # Tool spans still open when the agent finishes never reported an end.
+        for key in [k for k in self._open if k[0] == "tool" and k[1] == _sid(context)]:
+            self._close(key, "tool", error=True)
+
+    async def on_handoff(self, context, from_agent, to_agent) -> None:
+        now = time.perf_counter_ns()
+        self._close(("agent", _sid(context), from_agent.name), "agent", now)
+        self._open[("handoff", _sid(context))] = (
+            f"{from_agent.name}->{to_agent.name}", from_agent.name, now,
+        )
+
+    async def on_tool_start(self, context, agent, tool) -> None:
+        call_id = getattr(context, "tool_call_id", None) or tool.name
+        self._open[("tool", _sid(context), call_id)] = (
+            tool.name, agent.name, time.perf_counter_ns(),
+        )
 
-    def on_tool_end(self, tool, output, context):
-        print(f"[HOOK] {tool.name} returned {output}")
+    async def on_tool_end(self, context, agent, tool, result) -> None:
+        call_id = getattr(context, "tool_call_id", None) or tool.name
+        error = isinstance(result, str) and result.startswith(_TOOL_ERROR_PREFIX)
+        self._close(("tool", _sid(context), call_id), "tool", error=error)
 
-class LoggingAgentHooks(AgentHooks):
-    def on_start(self, agent, input, context):
-        print(f"[AGENT HOOK] Received: {input}")
+    def end_run(self, run: int) -> int:
+        """Close the spans `run` left open (a cancelled run never reports an end) as errors."""
+        leftover = [k for k in self._open if k[1] == run]
+        now = time.perf_counter_ns()
+        for key in leftover:
+            self._close(key, key[0], now, error=True)
+        return len(leftover)
 
-    def on_end(self, agent, response, context):
-        print(f"[AGENT HOOK] Responded: {response}")
+    def _close(self, key, kind: str, now: Optional[int] = None, error: bool = False) -> None:
+        opened = self._open.pop(key, None)
+        if opened is None:
+            return
+        name, agent, start = opened
+        self.collector.record(
+            Span(kind, name, agent, start, now or time.perf_counter_ns(), error)
+        )
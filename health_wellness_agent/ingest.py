@@ -0,0 +1,331 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: ingest.py
+Description: Streaming bulk import of progress samples from wearable / spreadsheet exports
+(CSV or JSONL), landing in the user's ProgressHistory as one transaction.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • ProgressIngest: incremental line parser (CSV header once, or JSONL), long rows
+#   (timestamp, metric, value, notes) or wide rows (timestamp + one column per metric;
+#   only numeric cells, optionally only allow-listed columns, so device / unit text
+#   columns never become metrics)
+# • Batch validation against ProgressInput; bad rows are counted with line numbers
+# • Staging in per-metric array('d') columns; prepare() dedups by (metric, timestamp)
+#   within the file and against history and builds the merged series (thread-safe, for
+#   the tool pool), apply() swaps them in as one ChangeSet on the loop
+# • parse_file() / ingest_file() for exports on disk and a per-user import-directory guard
+
+from __future__ import annotations
+
+import csv
+import json
+import math
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from health_wellness_agent.timeseries import to_epoch
+from health_wellness_agent.tools.tracker import ProgressInput
+
+_TS_KEYS = ("timestamp", "ts", "time", "datetime", "date", "start", "startdate", "start_time", "recorded_at")
+_NOTE_KEYS = ("notes", "note", "comment")
+_BATCH = TypeAdapter(List[ProgressInput])
+
+IMPORT_DIR = Path(os.getenv("HWA_IMPORT_DIR", "imports"))
+
+
+def parse_timestamp(raw: Any) -> float:
+    """Epoch seconds or milliseconds, or ISO-8601 date/datetime; ValueError otherwise."""
+    if isinstance(raw, str):
+        raw = raw.strip()
+        try:
+            raw = float(raw)
+        except ValueError:
+            return to_epoch(raw)
+    if isinstance(raw, (int, float)) and not isinstance(raw, bool):
+        raw = float(raw)
+        return raw / 1000.0 if raw > 1e11 else raw    # wearables often export millis
+    raise ValueError(f"unrecognised timestamp {raw!r}")
+
+
+class _Staged:
+    __slots__ = ("ts", "values", "notes")
+
+    def __init__(self) -> None:
+        self.ts = array("d")
+        self.values = array("d")
+        self.notes: Dict[int, str] = {}
+
+
+class _Prepared:
+    """One metric's import, ready to swap in: the merged series and what it was built on."""
+    __slots__ = ("metric", "base", "base_len", "batch", "merged", "summary")
+
+    def __init__(self, metric, base, batch: _Staged, merged, summary: Dict[str, Any]) -> None:
+        self.metric = metric
+        self.base = base
+        self.base_len = len(base) if base is not None else 0
+        self.batch = batch
+        self.merged = merged
+        self.summary = summary
+
+
+class ProgressIngest:
+    """
+    Feed lines as they arrive (`feed_lines`), then `commit(session)` once, or
+    `prepare(session)` on a worker thread and `apply(...)` on the event loop.
+    Memory is one validation batch plus 16 bytes per accepted sample.
+    """
+
+    def __init__(
+        self,
+        fmt: str = "auto",
+        batch_size: int = 1000,
+        max_errors: int = 10,
+        metrics: Optional[Iterable[str]] = None,
+    ) -> None:
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.metrics = {m.lower().strip() for m in metrics} if metrics is not None else None
+        self._skipped_columns: set = set()
+        self._wide_columns: set = set()
+        self._header: Optional[List[str]] = None
+        self._line = 0
+        self._pending: List[Tuple[int, float, Dict[str, Any]]] = []
+        self._staged: Dict[str, _Staged] = {}
+        self.stats: Dict[str, int] = {"lines": 0, "samples": 0, "accepted": 0, "invalid": 0,
+                                      "duplicates": 0, "already_stored": 0, "imported": 0,
+                                      "skipped_cells": 0}
+        self.errors: List[str] = []
+
+    # ── parsing ─────────────────────────────────────────────────────
+    def feed_lines(self, lines: Iterable[str]) -> None:
+        """Parse complete lines (a quoted CSV field may not span two feeds)."""
+        lines = lines if isinstance(lines, list) else list(lines)
+        if not lines:
+            return
+        if self.fmt == "auto":
+            first = next((l for l in lines if l.strip()), "")
+            if not first:
+                return
+            self.fmt = "jsonl" if first.lstrip().startswith("{") else "csv"
+        if self.fmt == "jsonl":
+            for line in lines:
+                self._line += 1
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                    if not isinstance(row, dict):
+                        raise ValueError("not an object")
+                except ValueError as exc:
+                    self._reject(self._line, f"bad JSON: {exc}")
+                    continue
+                self._row(self._line, {str(k).strip().lower(): v for k, v in row.items()})
+        else:
+            for cells in csv.reader(lines):
+                self._line += 1
+                if not cells or not any(c.strip() for c in cells):
+                    continue
+                if self._header is None:
+                    self._header = [c.strip().lower().lstrip("\ufeff") for c in cells]
+                    continue
+                self._row(self._line, dict(zip(self._header, cells)))
+
+    def _row(self, line: int, row: Dict[str, Any]) -> None:
+        self.stats["lines"] += 1
+        ts_key = next((k for k in _TS_KEYS if row.get(k) not in (None, "")), None)
+        if ts_key is None:
+            self._reject(line, "missing timestamp")
+            return
+        try:
+            when = parse_timestamp(row[ts_key])
+        except (ValueError, OverflowError) as exc:
+            self._reject(line, str(exc))
+            return
+        note = next((row[k] for k in _NOTE_KEYS if row.get(k) not in (None, "")), None)
+        if "metric" in row:                                 # long form
+            self._pending.append((line, when, {"metric": row.get("metric"), "value": row.get("value"),
+                                               "notes": note}))
+        else:
+            for key, value in row.items():                  # wide form: one sample per column
+                if key in _TS_KEYS or key in _NOTE_KEYS or value in (None, ""):
+                    continue
+                if (self.metrics is not None and key not in self.metrics) or not _numeric(value):
+                    self.stats["skipped_cells"] += 1
+                    self._skipped_columns.add(key)
+                    continue
+                self._wide_columns.add(key)
+                self._pending.append((line, when, {"metric": key, "value": value, "notes": note}))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _reject(self, line: int, reason: str) -> None:
+        self.stats["invalid"] += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(f"line {line}: {reason}")
+
+    def _flush(self) -> None:
+        """Validate the pending rows as one batch; fall back per row only on failure."""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return
+        raw = [r for _, _, r in pending]
+        try:
+            models = _BATCH.validate_python(raw)
+            bad: Dict[int, str] = {}
+        except ValidationError as exc:
+            bad = {}
+            for err in exc.errors():
+                idx = err["loc"][0] if err["loc"] else 0
+                bad.setdefault(idx, f"{'.'.join(map(str, err['loc'][1:]))}: {err['msg']}")
+            models = [None if i in bad else ProgressInput.model_validate(r) for i, r in enumerate(raw)]
+        self.stats["samples"] += len(pending)
+        for i, ((line, when, _), model) in enumerate(zip(pending, models)):
+            if model is None:
+                self._reject(line, bad[i])
+                continue
+            metric = model.metric.lower().strip()
+            if not metric:
+                self._reject(line, "empty metric")
+                continue
+            staged = self._staged.get(metric)
+            if staged is None:
+                staged = self._staged[metric] = _Staged()
+            try:
+                value, note = float(model.value), model.notes
+            except (TypeError, ValueError):                  # free text, as ProgressHistory.record does
+                value = math.nan
+                note = f"{model.value} — {model.notes}" if model.notes else str(model.value)
+            if note:
+                staged.notes[len(staged.ts)] = note
+            staged.ts.append(when)
+            staged.values.append(value)
+            self.stats["accepted"] += 1
+
+    # ── commit ──────────────────────────────────────────────────────
+    def _dedupe(self, metric: str, staged: _Staged, existing) -> _Staged:
+        """Time-sort one metric's batch; last row wins within the file, history wins over it."""
+        order = sorted(range(len(staged.ts)), key=staged.ts.__getitem__)
+        out = _Staged()
+        for pos, idx in enumerate(order):
+            t = staged.ts[idx]
+            if pos + 1 < len(order) and staged.ts[order[pos + 1]] == t:
+                self.stats["duplicates"] += 1
+                continue
+            if existing is not None and existing.contains(t):
+                self.stats["already_stored"] += 1
+                continue
+            note = staged.notes.get(idx)
+            if note:
+                out.notes[len(out.ts)] = note
+            out.ts.append(t)
+            out.values.append(staged.values[idx])
+        return out
+
+    def prepare(self, session) -> List[_Prepared]:
+        """
+        The expensive half of a commit — sort, dedupe, and build each merged
+        series on a copy. Only reads the session, so it can run on the tool pool.
+        """
+        self._flush()
+        prepared = []
+        for metric, staged in self._staged.items():
+            base = session.progress.get(metric)
+            batch = self._dedupe(metric, staged, base)
+            if not batch.ts:
+                continue
+            numeric = [v for v in batch.values if not math.isnan(v)]
+            summary = {
+                "imported": len(batch.ts),
+                "from": _iso(batch.ts[0]),
+                "to": _iso(batch.ts[-1]),
+                **({"min": round(min(numeric), 3), "max": round(max(numeric), 3),
+                    "mean": round(sum(numeric) / len(numeric), 3), "latest": round(numeric[-1], 3)}
+                   if numeric else {}),
+            }
+            merged = session.progress.merged(metric, batch.ts, batch.values, batch.notes)
+            prepared.append(_Prepared(metric, base, batch, merged, summary))
+        self._staged.clear()
+        return prepared
+
+    def apply(self, session, prepared: List[_Prepared]) -> Dict[str, Any]:
+        """
+        Swap the prepared series in as one ChangeSet (atomic; joins the turn if
+        one is open). A series that changed since prepare() gets the batch
+        merged into it instead.
+        """
+        metrics: Dict[str, Dict[str, Any]] = {}
+        with session.mutate() as changes:
+            for p in prepared:
+                current = session.progress.get(p.metric)
+                if current is p.base and p.base_len == (len(current) if current is not None else 0):
+                    changes.replace_series(p.metric, p.merged)
+                else:
+                    changes.merge(p.metric, p.batch.ts, p.batch.values, p.batch.notes)
+                metrics[p.metric] = p.summary
+                self.stats["imported"] += p.summary["imported"]
+        summary = {**self.stats, "metrics": metrics, "errors": self.errors}
+        ignored = self._skipped_columns - self._wide_columns
+        if ignored:
+            summary["ignored_columns"] = sorted(ignored)          # never numeric / not allow-listed
+        return summary
+
+    def commit(self, session) -> Dict[str, Any]:
+        """prepare() and apply() in one go, for callers not on an event loop."""
+        return self.apply(session, self.prepare(session))
+
+
+def _numeric(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _iso(ts: float) -> str:
+    from datetime import datetime, timezone
+    return datetime.fromtimestamp(ts, tz=timezone.utc).isoformat(timespec="minutes")
+
+
+def parse_file(path: str | Path, fmt: str = "auto", chunk_lines: int = 5000) -> ProgressIngest:
+    """Stream an export from disk into a ProgressIngest (no session writes yet)."""
+    path = Path(path)
+    if fmt == "auto" and path.suffix.lower() in (".jsonl", ".ndjson", ".csv"):
+        fmt = "csv" if path.suffix.lower() == ".csv" else "jsonl"
+    ingest = ProgressIngest(fmt)
+    with open(path, encoding="utf-8-sig", newline="") as fh:
+        chunk: List[str] = []
+        for line in fh:
+            chunk.append(line)
+            if len(chunk) >= chunk_lines:
+                ingest.feed_lines(chunk)
+                chunk = []
+        ingest.feed_lines(chunk)
+    return ingest
+
+
+def ingest_file(session, path: str | Path, fmt: str = "auto") -> Dict[str, Any]:
+    """Import an export from disk into the session; returns the import summary."""
+    return parse_file(path, fmt).commit(session)
+
+
+def resolve_import_path(name: str, uid: int) -> Path:
+    """A file in the user's own IMPORT_DIR/<uid>/; refuses anything that escapes it."""
+    root = (IMPORT_DIR / str(int(uid))).resolve()
+    path = (root / name).resolve()
+    if root not in path.parents:
+        raise ValueError(f"imports are read from {IMPORT_DIR}/{uid}/ only")
+    if not path.is_file():
+        raise FileNotFoundError(f"no such export: {name}")
+    return path
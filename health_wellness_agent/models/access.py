@@ -0,0 +1,399 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: access.py
+Description: Model-access layer shared by every session — per-model token-bucket rate limits,
+concurrency caps, pooled HTTP clients, retry with jitter and latency-percentile request hedging.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • TokenBucket (FIFO async acquire) and a per-model concurrency cap
+# • pooled_client(): one AsyncOpenAI per endpoint and event loop on a sized, keep-alive
+#   httpx pool, with the client's own retries off so backoff happens in one place
+# • ManagedModel: wraps any agents.Model with limiting, full-jitter retries (honouring
+#   Retry-After on 429s) and hedging — a second request once the first is slower than
+#   the recent p95, keeping whichever answers first
+# • ModelAccessProvider: a ModelProvider handing out one ManagedModel per model name
+
+from __future__ import annotations
+
+import asyncio
+import os
+import random
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from agents import Model, ModelProvider, ModelResponse
+
+try:
+    import openai
+    _RETRYABLE: Tuple[type, ...] = (
+        openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError,
+    )
+except ImportError:                                     # fake-only environments
+    openai = None
+    _RETRYABLE = ()
+
+_EVENT, _ERROR, _END = "event", "error", "end"
+
+
+# ────────────────────────────────────────────────────────────────────
+# Policy
+# ────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class ModelPolicy:
+    rate: float = 10.0                  # requests per second (token refill)
+    burst: int = 20                     # bucket capacity
+    max_concurrency: int = 64           # requests in flight for this model
+    max_attempts: int = 4               # first try + retries
+    backoff_base: float = 0.25          # seconds; full jitter over base · 2^attempt
+    backoff_cap: float = 8.0
+    hedge_percentile: Optional[float] = 0.95    # None disables hedging
+    hedge_min_samples: int = 20         # no hedging until the percentile means something
+    hedge_min_delay: float = 0.05       # never hedge sooner than this
+    hedge_budget: float = 0.1           # at most this fraction of requests are hedged
+
+    @classmethod
+    def from_env(cls, prefix: str = "HWA_MODEL_") -> "ModelPolicy":
+        """Override defaults from e.g. HWA_MODEL_RATE=5 HWA_MODEL_HEDGE_PERCENTILE=0.9."""
+        base = cls()
+        overrides: Dict[str, Any] = {}
+        for name, value in vars(base).items():
+            raw = os.getenv(prefix + name.upper())
+            if raw is None:
+                continue
+            if name == "hedge_percentile" and raw.lower() in ("", "off", "none", "0"):
+                overrides[name] = None
+            else:
+                overrides[name] = type(value if value is not None else 0.0)(raw)
+        return replace(base, **overrides)
+
+
+# ────────────────────────────────────────────────────────────────────
+# Building blocks
+# ────────────────────────────────────────────────────────────────────
+
+class TokenBucket:
+    """Classic token bucket; waiters are served in arrival order."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._stamp = clock()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_acquire(self) -> bool:
+        self._refill()
+        if self._tokens >= 1 and not self._lock.locked():
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self) -> float:
+        """Take one token, sleeping until one is available; returns the time waited."""
+        waited = 0.0
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self._tokens -= 1
+        return waited
+
+
+class LatencyWindow:
+    """Recent latencies; the percentile is recomputed every `refresh` samples."""
+
+    def __init__(self, size: int = 256, refresh: int = 16) -> None:
+        self.samples: Deque[float] = deque(maxlen=size)
+        self.refresh = refresh
+        self._since = 0
+        self._cache: Dict[float, float] = {}
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._since += 1
+        if self._since >= self.refresh:
+            self._since = 0
+            self._cache.clear()
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        value = self._cache.get(p)
+        if value is None:
+            ordered = sorted(self.samples)
+            value = self._cache[p] = ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+        return value
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+_CLIENTS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, Any]]" = weakref.WeakKeyDictionary()
+
+
+def pooled_client(
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None,
+    max_connections: int = 200,
+    max_keepalive: int = 50,
+    timeout: float = 60.0,
+):
+    """
+    One AsyncOpenAI per endpoint and running event loop, shared by every session
+    and model on that loop. An httpx pool's connections belong to the loop that
+    opened them, so a client is never handed to a second loop; called outside a
+    loop, it returns a fresh client the caller owns. The client's built-in
+    retries are disabled: ManagedModel owns backoff.
+    """
+    import httpx
+    from openai import AsyncOpenAI
+
+    try:
+        clients = _CLIENTS.setdefault(asyncio.get_running_loop(), {})
+    except RuntimeError:
+        clients = {}
+    key = (base_url, api_key, max_connections, max_keepalive, timeout)
+    client = clients.get(key)
+    if client is None:
+        http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            timeout=httpx.Timeout(timeout, connect=10.0),
+        )
+        client = clients[key] = AsyncOpenAI(base_url=base_url, api_key=api_key, http_client=http, max_retries=0)
+    return client
+
+
+# ────────────────────────────────────────────────────────────────────
+# Managed model
+# ────────────────────────────────────────────────────────────────────
+
+class ManagedModel(Model):
+    """
+    Rate-limited, retried and hedged access to `inner`. Streams are hedged on
+    time to first event and retried only before anything has been yielded, so
+    callers never see a partial answer twice.
+    """
+
+    def __init__(self, inner: Model, policy: ModelPolicy = ModelPolicy(), name: str = "") -> None:
+        self.inner = inner
+        self.policy = policy
+        self.name = name
+        self.bucket = TokenBucket(policy.rate, policy.burst)
+        self.slots = asyncio.Semaphore(policy.max_concurrency)
+        self.latency = LatencyWindow()
+        self.stats = {
+            "requests": 0, "retries": 0, "rate_limited": 0, "hedged": 0,
+            "hedge_wins": 0, "failed": 0, "throttle_wait_s": 0.0,
+        }
+
+    # ── shared machinery ────────────────────────────────────────────
+    def _hedge_delay(self) -> Optional[float]:
+        p = self.policy
+        if p.hedge_percentile is None or len(self.latency.samples) < p.hedge_min_samples:
+            return None
+        if self.stats["hedged"] >= p.hedge_budget * self.stats["requests"]:
+            return None
+        return max(p.hedge_min_delay, self.latency.percentile(p.hedge_percentile) or 0.0)
+
+    async def _backoff(self, attempt: int, exc: BaseException) -> None:
+        p = self.policy
+        self.stats["retries"] += 1
+        delay = random.uniform(0, min(p.backoff_cap, p.backoff_base * 2 ** attempt))
+        if openai is not None and isinstance(exc, openai.RateLimitError):
+            self.stats["rate_limited"] += 1
+            delay = max(delay, _retry_after(exc) or 0.0)
+        await asyncio.sleep(delay)
+
+    async def _race(self, start: Callable[..., Awaitable[Any]], cleanup: Callable[[Any], Awaitable[None]]) -> Any:
+        """
+        Run `start()`; if it is slower than the hedge delay, run `start(hedge=True)`
+        alongside and keep the first success. `cleanup(result)` disposes of a loser.
+        """
+        primary = asyncio.ensure_future(start())
+        delay = self._hedge_delay()
+        if delay is None:
+            return await primary
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+        except asyncio.CancelledError:
+            primary.cancel()
+            raise
+        if done or not self.bucket.try_acquire():
+            return await primary
+        self.stats["hedged"] += 1
+        backup = asyncio.ensure_future(start(hedge=True))
+        pending = {primary, backup}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    if task is backup:
+                        self.stats["hedge_wins"] += 1
+                    loser = primary if task is backup else backup
+                    loser.cancel()
+                    # wait() never raises the loser's outcome, only our own cancellation.
+                    await asyncio.wait({loser})
+                    if not loser.cancelled() and loser.exception() is None:
+                        try:
+                            await cleanup(loser.result())
+                        except Exception as exc:
+                            print(f"[ModelAccess] {self.name or 'default'}: discarding hedge loser failed: {exc!r}")
+                    return task.result()
+            raise error
+        except asyncio.CancelledError:
+            primary.cancel()
+            backup.cancel()
+            raise
+
+    async def _retrying(self, start: Callable[..., Awaitable[Any]], cleanup: Callable[[Any], Awaitable[None]]) -> Any:
+        for attempt in range(self.policy.max_attempts):
+            self.stats["requests"] += 1
+            try:
+                return await self._race(start, cleanup)
+            except _RETRYABLE as exc:
+                if attempt + 1 >= self.policy.max_attempts:
+                    self.stats["failed"] += 1
+                    raise
+                await self._backoff(attempt, exc)
+        raise RuntimeError("max_attempts must be at least 1")
+
+    async def _pump(self, queue: "asyncio.Queue[Tuple[str, Any]]", hedge: bool, args: tuple, kwargs: dict) -> None:
+        """
+        Drive one upstream stream inside its own task. The SDK's tracing spans
+        are context-bound, so a stream must start and finish in the same task.
+        """
+        if not hedge:
+            self.stats["throttle_wait_s"] += await self.bucket.acquire()
+        async with self.slots:
+            started = time.perf_counter()
+            first = True
+            try:
+                async for event in self.inner.stream_response(*args, **kwargs):
+                    if first:
+                        self.latency.add(time.perf_counter() - started)
+                        first = False
+                    queue.put_nowait((_EVENT, event))
+            except Exception as exc:
+                queue.put_nowait((_ERROR, exc))
+                return
+        queue.put_nowait((_END, None))
+
+    # ── Model interface ─────────────────────────────────────────────
+    async def get_response(self, *args: Any, **kwargs: Any) -> ModelResponse:
+        async def once(hedge: bool = False) -> ModelResponse:
+            if not hedge:
+                self.stats["throttle_wait_s"] += await self.bucket.acquire()
+            async with self.slots:
+                started = time.perf_counter()
+                result = await self.inner.get_response(*args, **kwargs)
+                self.latency.add(time.perf_counter() - started)
+                return result
+
+        async def discard(_result: ModelResponse) -> None:
+            return None
+
+        return await self._retrying(once, discard)
+
+    async def stream_response(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        async def open_stream(hedge: bool = False):
+            queue: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+            pump = asyncio.ensure_future(self._pump(queue, hedge, args, kwargs))
+            try:
+                kind, item = await queue.get()
+            except BaseException:
+                pump.cancel()
+                raise
+            if kind == _ERROR:
+                raise item
+            return pump, queue, kind, item
+
+        async def close(opened) -> None:
+            opened[0].cancel()
+
+        pump, queue, kind, item = await self._retrying(open_stream, close)
+        try:
+            while kind == _EVENT:
+                yield item
+                kind, item = await queue.get()
+            if kind == _ERROR:                          # mid-stream: no retry, output already seen
+                raise item
+        finally:
+            pump.cancel()
+
+
+class ModelAccessProvider(ModelProvider):
+    """
+    Hands out one ManagedModel per model name over a base provider (OpenAI on
+    a pooled client by default), so every session shares the same limits.
+    """
+
+    def __init__(
+        self,
+        base: Optional[ModelProvider] = None,
+        policy: Optional[ModelPolicy] = None,
+        policies: Optional[Dict[str, ModelPolicy]] = None,
+    ) -> None:
+        self._base = base
+        self.policy = policy or ModelPolicy()
+        self.policies = policies or {}
+        self._models: Dict[Optional[str], ManagedModel] = {}
+
+    @property
+    def base(self) -> ModelProvider:
+        # Built on first use, like OpenAIProvider's own client, so a missing key
+        # surfaces on the first model call rather than at import / startup.
+        if self._base is None:
+            from agents import OpenAIProvider
+            self._base = OpenAIProvider(
+                openai_client=pooled_client(os.getenv("OPENAI_BASE_URL"), os.getenv("OPENAI_API_KEY"))
+            )
+        return self._base
+
+    def get_model(self, model_name: Optional[str]) -> Model:
+        model = self._models.get(model_name)
+        if model is None:
+            model = self._models[model_name] = ManagedModel(
+                self.base.get_model(model_name),
+                self.policies.get(model_name or "", self.policy),
+                name=model_name or "",
+            )
+        return model
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            (name or "default"): {
+                **m.stats,
+                "p95_s": round(m.latency.percentile(0.95) or 0.0, 4),
+                "in_flight": m.policy.max_concurrency - m.slots._value,
+            }
+            for name, m in self._models.items()
+        }
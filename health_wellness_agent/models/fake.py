@@ -0,0 +1,275 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: fake.py
+Description: Deterministic, offline stand-in model provider that emits canned text deltas,
+tool calls and handoffs, so framework overhead can be measured without the network.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • FakeModel: an agents.Model that answers from a regex-keyed script, streaming or not
+# • Scripts that call goal_analyzer / meal_planner / workout_recommender / scheduler /
+#   tracker and hand off to NutritionExpertAgent / InjurySupportAgent / EscalationAgent
+# • FakeModelProvider so any agent (including specialists) resolves to the fake model
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import re
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from agents import Model, ModelProvider, ModelResponse, Usage
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseFunctionToolCall,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+
+
+# ────────────────────────────────────────────────────────────────────
+# Script
+# ────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class ScriptStep:
+    """
+    One model response. `calls` are (tool-or-handoff, arguments) pairs; a name of
+    the form "handoff:<AgentName>" resolves to that agent's transfer tool.
+    With no calls, `text` is returned as the assistant message.
+    """
+    text: str = ""
+    calls: Tuple[Tuple[str, Dict[str, Any]], ...] = ()
+
+
+@dataclass(frozen=True)
+class ScriptRule:
+    pattern: str
+    steps: Tuple[ScriptStep, ...]
+
+    def matches(self, prompt: str) -> bool:
+        return re.search(self.pattern, prompt, re.IGNORECASE) is not None
+
+
+def _call(name: str, **args: Any) -> Tuple[str, Dict[str, Any]]:
+    return name, {"input": args} if args else {}
+
+
+DEFAULT_SCRIPT: Tuple[ScriptRule, ...] = (
+    ScriptRule(r"\b(pain|injur|hurt)", (
+        ScriptStep(calls=(("handoff:InjurySupportAgent", {}),)),
+        ScriptStep("Let's keep things low-impact: try swimming, cycling and gentle mobility work."),
+    )),
+    ScriptRule(r"\b(coach|human)\b", (
+        ScriptStep(calls=(("handoff:EscalationAgent", {}),)),
+        ScriptStep(calls=(_call("request_coach", reason="User asked for a human coach.", urgency="routine"),)),
+        ScriptStep("You're in the queue — a human coach will be with you shortly."),
+    )),
+    ScriptRule(r"\b(diabet|vegan|allerg|nutrition)", (
+        ScriptStep(calls=(("handoff:NutritionExpertAgent", {}),)),
+        ScriptStep("Focus on whole grains, legumes and steady carbohydrate portions."),
+    )),
+    ScriptRule(r"\b(lose|gain)\b.*\b(kg|lbs?)\b", (
+        ScriptStep(calls=(_call("goal_analyzer", quantity=5, metric="kg", duration="3 months"),)),
+        ScriptStep("Goal saved: 5 kg over 3 months. Want a meal plan next?"),
+    )),
+    ScriptRule(r"\bmeal", (
+        ScriptStep(calls=(_call("meal_planner", diet_style="balanced", calories_per_day=2000),)),
+        ScriptStep("Here is your 7-day balanced meal plan."),
+    )),
+    ScriptRule(r"\bworkout", (
+        ScriptStep(calls=(_call("workout_recommender", fitness_level="beginner"),)),
+        ScriptStep("Here is your 4-week beginner workout plan."),
+    )),
+    ScriptRule(r"\bremind", (
+        ScriptStep(calls=(_call("scheduler", weekday="monday", hour_24=7),)),
+        ScriptStep("Done — I'll check in every Monday at 07:00."),
+    )),
+    ScriptRule(r"\blog\b", (
+        ScriptStep(calls=(_call("tracker", metric="weight", value=82.5, notes=None),)),
+        ScriptStep("Logged weight 82.5."),
+    )),
+    ScriptRule(r".*", (
+        ScriptStep("I can help with goals, meal plans, workouts, reminders and progress tracking."),
+    )),
+)
+
+
+# ────────────────────────────────────────────────────────────────────
+# Model
+# ────────────────────────────────────────────────────────────────────
+
+def _last_user_text(items: Sequence[Any]) -> Tuple[str, int]:
+    """Return the newest user message text and how many tool results follow it."""
+    for idx in range(len(items) - 1, -1, -1):
+        item = items[idx]
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content")
+            if isinstance(content, list):
+                content = " ".join(
+                    c.get("text", "") for c in content if isinstance(c, dict)
+                )
+            outputs = sum(
+                1 for it in items[idx + 1:]
+                if isinstance(it, dict) and it.get("type") == "function_call_output"
+            )
+            return str(content or ""), outputs
+    return "", 0
+
+
+class FakeModel(Model):
+    """
+    Answers from a script instead of an API. The step is chosen by how many tool
+    results the conversation already holds after the newest user message, so
+    tool → reply and handoff → specialist reply sequences play out naturally.
+    """
+
+    def __init__(
+        self,
+        script: Sequence[ScriptRule] = DEFAULT_SCRIPT,
+        chunk_words: int = 1,
+        first_token_delay: float = 0.0,
+        token_delay: float = 0.0,
+    ) -> None:
+        self.script = tuple(script)
+        self.chunk_words = max(1, chunk_words)
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.calls = 0
+        self._ids = itertools.count(1)
+
+    # ── script resolution ───────────────────────────────────────────
+    def _step(self, input: str | list) -> ScriptStep:
+        if isinstance(input, str):
+            prompt, done = input, 0
+        else:
+            prompt, done = _last_user_text(input)
+        for rule in self.script:
+            if rule.matches(prompt):
+                return rule.steps[min(done, len(rule.steps) - 1)]
+        return ScriptStep("")
+
+    def _output(self, step: ScriptStep, tools: list, handoffs: list) -> List[Any]:
+        tool_names = {getattr(t, "name", None) for t in tools}
+        handoff_names = {h.agent_name: h.tool_name for h in handoffs}
+        out: List[Any] = []
+        for name, args in step.calls:
+            if name.startswith("handoff:"):
+                name = handoff_names.get(name.split(":", 1)[1], "")
+            elif name not in tool_names:
+                name = ""
+            if name:
+                n = next(self._ids)
+                out.append(ResponseFunctionToolCall(
+                    id=f"fc_{n}", call_id=f"call_{n}", type="function_call",
+                    name=name, arguments=json.dumps(args),
+                ))
+        if not out:
+            text = step.text or "OK."
+            out.append(ResponseOutputMessage(
+                id=f"msg_{next(self._ids)}", type="message", role="assistant",
+                status="completed",
+                content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+            ))
+        return out
+
+    def _chunks(self, text: str) -> List[str]:
+        words = re.findall(r"\S+\s*", text)
+        n = self.chunk_words
+        return ["".join(words[i:i + n]) for i in range(0, len(words), n)]
+
+    @staticmethod
+    def _usage(output: List[Any]) -> Tuple[Usage, ResponseUsage]:
+        out_tokens = sum(
+            len(str(getattr(o, "arguments", "") or getattr(o, "content", ""))) // 4
+            for o in output
+        )
+        raw = ResponseUsage(
+            input_tokens=0, output_tokens=out_tokens, total_tokens=out_tokens,
+            input_tokens_details=InputTokensDetails(cached_tokens=0),
+            output_tokens_details=OutputTokensDetails(reasoning_tokens=0),
+        )
+        return Usage(requests=1, output_tokens=out_tokens, total_tokens=out_tokens), raw
+
+    # ── Model interface ─────────────────────────────────────────────
+    async def get_response(
+        self,
+        system_instructions,
+        input,
+        model_settings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing,
+        *,
+        previous_response_id=None,
+        prompt=None,
+        **kwargs,
+    ) -> ModelResponse:
+        self.calls += 1
+        output = self._output(self._step(input), tools, handoffs)
+        if self.first_token_delay:
+            await asyncio.sleep(self.first_token_delay)
+        usage, _ = self._usage(output)
+        return ModelResponse(output=output, usage=usage, response_id=None)
+
+    async def stream_response(
+        self,
+        system_instructions,
+        input,
+        model_settings,
+        tools,
+        output_schema,
+        handoffs,
+        tracing,
+        *,
+        previous_response_id=None,
+        prompt=None,
+        **kwargs,
+    ) -> AsyncIterator[Any]:
+        self.calls += 1
+        output = self._output(self._step(input), tools, handoffs)
+        seq = itertools.count()
+        if self.first_token_delay:
+            await asyncio.sleep(self.first_token_delay)
+
+        for out_idx, item in enumerate(output):
+            if isinstance(item, ResponseOutputMessage):
+                for chunk in self._chunks(item.content[0].text):
+                    yield ResponseTextDeltaEvent(
+                        type="response.output_text.delta", item_id=item.id,
+                        output_index=out_idx, content_index=0, delta=chunk,
+                        sequence_number=next(seq),
+                    )
+                    if self.token_delay:
+                        await asyncio.sleep(self.token_delay)
+
+        _, raw_usage = self._usage(output)
+        yield ResponseCompletedEvent(
+            type="response.completed",
+            sequence_number=next(seq),
+            response=Response(
+                id=f"resp_{next(self._ids)}", created_at=0, model="fake",
+                object="response", output=output, tool_choice="auto", tools=[],
+                parallel_tool_calls=False, usage=raw_usage,
+            ),
+        )
+
+
+class FakeModelProvider(ModelProvider):
+    """Resolves every model name — including the planner's — to one FakeModel."""
+
+    def __init__(self, model: Optional[FakeModel] = None, **model_kwargs: Any) -> None:
+        self.model = model or FakeModel(**model_kwargs)
+
+    def get_model(self, model_name: str | None) -> Model:
+        return self.model
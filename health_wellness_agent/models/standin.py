@@ -0,0 +1,223 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: standin.py
+Description: Local stand-in for the OpenAI Responses endpoint that injects latency, slow tails
+and 429s, so the model-access layer can be exercised through the real openai client.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • StandInServer: a minimal keep-alive HTTP/1.1 server for POST /v1/responses (JSON or SSE)
+# • Fault injection: lognormal first-token latency, a slow-tail probability and 429s
+#   carrying Retry-After, all seeded for repeatable runs
+# • Counters (requests / 429s / connections) to show pooling and backoff at work
+#
+# Usage:
+#   python -m health_wellness_agent.models.standin --port 8765 --rate-limit 0.05
+#   OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=x python server.py
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import random
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseCreatedEvent,
+    ResponseOutputMessage,
+    ResponseOutputText,
+    ResponseTextDeltaEvent,
+    ResponseUsage,
+)
+from openai.types.responses.response_usage import InputTokensDetails, OutputTokensDetails
+
+
+@dataclass
+class Faults:
+    latency_median: float = 0.08        # seconds to first token
+    latency_sigma: float = 0.3          # lognormal spread
+    slow_rate: float = 0.03             # share of requests stuck in a slow tail
+    slow_extra: float = 1.0             # seconds added to a slow request
+    rate_limit: float = 0.0             # share of requests answered with 429
+    retry_after: float = 0.05           # Retry-After on a 429, seconds
+    token_delay: float = 0.0            # between streamed deltas
+    reply: str = "Stay consistent: three short sessions a week beat one long one."
+    seed: Optional[int] = 7
+
+
+class StandInServer:
+    def __init__(self, faults: Faults = Faults(), host: str = "127.0.0.1", port: int = 0) -> None:
+        self.faults = faults
+        self.host = host
+        self.port = port
+        self.rng = random.Random(faults.seed)
+        self.stats: Dict[str, int] = {"requests": 0, "rate_limited": 0, "slow": 0, "connections": 0}
+        self._ids = itertools.count(1)
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> "StandInServer":
+        self._server = await asyncio.start_server(self._connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):          # keep-alive clients would block wait_closed()
+                writer.close()
+            await self._server.wait_closed()
+
+    # ── protocol ────────────────────────────────────────────────────
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.stats["connections"] += 1
+        self._writers.add(writer)
+        try:
+            while True:
+                request = await self._read(reader)
+                if request is None:
+                    break
+                path, body = request
+                await self._respond(writer, path, body)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    @staticmethod
+    async def _read(reader: asyncio.StreamReader) -> Optional[Tuple[str, dict]]:
+        head = await reader.readuntil(b"\r\n\r\n") if not reader.at_eof() else b""
+        if not head:
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        path = lines[0].split(" ")[1]
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip())
+        raw = await reader.readexactly(length) if length else b"{}"
+        return path, json.loads(raw or b"{}")
+
+    @staticmethod
+    def _head(status: str, headers: Dict[str, str]) -> bytes:
+        lines = [f"HTTP/1.1 {status}"] + [f"{k}: {v}" for k, v in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode()
+
+    async def _respond(self, writer: asyncio.StreamWriter, path: str, body: dict) -> None:
+        f = self.faults
+        self.stats["requests"] += 1
+        if not path.endswith("/responses"):
+            payload = b'{"error": {"message": "not found"}}'
+            writer.write(self._head("404 Not Found", {"content-type": "application/json",
+                                                      "content-length": str(len(payload))}) + payload)
+            await writer.drain()
+            return
+        if self.rng.random() < f.rate_limit:
+            self.stats["rate_limited"] += 1
+            payload = json.dumps({"error": {"message": "rate limited", "type": "rate_limit_error",
+                                            "code": "rate_limit_exceeded"}}).encode()
+            writer.write(self._head("429 Too Many Requests", {
+                "content-type": "application/json", "content-length": str(len(payload)),
+                "retry-after": f"{f.retry_after:g}",
+            }) + payload)
+            await writer.drain()
+            return
+
+        delay = self.rng.lognormvariate(math.log(f.latency_median), f.latency_sigma)
+        if self.rng.random() < f.slow_rate:
+            self.stats["slow"] += 1
+            delay += f.slow_extra
+        await asyncio.sleep(delay)
+
+        response = self._response(body.get("model") or "standin")
+        if not body.get("stream"):
+            payload = response.model_dump_json(exclude_none=True).encode()
+            writer.write(self._head("200 OK", {"content-type": "application/json",
+                                               "content-length": str(len(payload))}) + payload)
+            await writer.drain()
+            return
+
+        writer.write(self._head("200 OK", {"content-type": "text/event-stream",
+                                           "cache-control": "no-cache",
+                                           "transfer-encoding": "chunked"}))
+        seq = itertools.count()
+        events = [ResponseCreatedEvent(type="response.created", sequence_number=next(seq),
+                                       response=response.model_copy(update={"output": [], "status": "in_progress"}))]
+        message = response.output[0]
+        for word in message.content[0].text.split(" "):
+            events.append(ResponseTextDeltaEvent(
+                type="response.output_text.delta", item_id=message.id, output_index=0,
+                content_index=0, delta=word + " ", sequence_number=next(seq),
+            ))
+        events.append(ResponseCompletedEvent(type="response.completed", sequence_number=next(seq),
+                                             response=response))
+        for event in events:
+            data = f"event: {event.type}\ndata: {event.model_dump_json(exclude_none=True)}\n\n".encode()
+            writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            await writer.drain()
+            if f.token_delay:
+                await asyncio.sleep(f.token_delay)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _response(self, model: str) -> Response:
+        n = next(self._ids)
+        text = self.faults.reply
+        tokens = max(1, len(text) // 4)
+        return Response(
+            id=f"resp_{n}", created_at=0, model=model, object="response", status="completed",
+            output=[ResponseOutputMessage(
+                id=f"msg_{n}", type="message", role="assistant", status="completed",
+                content=[ResponseOutputText(type="output_text", text=text, annotations=[])],
+            )],
+            tool_choice="auto", tools=[], parallel_tool_calls=False,
+            usage=ResponseUsage(
+                input_tokens=0, output_tokens=tokens, total_tokens=tokens,
+                input_tokens_details=InputTokensDetails(cached_tokens=0),
+                output_tokens_details=OutputTokensDetails(reasoning_tokens=0),
+            ),
+        )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    server = await StandInServer(Faults(
+        latency_median=args.latency, slow_rate=args.slow_rate, slow_extra=args.slow_extra,
+        rate_limit=args.rate_limit, retry_after=args.retry_after, seed=args.seed,
+    ), host=args.host, port=args.port).start()
+    print(f"[StandIn] serving {server.base_url}  (Ctrl+C to stop)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+        print(f"[StandIn] {server.stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fault-injecting stand-in for the Responses API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.08, help="median seconds to first token")
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-extra", type=float, default=1.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="share of requests answered 429")
+    parser.add_argument("--retry-after", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=7)
+    try:
+        asyncio.run(_main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
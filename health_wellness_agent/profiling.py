@@ -0,0 +1,362 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: profiling.py
+Description: Opt-in per-turn profiler — one turn in N (or every turn of chosen sessions) runs
+under a stack sampler and tracemalloc, with time and allocations attributed to our modules and
+written out as collapsed stacks for flamegraphs.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • TurnProfiler.instrument(): wraps a turn's chunk stream only when the turn is sampled;
+#   otherwise the stream is returned untouched, so a disabled profiler costs one check per turn
+# • A wall-clock sampler thread that keeps only the profiled turn's stacks: on the loop thread,
+#   frames of tasks carrying the turn's context; on the tool pool, work offloaded by that turn
+# • tracemalloc for the duration of the sampled turn (one at a time; it is process-wide)
+# • The closing snapshot, its diff and the file writes run on a worker thread, never on the loop
+# • Output per turn: <id>.cpu.folded (µs per stack) and <id>.alloc.folded (bytes per stack)
+#   for flamegraph.pl / speedscope, and <id>.json with per-module time and allocation totals
+#
+# Configuration (environment):
+#   HWA_PROFILE_EVERY=N        profile one turn in N (0 / unset: off)
+#   HWA_PROFILE_UIDS=1,42      always profile these sessions
+#   HWA_PROFILE_DIR=profiles   where the files go
+#   HWA_PROFILE_INTERVAL_MS=1  sampling interval
+#   HWA_PROFILE_ALLOC=0        timings only: tracemalloc slows allocation-heavy code several
+#                              times over, which also skews the time split toward it
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_PACKAGE = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_TURN: contextvars.ContextVar[Optional["ProfiledTurn"]] = contextvars.ContextVar("hwa_profiled_turn", default=None)
+_POOL_TURNS: Dict[int, "ProfiledTurn"] = {}         # tool-pool thread id -> turn it is working for
+
+# (substring of the file path, bucket) — first match wins, package modules are handled first.
+_LIBRARIES: Tuple[Tuple[str, str], ...] = (
+    (f"{os.sep}pydantic_core{os.sep}", "pydantic"),
+    (f"{os.sep}pydantic{os.sep}", "pydantic"),
+    (f"{os.sep}agents{os.sep}", "agents (SDK)"),
+    (f"{os.sep}openai{os.sep}", "openai"),
+    (f"{os.sep}httpx{os.sep}", "httpx"),
+    (f"{os.sep}httpcore{os.sep}", "httpx"),
+    (f"{os.sep}asyncio{os.sep}", "asyncio"),
+    (f"{os.sep}json{os.sep}", "json"),
+)
+
+
+def bucket(filename: str) -> str:
+    """'…/health_wellness_agent/tools/meal_planner.py' → 'tools/meal_planner', etc."""
+    if filename.startswith(_PACKAGE):
+        return filename[len(_PACKAGE):].rsplit(".", 1)[0].replace(os.sep, "/")
+    for needle, name in _LIBRARIES:
+        if needle in filename:
+            return name
+    return "other"
+
+
+def _label(code) -> str:
+    return f"{bucket(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+def current_turn() -> Optional["ProfiledTurn"]:
+    return _TURN.get()
+
+
+def pool_task(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Mark work sent to the tool pool as belonging to the current profiled turn
+    (thread pools do not carry context); `fn` unchanged when none is running.
+    """
+    turn = _TURN.get()
+    if turn is None:
+        return fn
+
+    @wraps(fn)
+    def run(*args: Any, **kwargs: Any) -> T:
+        me = threading.get_ident()
+        _POOL_TURNS[me] = turn
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _POOL_TURNS.pop(me, None)
+    return run
+
+
+# ────────────────────────────────────────────────────────────────────
+# One sampled turn
+# ────────────────────────────────────────────────────────────────────
+
+class ProfiledTurn:
+    def __init__(self, turn_id: str, uid: int, interval: float, frames: int) -> None:
+        self.id = turn_id
+        self.uid = uid
+        self.interval = interval
+        self.frames = frames                        # tracemalloc depth; 0 = no allocation tracking
+        self.stacks: Dict[str, int] = {}            # "thread;frame;frame…" -> µs
+        self.samples = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+        self.status = "ok"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = 0
+        self._running = False
+        self._switch = 0.0
+        self._sampler: Optional[threading.Thread] = None
+        self._own_tracemalloc = False
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+        self.alloc: Optional[tracemalloc.Snapshot] = None
+
+    # ── lifecycle ───────────────────────────────────────────────────
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if self.frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._own_tracemalloc = True
+        # The sampler needs the GIL to look; at the default 5 ms switch interval it
+        # would rarely get it while the turn is busy, so shorten it for this turn.
+        self._switch = sys.getswitchinterval()
+        sys.setswitchinterval(min(self._switch, self.interval))
+        self._running = True
+        self._sampler = threading.Thread(target=self._sample_loop, name="hwa-profiler", daemon=True)
+        self._sampler.start()
+        if tracemalloc.is_tracing():                   # after the thread, so its setup is not counted
+            self._baseline = tracemalloc.take_snapshot()
+        self.started = time.perf_counter()
+
+    def stop(self) -> None:
+        """Stop the clock and the sampler; the rest of the teardown is finish()'s, off the loop."""
+        self.elapsed = time.perf_counter() - self.started
+        self._running = False
+
+    def finish(self) -> None:
+        """Join the sampler and take the closing snapshot. Blocking: call it from a thread."""
+        if self._sampler is not None:
+            self._sampler.join()
+        sys.setswitchinterval(self._switch)
+        if self._baseline is not None and tracemalloc.is_tracing():
+            self.alloc = tracemalloc.take_snapshot()
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+
+    # ── sampling ────────────────────────────────────────────────────
+    def _mine(self, thread_id: int) -> bool:
+        if thread_id == self._loop_thread:
+            try:
+                task = asyncio.current_task(self._loop)
+            except RuntimeError:
+                return False
+            return task is not None and task.get_context().get(_TURN) is self
+        return _POOL_TURNS.get(thread_id) is self
+
+    def _sample_loop(self) -> None:
+        # Plain dict / sleep / flag only: anything that allocates from Python code
+        # outside this file would show up in the turn's allocation profile.
+        me = threading.get_ident()
+        stacks = self.stacks
+        last = time.perf_counter()
+        while self._running:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            weight = int((now - last) * 1_000_000)  # each sample stands for the time since the last
+            last = now
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me or not self._mine(thread_id):
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append("loop" if thread_id == self._loop_thread else "tool-pool")
+                key = ";".join(reversed(stack))
+                stacks[key] = stacks.get(key, 0) + weight
+                self.samples += 1
+
+    # ── results ─────────────────────────────────────────────────────
+    def module_times(self) -> Dict[str, Dict[str, float]]:
+        """Per bucket: self time (innermost frame) and inclusive time (anywhere on the stack), in ms."""
+        own: Counter = Counter()
+        incl: Counter = Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            own[frames[-1].split(":", 1)[0]] += n
+            for name in {f.split(":", 1)[0] for f in frames}:
+                incl[name] += n
+        return {
+            name: {"self_ms": round(own[name] / 1000, 2), "total_ms": round(incl[name] / 1000, 2)}
+            for name, _ in incl.most_common()
+        }
+
+    def allocations(self) -> Tuple[Counter, Counter]:
+        """(bytes per collapsed allocation stack, bytes per module of the nearest package frame)."""
+        stacks: Counter = Counter()
+        modules: Counter = Counter()
+        if self.alloc is None or self._baseline is None:
+            return stacks, modules
+        ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        after = self.alloc.filter_traces(ignore)
+        before = self._baseline.filter_traces(ignore)
+        for stat in after.compare_to(before, "traceback"):
+            if stat.size_diff <= 0:
+                continue
+            frames = list(stat.traceback)               # most recent call first
+            label = ";".join(f"{bucket(f.filename)}:{f.lineno}" for f in reversed(frames))
+            stacks[label] += stat.size_diff
+            ours = next((bucket(f.filename) for f in frames if f.filename.startswith(_PACKAGE)), None)
+            modules[ours or bucket(frames[0].filename)] += stat.size_diff
+        return stacks, modules
+
+
+# ────────────────────────────────────────────────────────────────────
+# Profiler
+# ────────────────────────────────────────────────────────────────────
+
+class TurnProfiler:
+    """
+    Decides which turns to profile and writes their results. Only one turn is
+    profiled at a time; a sampled turn that arrives while another is running
+    is skipped rather than queued.
+    """
+
+    def __init__(
+        self,
+        every: Optional[int] = None,
+        uids: Optional[Iterable[int]] = None,
+        out_dir: Optional[str] = None,
+        interval_ms: Optional[float] = None,
+        allocations: Optional[bool] = None,
+        frames: int = 25,
+    ) -> None:
+        env_uids = os.getenv("HWA_PROFILE_UIDS", "")
+        self.every = int(os.getenv("HWA_PROFILE_EVERY", "0")) if every is None else every
+        self.uids: Set[int] = set(uids) if uids is not None else {
+            int(u) for u in env_uids.replace(" ", "").split(",") if u
+        }
+        self.out_dir = Path(out_dir or os.getenv("HWA_PROFILE_DIR", "profiles"))
+        self.interval = (float(os.getenv("HWA_PROFILE_INTERVAL_MS", "1"))
+                         if interval_ms is None else interval_ms) / 1000
+        if allocations is None:
+            allocations = os.getenv("HWA_PROFILE_ALLOC", "1") != "0"
+        self.frames = frames if allocations else 0
+        self._counter = itertools.count(1)
+        self._seq = itertools.count(1)
+        self._busy = threading.Lock()
+        self.stats = {"profiled": 0, "skipped_busy": 0}
+        self.last: Optional[str] = None
+        self._writing: Set[asyncio.Task] = set()
+
+    @property
+    def enabled(self) -> bool:
+        return self.every > 0 or bool(self.uids)
+
+    def enable_for(self, uid: int) -> None:
+        self.uids.add(uid)
+
+    def disable_for(self, uid: int) -> None:
+        self.uids.discard(uid)
+
+    def _wants(self, uid: int) -> bool:
+        if uid in self.uids:
+            return True
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+    def instrument(self, stream: AsyncIterator[T], session: Any) -> AsyncIterator[T]:
+        """`stream` itself unless this turn is sampled; then a profiled pass-through."""
+        if not self.enabled or not self._wants(session.uid):
+            return stream
+        return self._profiled(stream, session.uid)
+
+    async def _profiled(self, stream: AsyncIterator[T], uid: int) -> AsyncIterator[T]:
+        if not self._busy.acquire(blocking=False):
+            self.stats["skipped_busy"] += 1
+            async for item in stream:
+                yield item
+            return
+        turn = ProfiledTurn(f"{time.strftime('%Y%m%d-%H%M%S')}-uid{uid}-{next(self._seq)}",
+                            uid, self.interval, self.frames)
+        token = _TURN.set(turn)                     # inherited by every task the turn starts
+        try:
+            turn.start()
+            async for item in stream:
+                yield item
+        except BaseException as exc:
+            turn.status = type(exc).__name__
+            raise
+        finally:
+            try:
+                _TURN.reset(token)
+            except ValueError:                      # closed from another context
+                pass
+            turn.stop()
+            # Snapshot, diff and writes take a while; they must not stall every other session.
+            task = asyncio.ensure_future(self._finish(turn))
+            self._writing.add(task)
+            task.add_done_callback(self._writing.discard)
+
+    async def _finish(self, turn: ProfiledTurn) -> None:
+        try:
+            self.last = str(await asyncio.to_thread(self._finish_sync, turn))
+            self.stats["profiled"] += 1
+        except OSError as exc:
+            print(f"[TurnProfiler] could not write profile {turn.id}: {exc}")
+
+    def _finish_sync(self, turn: ProfiledTurn) -> Path:
+        try:
+            turn.finish()
+        finally:
+            self._busy.release()                    # tracemalloc is free for the next turn
+        return self.write(turn)
+
+    async def flush(self) -> None:
+        """Wait for profiles still being written (e.g. before shutting down)."""
+        if self._writing:
+            await asyncio.gather(*self._writing, return_exceptions=True)
+
+    def write(self, turn: ProfiledTurn) -> Path:
+        """Write the three files for `turn`; returns the JSON summary's path."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        base = self.out_dir / turn.id
+        with open(f"{base}.cpu.folded", "w", encoding="utf-8") as fh:
+            fh.writelines(f"{stack} {n}\n" for stack, n in sorted(turn.stacks.items(), key=lambda kv: -kv[1]))
+        alloc_stacks, alloc_modules = turn.allocations()
+        with open(f"{base}.alloc.folded", "w", encoding="utf-8") as fh:
+            fh.writelines(f"{stack} {n}\n" for stack, n in alloc_stacks.most_common())
+        summary = {
+            "turn": turn.id,
+            "uid": turn.uid,
+            "status": turn.status,
+            "wall_ms": round(turn.elapsed * 1000, 2),
+            "sampled_ms": round(sum(turn.stacks.values()) / 1000, 2),
+            "samples": turn.samples,
+            "interval_ms": turn.interval * 1000,
+            "modules": turn.module_times(),
+            "allocated_bytes": sum(alloc_modules.values()),
+            "allocations_by_module": dict(alloc_modules.most_common()),
+        }
+        path = Path(f"{base}.json")
+        path.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        return path
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "every": self.every, "uids": sorted(self.uids),
+                **self.stats, "last": self.last}
@@ -0,0 +1,271 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: projection.py
+Description: Goal-progress projection — robust trend fits over a user's tracked metric,
+time-to-goal estimates and off-track flags, per user or in bulk over a SessionStore.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Theil–Sen (median pairwise slope) and Holt (level + trend) fits on irregular samples
+# • project(): status, ETA, projection at the deadline and required weekly rate for a goal
+# • Goal quantities in lbs / stone / kg are converted to the unit the series is logged in
+# • project_payloads(): one pass over serialised sessions for the coach dashboard,
+#   building only the goal's tracked series (no session models are built)
+
+from __future__ import annotations
+
+import json
+import re
+import time
+from datetime import datetime, timezone
+from statistics import median
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from health_wellness_agent.timeseries import MetricSeries, to_epoch
+
+DAY = 86_400.0
+WEEK = 7 * DAY
+_UNIT_SECONDS = {"day": DAY, "week": WEEK, "month": 30.44 * DAY, "year": 365.25 * DAY}
+_NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6,
+    "seven": 7, "eight": 8, "nine": 9, "ten": 10, "twelve": 12,
+}
+_DURATION = re.compile(r"(\d+(?:\.\d+)?|[a-z]+)\s*(day|week|month|year)s?", re.IGNORECASE)
+
+MAX_FIT_POINTS = 64         # Theil–Sen is O(n²); recent samples matter most anyway
+MIN_SAMPLES = 3
+MIN_SPAN = 2 * DAY
+BEHIND_TOLERANCE = 0.10     # ETA may overrun the deadline by 10% of the goal window
+
+STATUSES = (
+    "no_goal", "insufficient_data", "unit_mismatch", "achieved", "on_track", "behind", "off_track",
+)
+
+# Mass units in kilograms. Series carry no unit, so a metric is taken to be logged in
+# the goal's `tracked_unit`, else a unit suffix on its name ("weight_lbs"), else kg
+# when it is a weight.
+_KG_PER_UNIT = {
+    "kg": 1.0, "kgs": 1.0, "kilo": 1.0, "kilos": 1.0, "kilogram": 1.0, "kilograms": 1.0,
+    "lb": 0.45359237, "lbs": 0.45359237, "pound": 0.45359237, "pounds": 0.45359237,
+    "st": 6.35029318, "stone": 6.35029318, "stones": 6.35029318,
+    "g": 0.001, "gram": 0.001, "grams": 0.001,
+}
+_MASS_METRICS = ("weight", "mass")
+
+
+def series_unit(goal: Dict[str, Any]) -> Optional[str]:
+    """The unit the goal's tracked metric is logged in, when it can be told."""
+    unit = (goal.get("tracked_unit") or "").lower().strip()
+    if unit:
+        return unit
+    metric = (goal.get("tracked_metric") or "weight").lower()
+    suffix = metric.rsplit("_", 1)[-1]
+    if suffix in _KG_PER_UNIT and suffix != metric:
+        return suffix
+    return "kg" if any(m in metric for m in _MASS_METRICS) else None
+
+
+def goal_change(goal: Dict[str, Any]) -> Optional[float]:
+    """
+    The goal's quantity in the tracked series' unit: 'lose 10 lbs' on a series
+    logged in kg is 4.54. None when a mass goal is set on a metric that is not
+    a known mass series (or the other way round), since no conversion exists.
+    """
+    quantity = float(goal["quantity"])
+    unit = (goal.get("metric") or "").lower().strip()
+    logged = series_unit(goal)
+    if unit in _KG_PER_UNIT or logged in _KG_PER_UNIT:
+        if unit not in _KG_PER_UNIT or logged not in _KG_PER_UNIT:
+            return None
+        return quantity * _KG_PER_UNIT[unit] / _KG_PER_UNIT[logged]
+    return quantity
+
+
+def parse_duration(text: Optional[str]) -> Optional[float]:
+    """Seconds in '3 months', 'six weeks', '90 days'; None when unparseable."""
+    if not text:
+        return None
+    total = 0.0
+    for qty, unit in _DURATION.findall(text):
+        n = float(qty) if qty[0].isdigit() else _NUMBER_WORDS.get(qty.lower())
+        if n is None:
+            continue
+        total += n * _UNIT_SECONDS[unit.lower()]
+    return total or None
+
+
+# ────────────────────────────────────────────────────────────────────
+# Trend fits
+# ────────────────────────────────────────────────────────────────────
+
+def theil_sen(ts: Sequence[float], values: Sequence[float]) -> Tuple[float, float]:
+    """
+    (slope per second, intercept) as the median of pairwise slopes — a single
+    bad weigh-in cannot drag the trend the way it would a least-squares fit.
+    """
+    ts, values = ts[-MAX_FIT_POINTS:], values[-MAX_FIT_POINTS:]
+    n = len(ts)
+    slopes = [
+        (values[j] - values[i]) / (ts[j] - ts[i])
+        for i in range(n)
+        for j in range(i + 1, n)
+        if ts[j] != ts[i]
+    ]
+    slope = median(slopes) if slopes else 0.0
+    intercept = median(v - slope * t for t, v in zip(ts, values))
+    return slope, intercept
+
+
+def holt(
+    ts: Sequence[float], values: Sequence[float], alpha: float = 0.4, beta: float = 0.2,
+) -> Tuple[float, float]:
+    """
+    Holt's linear smoothing adapted to irregular spacing (trend is per second).
+    Returns (level at the last sample, trend).
+    """
+    level, trend = values[0], 0.0
+    if len(values) > 1 and ts[1] > ts[0]:
+        trend = (values[1] - values[0]) / (ts[1] - ts[0])
+    for i in range(1, len(values)):
+        dt = ts[i] - ts[i - 1]
+        forecast = level + trend * dt
+        new_level = alpha * values[i] + (1 - alpha) * forecast
+        if dt > 0:
+            trend = beta * (new_level - level) / dt + (1 - beta) * trend
+        level = new_level
+    return level, trend
+
+
+# ────────────────────────────────────────────────────────────────────
+# Projection
+# ────────────────────────────────────────────────────────────────────
+
+class GoalProjection(NamedTuple):
+    status: str
+    metric: str
+    current: Optional[float] = None         # smoothed (Holt level)
+    target: Optional[float] = None
+    slope_per_week: Optional[float] = None  # Theil–Sen
+    smoothed_per_week: Optional[float] = None
+    required_per_week: Optional[float] = None
+    eta: Optional[float] = None             # epoch seconds
+    deadline: Optional[float] = None
+    projected_at_deadline: Optional[float] = None
+
+    @property
+    def off_track(self) -> bool:
+        return self.status in ("behind", "off_track")
+
+    def as_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for key, value in self._asdict().items():
+            if key in ("eta", "deadline") and value is not None:
+                value = datetime.fromtimestamp(value, timezone.utc).date().isoformat()
+            elif isinstance(value, float):
+                value = round(value, 2)
+            out[key] = value
+        out["off_track"] = self.off_track
+        return out
+
+
+def project(
+    goal: Optional[Dict[str, Any]],
+    series: Optional[MetricSeries],
+    now: Optional[float] = None,
+) -> GoalProjection:
+    """Where the user's tracked metric is heading relative to their goal."""
+    metric = (goal or {}).get("tracked_metric") or "weight"
+    if not goal:
+        return GoalProjection("no_goal", metric)
+    now = time.time() if now is None else now
+    change = goal_change(goal)
+    if change is None:
+        return GoalProjection("unit_mismatch", metric)
+    if series is None:
+        return GoalProjection("insufficient_data", metric)
+
+    set_at = to_epoch(goal["set_at"]) if goal.get("set_at") else None
+    pairs = [(t, v) for t, v in zip(series.ts, series.values) if v == v and t <= now]
+    since = [(t, v) for t, v in pairs if set_at is None or t >= set_at - DAY]
+    if len(since) >= MIN_SAMPLES:
+        pairs = since
+    if not pairs:
+        return GoalProjection("insufficient_data", metric)
+    ts = [t for t, _ in pairs]
+    vals = [v for _, v in pairs]
+
+    sign = 1.0 if goal.get("direction") == "gain" else -1.0
+    baseline = goal.get("baseline")
+    if baseline is None:
+        baseline = vals[0]
+    target = baseline + sign * change
+    start = set_at if set_at is not None else ts[0]
+    window = parse_duration(goal.get("duration"))
+    deadline = start + window if window else None
+
+    current, trend = holt(ts, vals)
+    if len(ts) < MIN_SAMPLES or ts[-1] - ts[0] < MIN_SPAN:
+        return GoalProjection("insufficient_data", metric, current, target, deadline=deadline)
+
+    slope, _ = theil_sen(ts, vals)
+    remaining = target - current
+    required = projected = None
+    if deadline is not None and deadline > now:     # past deadlines get no (backwards) projection
+        required = remaining / (deadline - now) * WEEK
+        projected = current + slope * (deadline - now)
+
+    eta = None
+    if sign * remaining <= 0:
+        status = "achieved"
+    elif sign * slope <= 0:
+        status = "off_track"                    # flat or moving away from the goal
+    else:
+        eta = now + remaining / slope
+        grace = BEHIND_TOLERANCE * window if window else 0.0
+        status = "behind" if deadline is not None and eta > deadline + grace else "on_track"
+
+    return GoalProjection(
+        status, metric, current, target, slope * WEEK, trend * WEEK,
+        required, eta, deadline, projected,
+    )
+
+
+def project_session(session, now: Optional[float] = None) -> GoalProjection:
+    goal = session.goal
+    metric = (goal or {}).get("tracked_metric") or "weight"
+    return project(goal, session.progress.get(metric), now)
+
+
+def project_payloads(
+    payloads: Iterable[Tuple[int, str]], now: Optional[float] = None,
+) -> Iterator[Tuple[int, GoalProjection]]:
+    """
+    (uid, projection) for every serialised session that has a goal — e.g.
+    `project_payloads(store.iter_payloads())`. Each payload is parsed as JSON,
+    but only the tracked series is turned into a MetricSeries; no session
+    models are validated.
+    """
+    now = time.time() if now is None else now
+    for uid, payload in payloads:
+        data = json.loads(payload)
+        goal = data.get("goal")
+        if not goal:
+            continue
+        metric = goal.get("tracked_metric") or "weight"
+        raw = (data.get("progress") or {}).get(metric) if isinstance(data.get("progress"), dict) else None
+        series = MetricSeries.from_dict(raw) if raw else None
+        yield uid, project(goal, series, now)
+
+
+def summarize(results: Iterable[Tuple[int, GoalProjection]]) -> Dict[str, Any]:
+    """Dashboard roll-up: counts per status and the uids needing a coach's attention."""
+    counts = {s: 0 for s in STATUSES}
+    flagged: List[int] = []
+    for uid, proj in results:
+        counts[proj.status] += 1
+        if proj.off_track:
+            flagged.append(uid)
+    return {"counts": counts, "off_track_uids": flagged}
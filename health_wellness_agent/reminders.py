@@ -0,0 +1,361 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: reminders.py
+Description: Background reminder engine that owns every scheduler RRULE across sessions and
+fires due check-ins in batches to a pluggable sink.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Parsing of the scheduler's weekly RRULEs (cached; there are only a few hundred distinct ones)
+# • ReminderEngine: min-heap of next fire times, one entry per (uid, rrule), O(log n) schedule
+# • Lazy expansion — the next occurrence is computed only when the current one fires,
+#   from per-(rule, week) fire times cached across every user sharing the rule
+# • Batched dispatch to a sink, injectable clock, rebuild from the SessionStore after restarts
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_right
+from datetime import date, datetime, tzinfo
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, TextIO, Tuple
+
+_DAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+
+# ────────────────────────────────────────────────────────────────────
+# Recurrence rules
+# ────────────────────────────────────────────────────────────────────
+
+class WeeklyRule(NamedTuple):
+    weekdays: Tuple[int, ...]       # 0 = Monday, sorted
+    hour: int
+    minute: int
+
+
+@lru_cache(maxsize=4096)
+def parse_rrule(rrule: str) -> WeeklyRule:
+    """Parse the FREQ=WEEKLY rules the scheduler writes; raises ValueError otherwise."""
+    body = rrule.split(":", 1)[1] if rrule.upper().startswith("RRULE:") else rrule
+    parts = dict(p.split("=", 1) for p in body.upper().split(";") if "=" in p)
+    if parts.get("FREQ") != "WEEKLY":
+        raise ValueError(f"unsupported RRULE (only FREQ=WEEKLY): {rrule}")
+    try:
+        days = tuple(sorted({_DAYS.index(d[-2:]) for d in parts["BYDAY"].split(",")}))
+        hour = int(parts.get("BYHOUR", 9))
+        minute = int(parts.get("BYMINUTE", 0))
+    except (KeyError, ValueError) as exc:
+        raise ValueError(f"malformed RRULE: {rrule}") from exc
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"malformed RRULE: {rrule}")
+    return WeeklyRule(days, hour, minute)
+
+
+def next_occurrence(rule: WeeklyRule, after: float, tz: Optional[tzinfo] = None) -> float:
+    """First fire time strictly after the epoch timestamp `after`, in wall-clock time `tz`."""
+    day = datetime.fromtimestamp(after, tz).date()
+    times = _fire_times(rule, day.toordinal() - day.weekday(), tz)
+    return times[bisect_right(times, after)]
+
+
+@lru_cache(maxsize=65536)
+def _fire_times(rule: WeeklyRule, monday: int, tz: Optional[tzinfo]) -> Tuple[float, ...]:
+    """
+    Fire times in the week starting on `monday` (a date ordinal) and the week
+    after, ascending. Computed once per rule and week, so expanding millions of
+    reminders that share a few hundred rules is mostly a bisect.
+    """
+    out = []
+    for offset in (0, 7):
+        for weekday in rule.weekdays:
+            d = date.fromordinal(monday + offset + weekday)
+            out.append(datetime(d.year, d.month, d.day, rule.hour, rule.minute, tzinfo=tz).timestamp())
+    return tuple(out)
+
+
+# ────────────────────────────────────────────────────────────────────
+# Sinks
+# ────────────────────────────────────────────────────────────────────
+
+class Reminder(NamedTuple):
+    uid: int
+    rrule: str
+    due: float                      # epoch seconds
+
+
+class ReminderSink:
+    """Receives due reminders in batches."""
+
+    async def deliver(self, batch: Sequence[Reminder]) -> None:
+        raise NotImplementedError
+
+
+class ConsoleSink(ReminderSink):
+    def __init__(self, stream: Optional[TextIO] = None) -> None:
+        self.stream = stream or sys.stdout
+
+    async def deliver(self, batch: Sequence[Reminder]) -> None:
+        for r in batch:
+            when = datetime.fromtimestamp(r.due).isoformat(timespec="minutes")
+            self.stream.write(f"[Reminder] check-in due for uid={r.uid} at {when}\n")
+        self.stream.flush()
+
+
+class QueueSink(ReminderSink):
+    """Hands each batch to an asyncio.Queue (notification workers, tests)."""
+
+    def __init__(self, queue: "asyncio.Queue[Sequence[Reminder]]") -> None:
+        self.queue = queue
+
+    async def deliver(self, batch: Sequence[Reminder]) -> None:
+        await self.queue.put(batch)
+
+
+# ────────────────────────────────────────────────────────────────────
+# Engine
+# ────────────────────────────────────────────────────────────────────
+
+class ReminderEngine:
+    """
+    One heap entry per active (uid, rrule): `(fire_at, seq, uid, rrule)`.
+    Rescheduling or cancelling just records a new `seq` for the key; stale heap
+    entries are skipped when popped, so neither operation searches the heap.
+
+    `clock` returns epoch seconds and is the only source of "now", so tests can
+    drive the engine by calling `dispatch_due()` with a fake clock.
+    """
+
+    def __init__(
+        self,
+        sink: Optional[ReminderSink] = None,
+        clock: Callable[[], float] = time.time,
+        tz: Optional[tzinfo] = None,
+        max_batch: int = 1000,
+        max_sleep: float = 30.0,
+        state_path: Optional[str] = None,
+        max_catch_up: float = 6 * 3600.0,
+    ) -> None:
+        self.sink = sink or ConsoleSink()
+        self.clock = clock
+        self.tz = tz
+        self.max_batch = max_batch
+        self.max_sleep = max_sleep
+        self.state_path = state_path
+        self.max_catch_up = max_catch_up
+
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._live: Dict[Tuple[int, str], int] = {}     # (uid, rrule) → seq of its heap entry
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self.watermark = self.clock()                   # everything due before this was delivered
+        self.stats = {"dispatched": 0, "batches": 0, "failed": 0, "stale_skipped": 0}
+        self.max_lag = 0.0
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    # ── scheduling ──────────────────────────────────────────────────
+    def schedule(self, uid: int, rrule: str, after: Optional[float] = None) -> float:
+        """(Re)arm `rrule` for `uid`; returns the next fire time. O(log n)."""
+        rule = parse_rrule(rrule)
+        fire_at = next_occurrence(rule, self.clock() if after is None else after, self.tz)
+        with self._lock:
+            seq = next(self._seq)
+            self._live[(uid, rrule)] = seq
+            heapq.heappush(self._heap, (fire_at, seq, uid, sys.intern(rrule)))
+            earliest = self._heap[0][1] == seq
+        if earliest:
+            self._wake()
+        return fire_at
+
+    def cancel(self, uid: int, rrule: Optional[str] = None) -> int:
+        """Drop one rule (O(1)), or every rule of `uid` (a scan); returns how many were active."""
+        with self._lock:
+            if rrule is not None:
+                return int(self._live.pop((uid, rrule), None) is not None)
+            keys = [k for k in self._live if k[0] == uid]
+            for k in keys:
+                del self._live[k]
+            return len(keys)
+
+    def retain(self, keep: Callable[[int], bool]) -> int:
+        """Cancel every reminder whose uid `keep` rejects (e.g. after a shard hand-over)."""
+        with self._lock:
+            gone = [key for key in self._live if not keep(key[0])]
+            for key in gone:
+                del self._live[key]
+            self._drop_stale()
+        return len(gone)
+
+    def next_due(self) -> Optional[float]:
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+
+    # ── dispatch ────────────────────────────────────────────────────
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[Reminder]:
+        """Remove up to `limit` due reminders and re-arm each rule for its next occurrence."""
+        now = self.clock() if now is None else now
+        limit = limit or self.max_batch
+        due: List[Reminder] = []
+        with self._lock:
+            while self._heap and len(due) < limit and self._heap[0][0] <= now:
+                fire_at, seq, uid, rrule = heapq.heappop(self._heap)
+                if self._live.get((uid, rrule)) != seq:
+                    self.stats["stale_skipped"] += 1
+                    continue
+                due.append(Reminder(uid, rrule, fire_at))
+                nxt = next_occurrence(parse_rrule(rrule), max(fire_at, now), self.tz)
+                seq = next(self._seq)
+                self._live[(uid, rrule)] = seq
+                heapq.heappush(self._heap, (nxt, seq, uid, rrule))
+            self._drop_stale()
+            if not self._heap or self._heap[0][0] > now:
+                self.watermark = now
+        return due
+
+    async def dispatch_due(self, now: Optional[float] = None) -> int:
+        """Deliver every reminder due at `now`, in batches of `max_batch`; returns the count."""
+        now = self.clock() if now is None else now
+        total = 0
+        while True:
+            batch = self.pop_due(now)
+            if not batch:
+                break
+            self.max_lag = max(self.max_lag, now - batch[0].due)
+            try:
+                await self.sink.deliver(batch)
+            except Exception as exc:                    # a bad sink must not stop the engine
+                self.stats["failed"] += len(batch)
+                print(f"[ReminderEngine] sink failed for {len(batch)} reminders: {exc}")
+            else:
+                self.stats["dispatched"] += len(batch)
+            self.stats["batches"] += 1
+            total += len(batch)
+        if total:
+            self._save_watermark()
+        return total
+
+    # ── background loop ─────────────────────────────────────────────
+    def start(self) -> asyncio.Task:
+        """Run the dispatch loop on the current event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run(), name="reminder-engine")
+        return self._task
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._save_watermark()
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            nxt = self.next_due()
+            delay = self.max_sleep if nxt is None else nxt - self.clock()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, self.max_sleep))
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self.dispatch_due()
+
+    def _wake(self) -> None:
+        # schedule() may be called from tool threads as well as the loop itself.
+        if self._loop is not None and self._wakeup is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _drop_stale(self) -> None:
+        while self._heap and self._live.get((self._heap[0][2], self._heap[0][3])) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+            self.stats["stale_skipped"] += 1
+
+    # ── persistence ─────────────────────────────────────────────────
+    def rebuild(self, rules: Iterable[Tuple[int, str]]) -> int:
+        """
+        Re-arm every (uid, rrule) after a restart. Occurrences that fell inside
+        the downtime (since the saved watermark, at most `max_catch_up` ago) are
+        still due and fire on the next dispatch.
+        """
+        now = self.clock()
+        since = max(self._load_watermark() or now, now - self.max_catch_up)
+        entries = []
+        with self._lock:
+            for uid, rrule in rules:
+                try:
+                    fire_at = next_occurrence(parse_rrule(rrule), since, self.tz)
+                except ValueError:
+                    continue
+                seq = next(self._seq)
+                self._live[(uid, rrule)] = seq
+                entries.append((fire_at, seq, uid, sys.intern(rrule)))
+            self._heap.extend(entries)
+            heapq.heapify(self._heap)                   # O(n), cheaper than n pushes
+        self._wake()
+        return len(entries)
+
+    def rebuild_from_store(self, store) -> int:
+        """Rebuild from every session's `checkins` in a SessionStore."""
+        return self.rebuild(rules_from_payloads(store.iter_payloads()))
+
+    def _load_watermark(self) -> Optional[float]:
+        if not self.state_path:
+            return None
+        try:
+            with open(self.state_path, encoding="utf-8") as fh:
+                return float(json.load(fh)["watermark"])
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _save_watermark(self) -> None:
+        if not self.state_path:
+            return
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"watermark": self.watermark}, fh)
+        os.replace(tmp, self.state_path)
+
+
+def rules_from_payloads(payloads: Iterable[Tuple[int, str]]) -> Iterable[Tuple[int, str]]:
+    """(uid, rrule) for every distinct check-in recorded in serialised sessions."""
+    for uid, payload in payloads:
+        seen = set()
+        for event in json.loads(payload).get("checkins") or ():
+            rrule = event.get("rrule")
+            if event.get("event") == "checkin_scheduled" and rrule and rrule not in seen:
+                seen.add(rrule)
+                yield uid, rrule
+
+
+# The engine scheduler check-ins are registered with, if one is running.
+_ACTIVE: Optional[ReminderEngine] = None
+
+
+def install(engine: Optional[ReminderEngine]) -> None:
+    global _ACTIVE
+    _ACTIVE = engine
+
+
+def active_engine() -> Optional[ReminderEngine]:
+    return _ACTIVE
@@ -0,0 +1,587 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: server.py
+Description: Concurrent multi-session HTTP + Server-Sent-Events chat server that hosts many
+PlannerAgent conversations on one asyncio event loop.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Minimal HTTP/1.1 server on asyncio streams (no extra web framework dependency)
+# • POST /sessions/{uid}/messages → SSE stream of the deltas from `stream_deltas`
+# • GET /health (JSON status) and GET /metrics (OpenMetrics span histograms,
+#   escalation queue depth and wait times)
+# • Per-session ordering locks, a semaphore bounding concurrent model turns,
+#   and bounded per-client queues so slow readers apply backpressure
+# • Safety guardrail screens every model turn and reroutes injury / emergency messages;
+#   rerouted turns that also need nutrition advice fan out to both specialists at once
+# • POST /sessions/{uid}/progress → streaming bulk import of a CSV / JSONL export
+#   (parsed off the loop as it arrives, committed under the session lock)
+# • Cluster worker mode (shard=…): refuses uids it does not own and takes ring updates
+#   from the Supervisor on POST /cluster/ring, handing released sessions back to the store,
+#   re-splitting the cluster-wide turn / coach limits and releasing moving users' escalation
+#   tickets, which the new owner takes on POST /cluster/escalations
+# • Opt-in turn profiling (HWA_PROFILE_* or POST /sessions/{uid}/profile), see profiling.py
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from agents import RunConfig
+
+from health_wellness_agent.answer_cache import AnswerCache
+from health_wellness_agent.escalations import EscalationQueue, install as install_escalations
+from health_wellness_agent.fanout import SpecialistFanOut, install as install_fanout
+from health_wellness_agent.fast_path import FastPathRouter
+from health_wellness_agent.guardrails import SafetyClassifier
+from health_wellness_agent.hooks import TracingRunHooks
+from health_wellness_agent.ingest import ProgressIngest
+from health_wellness_agent.profiling import TurnProfiler
+from health_wellness_agent.reminders import ReminderEngine, install as install_reminders
+from health_wellness_agent.session_store import SessionStore
+from health_wellness_agent.tools.encoding import encoding_report
+from health_wellness_agent.utils.rendering import QueueSink, StreamMetrics, StreamRenderer
+from health_wellness_agent.utils.streaming import stream_deltas
+
+_ROUTE_MESSAGE = re.compile(r"^/sessions/(\d+)/messages$")
+_ROUTE_IMPORT = re.compile(r"^/sessions/(\d+)/progress$")
+_ROUTE_PROFILE = re.compile(r"^/sessions/(\d+)/profile$")
+_STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found",
+                405: "Method Not Allowed", 411: "Length Required",
+                413: "Payload Too Large", 421: "Misdirected Request",
+                503: "Service Unavailable"}
+_IMPORT_FORMATS = {"text/csv": "csv", "application/x-ndjson": "jsonl", "application/jsonl": "jsonl"}
+_END = object()
+
+
+class _RequestError(ValueError):
+    """A request refused before routing; `status` is the HTTP answer."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class _TurnSlots:
+    """Like asyncio.Semaphore, but the limit can change while turns hold slots."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self._cond = asyncio.Condition()
+
+    async def __aenter__(self) -> None:
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.used < self.limit)
+            self.used += 1
+
+    async def __aexit__(self, *exc) -> None:
+        async with self._cond:
+            self.used -= 1
+            self._cond.notify()
+
+    async def resize(self, limit: int) -> None:
+        """Shrinking only holds new turns back until enough running ones finish."""
+        async with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+if TYPE_CHECKING:
+    from health_wellness_agent.cluster import Shard
+
+
+@dataclass
+class ServerConfig:
+    host: str = "127.0.0.1"
+    port: int = 8080
+    max_concurrent_turns: int = 64      # model calls in flight across all sessions
+    max_pending_turns: int = 1024       # turns waiting for a model slot before 503
+    client_queue_size: int = 256        # buffered SSE events per client
+    slow_client_timeout: float = 30.0   # abort a turn if a client stops reading
+    max_body_bytes: int = 64 * 1024
+    max_import_bytes: int = 256 * 1024 * 1024   # progress exports, streamed rather than buffered
+    import_chunk_bytes: int = 256 * 1024
+    flush_interval: float = 0.03        # coalesce deltas into one SSE event per interval
+
+
+class ChatServer:
+    """Serve many sessions concurrently; each session's turns run strictly in order."""
+
+    def __init__(
+        self,
+        agent,
+        store: SessionStore,
+        config: Optional[ServerConfig] = None,
+        reminders: Optional[ReminderEngine] = None,
+        escalations: Optional[EscalationQueue] = None,
+        run_config: Optional[RunConfig] = None,
+        answer_cache: Optional[AnswerCache] = None,
+        shard: Optional["Shard"] = None,
+        profiler: Optional[TurnProfiler] = None,
+    ):
+        self.agent = agent
+        self.store = store
+        self.config = config or ServerConfig()
+        self.reminders = reminders
+        self.escalations = escalations
+        self.run_config = run_config
+        self.answer_cache = answer_cache
+        self.shard = shard
+        self.profiler = profiler or TurnProfiler()     # configured from HWA_PROFILE_*
+        if shard is not None:
+            store.owns = shard.owns
+            if escalations is not None:
+                escalations.owns = shard.owns
+                escalations.forward = self._forward_close
+        self._turn_slots = _TurnSlots(self.config.max_concurrent_turns)
+        self._session_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = (
+            weakref.WeakValueDictionary()
+        )
+        self._pending = 0
+        self.stats = {"turns": 0, "active": 0, "rejected": 0, "aborted": 0}
+        self.turn_metrics: "deque[StreamMetrics]" = deque(maxlen=1024)
+        self.hooks = TracingRunHooks()
+        self.fast_path = FastPathRouter()
+        self.safety = SafetyClassifier()
+        self.guardrails = [self.safety.guardrail()]
+        self.fanout = SpecialistFanOut(run_config=run_config, hooks=self.hooks, classifier=self.safety)
+        self._server: Optional[asyncio.base_events.Server] = None
+
+    # ── lifecycle ───────────────────────────────────────────────────
+    async def start(self) -> None:
+        install_fanout(self.fanout)
+        if self.reminders is not None:
+            # Scanning every session can take a while; keep the loop responsive.
+            await asyncio.to_thread(self.reminders.rebuild_from_store, self.store)
+            install_reminders(self.reminders)
+            self.reminders.start()
+        if self.escalations is not None:
+            install_escalations(self.escalations)
+            self.escalations.start()
+        self._server = await asyncio.start_server(
+            self._handle_conn, self.config.host, self.config.port
+        )
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.reminders is not None:
+            await self.reminders.stop()
+            install_reminders(None)
+        if self.escalations is not None:
+            await self.escalations.stop()
+            install_escalations(None)
+        install_fanout(None)
+        await self.profiler.flush()
+
+    # ── HTTP plumbing ───────────────────────────────────────────────
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        try:
+            method, path, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return None
+        headers: Dict[str, str] = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            key, _, value = raw.decode("latin-1").partition(":")
+            headers[key.strip().lower()] = value.strip()
+        if _ROUTE_IMPORT.match(path):
+            return method.upper(), path, headers, b""   # body is streamed by _import_progress
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise _RequestError(400, "malformed Content-Length") from None
+        if length < 0:
+            raise _RequestError(400, "malformed Content-Length")
+        if length > self.config.max_body_bytes:
+            raise _RequestError(413, "body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, headers, body
+
+    @staticmethod
+    async def _send_json(writer: asyncio.StreamWriter, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode()
+        writer.write(
+            f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+
+    @staticmethod
+    async def _send_text(writer: asyncio.StreamWriter, body: str, content_type: str) -> None:
+        data = body.encode()
+        writer.write(
+            "HTTP/1.1 200 OK\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            "Connection: close\r\n\r\n".encode() + data
+        )
+        await writer.drain()
+
+    async def _handle_conn(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            try:
+                req = await self._read_request(reader)
+            except _RequestError as exc:
+                await self._send_json(writer, exc.status, {"error": str(exc)})
+                return
+            if req is None:
+                return
+            method, path, headers, body = req
+
+            if path == "/health":
+                health = {"status": "ok", **self.stats, **self._latency_summary(),
+                          "fast_path_hit_rate": round(self.fast_path.hit_rate, 4),
+                          "safety": dict(self.safety.stats), "fanout": self.fanout.snapshot()}
+                if self.reminders is not None:
+                    health["reminders"] = {"active": len(self.reminders), **self.reminders.stats}
+                if self.escalations is not None:
+                    health["escalations"] = self.escalations.snapshot()
+                health["tool_output"] = encoding_report()
+                if self.answer_cache is not None:
+                    health["answer_cache"] = self.answer_cache.snapshot()
+                provider = getattr(self.run_config, "model_provider", None)
+                if hasattr(provider, "stats"):
+                    health["models"] = provider.stats()
+                if self.shard is not None:
+                    health["shard"] = {"name": self.shard.name, "hot_sessions": len(self.store)}
+                if self.profiler.enabled:
+                    health["profiling"] = self.profiler.snapshot()
+                await self._send_json(writer, 200, health)
+                return
+
+            if path == "/metrics":
+                text = self.hooks.collector.to_openmetrics()
+                extra = []
+                if self.escalations is not None:
+                    extra += self.escalations.openmetrics_lines()
+                if self.answer_cache is not None:
+                    extra += self.answer_cache.openmetrics_lines()
+                if extra:
+                    body, eof = text.rsplit("# EOF", 1)
+                    text = body + "\n".join(extra) + "\n# EOF" + eof
+                await self._send_text(
+                    writer,
+                    text,
+                    "application/openmetrics-text; version=1.0.0; charset=utf-8",
+                )
+                return
+
+            if path == "/cluster/ring" and self.shard is not None:
+                if method != "POST":
+                    await self._send_json(writer, 405, {"error": "use POST"})
+                    return
+                try:
+                    update = json.loads(body)
+                    nodes = [str(n) for n in update["nodes"]]
+                    peers = update.get("peers")
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    await self._send_json(writer, 400, {"error": 'expected {"nodes": [...]}'})
+                    return
+                await self._send_json(writer, 200, await self.adopt_ring(nodes, peers))
+                return
+
+            if path == "/cluster/escalations" and self.shard is not None:
+                if method != "POST":
+                    await self._send_json(writer, 405, {"error": "use POST"})
+                    return
+                try:
+                    update = json.loads(body)
+                    tickets, closed = list(update.get("tickets", ())), list(update.get("closed", ()))
+                except (ValueError, TypeError, AttributeError):
+                    await self._send_json(writer, 400, {"error": 'expected {"tickets": [...]}'})
+                    return
+                await self._send_json(writer, 200, self.adopt_escalations(tickets, closed))
+                return
+
+            match = _ROUTE_IMPORT.match(path) or _ROUTE_MESSAGE.match(path)
+            if match and self.shard is not None and not self.shard.owns(int(match.group(1))):
+                await self._send_json(writer, 421, {"error": "session is served by another worker"})
+                return
+
+            match = _ROUTE_PROFILE.match(path)
+            if match:
+                if method != "POST":
+                    await self._send_json(writer, 405, {"error": "use POST"})
+                    return
+                try:
+                    enabled = bool(json.loads(body or b"{}").get("enabled", True))
+                except (ValueError, AttributeError):
+                    await self._send_json(writer, 400, {"error": 'expected {"enabled": true|false}'})
+                    return
+                uid = int(match.group(1))
+                if enabled:
+                    self.profiler.enable_for(uid)
+                else:
+                    self.profiler.disable_for(uid)
+                await self._send_json(writer, 200, {"uid": uid, "profiling": enabled,
+                                                    "out_dir": str(self.profiler.out_dir)})
+                return
+
+            match = _ROUTE_IMPORT.match(path)
+            if match:
+                if method != "POST":
+                    await self._send_json(writer, 405, {"error": "use POST"})
+                    return
+                await self._import_progress(int(match.group(1)), reader, headers, writer)
+                return
+
+            match = _ROUTE_MESSAGE.match(path)
+            if not match:
+                await self._send_json(writer, 404, {"error": "not found"})
+                return
+            if method != "POST":
+                await self._send_json(writer, 405, {"error": "use POST"})
+                return
+            try:
+                message = str(json.loads(body or b"{}")["message"]).strip()
+            except (ValueError, KeyError, TypeError):
+                await self._send_json(writer, 400, {"error": 'expected {"message": "..."}'})
+                return
+            if not message:
+                await self._send_json(writer, 400, {"error": "empty message"})
+                return
+            if self._pending >= self.config.max_pending_turns:
+                self.stats["rejected"] += 1
+                await self._send_json(writer, 503, {"error": "server busy"})
+                return
+
+            await self._stream_turn(int(match.group(1)), message, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _latency_summary(self) -> dict:
+        ttfts = sorted(m.ttft for m in self.turn_metrics if m.ttft is not None)
+        if not ttfts:
+            return {}
+        return {
+            "ttft_p50_ms": round(ttfts[len(ttfts) // 2] * 1000, 2),
+            "ttft_p95_ms": round(ttfts[min(len(ttfts) - 1, int(len(ttfts) * 0.95))] * 1000, 2),
+        }
+
+    # ── cluster ─────────────────────────────────────────────────────
+    async def adopt_ring(self, nodes, peers=None) -> dict:
+        """
+        Switch to a new ring: wait out any turn on a session this worker is
+        losing, release it, and flush, so the new owner loads the final state.
+        Per-process limits are re-split for the new cluster size, and the
+        escalation tickets of users moving away are returned for the new owner.
+        """
+        self.shard.update(nodes, peers)
+        limits = self.shard.limits
+        if "max_concurrent_turns" in limits:
+            self.config.max_concurrent_turns = self.shard.split(limits["max_concurrent_turns"])
+            await self._turn_slots.resize(self.config.max_concurrent_turns)
+        tickets = []
+        if self.escalations is not None:
+            if "coaches" in limits:
+                self.escalations.resize(self.shard.split(limits["coaches"]))
+            holder = self.shard.name if self.shard.name in nodes else None    # None: retiring
+            tickets = self.escalations.release(self.shard.owns, holder)
+        released = 0
+        for uid in self.store.hot_uids():
+            if not self.shard.owns(uid):
+                async with self._lock_for(uid):
+                    released += self.store.release(uid)
+        await asyncio.to_thread(self.store.flush)
+        if self.reminders is not None:
+            self.reminders.retain(self.shard.owns)
+            await asyncio.to_thread(self.reminders.rebuild_from_store, self.store)
+        return {"worker": self.shard.name, "released": released, "hot_sessions": len(self.store),
+                "tickets": tickets}
+
+    def adopt_escalations(self, tickets, closed) -> dict:
+        """Tickets of users who moved here, and cases another worker's coach has closed."""
+        if self.escalations is None:
+            return {"adopted": 0, "closed": 0}
+        try:
+            adopted = self.escalations.adopt(tickets, self.shard.name)
+            done = sum(
+                self.escalations.close_held(int(c["uid"]), str(c["status"]), str(c["outcome"]), c.get("coach"))
+                for c in closed
+            )
+        except (KeyError, TypeError, ValueError) as exc:
+            return {"adopted": 0, "closed": 0, "error": str(exc)}
+        return {"adopted": adopted, "closed": done}
+
+    def _forward_close(self, ticket) -> None:
+        """A case our coach closed after its user moved: the owner logs it and frees the user."""
+        owner = self.shard.ring.node_for(ticket.uid)
+        address = self.shard.peers.get(owner)
+        if address is None:
+            print(f"[ChatServer] no address for {owner}; escalation #{ticket.id} close not forwarded")
+            return
+        record = {"uid": ticket.uid, "status": ticket.status, "outcome": ticket.outcome,
+                  "coach": f"{self.shard.name}/{ticket.coach}" if ticket.coach else None}
+        asyncio.ensure_future(self._post_closed(address, record))
+
+    async def _post_closed(self, address: Tuple[str, int], record: dict) -> None:
+        from health_wellness_agent.cluster import _http
+
+        for attempt in range(3):
+            try:
+                status, payload = await _http(*address, "POST", "/cluster/escalations", {"closed": [record]})
+            except (OSError, asyncio.TimeoutError) as exc:
+                print(f"[ChatServer] forwarding escalation close failed: {exc!r}")
+                return
+            if status != 200:
+                print(f"[ChatServer] forwarding escalation close failed: {status} {payload[:200]!r}")
+                return
+            if json.loads(payload).get("closed"):
+                return
+            await asyncio.sleep(1.0)        # the hand-over may still be on its way to the owner
+
+    # ── bulk import ─────────────────────────────────────────────────
+    async def _import_progress(
+        self,
+        uid: int,
+        reader: asyncio.StreamReader,
+        headers: Dict[str, str],
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        """
+        Read the export in chunks, handing complete lines to the parser on a
+        worker thread, so memory stays flat and the loop keeps streaming other
+        sessions. Dedupe and merge run on a worker thread too; the loop only
+        swaps the result in, as one ChangeSet under the session lock.
+        """
+        if "content-length" not in headers:
+            await self._send_json(writer, 411, {"error": "Content-Length required"})
+            return
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            length = -1
+        if length < 0:
+            await self._send_json(writer, 400, {"error": "malformed Content-Length"})
+            return
+        if length > self.config.max_import_bytes:
+            await self._send_json(writer, 413, {"error": "export too large"})
+            return
+        content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+        ingest = ProgressIngest(_IMPORT_FORMATS.get(content_type, "auto"))
+
+        remaining, carry, first = length, b"", True
+        while remaining:
+            chunk = await reader.read(min(self.config.import_chunk_bytes, remaining))
+            if not chunk:
+                raise asyncio.IncompleteReadError(carry, remaining)
+            remaining -= len(chunk)
+            data = carry + chunk
+            if remaining:
+                cut = data.rfind(b"\n") + 1            # only whole lines go to the parser
+                data, carry = data[:cut], data[cut:]
+            if not data:
+                continue
+            try:
+                text = data.decode("utf-8-sig" if first else "utf-8")
+            except UnicodeDecodeError:
+                await self._send_json(writer, 400, {"error": "export must be UTF-8"})
+                return
+            first = False
+            await asyncio.to_thread(ingest.feed_lines, text.splitlines(keepends=True))
+
+        async with self._lock_for(uid):                 # never lands inside a running turn
+            session = self.store.get(uid)
+            prepared = await asyncio.to_thread(ingest.prepare, session)
+            summary = ingest.apply(session, prepared)
+        await self._send_json(writer, 200, summary)
+
+    # ── turns ───────────────────────────────────────────────────────
+    def _lock_for(self, uid: int) -> asyncio.Lock:
+        lock = self._session_locks.get(uid)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[uid] = lock
+        return lock
+
+    async def _stream_turn(self, uid: int, message: str, writer: asyncio.StreamWriter) -> None:
+        writer.write(
+            b"HTTP/1.1 200 OK\r\n"
+            b"Content-Type: text/event-stream\r\n"
+            b"Cache-Control: no-cache\r\n"
+            b"Connection: close\r\n\r\n"
+        )
+        queue: asyncio.Queue = asyncio.Queue(self.config.client_queue_size)
+        producer = asyncio.create_task(self._produce(uid, message, queue))
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    break
+                kind, text = item
+                writer.write(f"event: {kind}\ndata: {json.dumps(text)}\n\n".encode())
+                # A client that stops reading fills its socket buffer; give up on it
+                # instead of letting the turn hold a model slot indefinitely.
+                await asyncio.wait_for(writer.drain(), self.config.slow_client_timeout)
+        except (asyncio.TimeoutError, ConnectionError):
+            self.stats["aborted"] += 1
+            producer.cancel()
+        finally:
+            if not producer.done():
+                producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def _produce(self, uid: int, message: str, queue: asyncio.Queue) -> None:
+        self._pending += 1
+        waiting = True
+        try:
+            async with self._lock_for(uid):             # keep each session's turns ordered
+                ctx = self.store.get(uid)
+                async with self._turn_slots:            # bound concurrent model calls
+                    self._pending -= 1
+                    waiting = False
+                    self.stats["active"] += 1
+                    renderer = StreamRenderer(
+                        QueueSink(queue), max_delay=self.config.flush_interval
+                    )
+                    try:
+                        async for kind, text in stream_deltas(
+                            self.agent, message, ctx,
+                            run_config=self.run_config,
+                            hooks=self.hooks, fast_path=self.fast_path,
+                            guardrails=self.guardrails,
+                            answer_cache=self.answer_cache,
+                            fanout=self.fanout,
+                            profiler=self.profiler,
+                        ):
+                            await renderer.feed(kind, text)  # blocks when the client lags
+                        self.turn_metrics.append(await renderer.close())
+                        self.stats["turns"] += 1
+                    finally:
+                        self.stats["active"] -= 1
+            await queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            await queue.put(("error", str(exc)))
+            await queue.put(_END)
+        finally:
+            if waiting:
+                self._pending -= 1
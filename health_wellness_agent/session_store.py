@@ -0,0 +1,386 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: session_store.py
+Description: Persistent, write-behind session store that keeps a bounded LRU of hot
+UserSessionContext objects and flushes mutations to SQLite or an append-only log.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Pluggable backends (SQLite, append-only JSONL log) behind one small interface
+# • Lazy per-uid loading with a bounded LRU of hot sessions
+# • Batched write-behind flushing on a background thread, so tools never wait on fsync;
+#   loads take a read lock of their own, so get() never waits on one either
+# • Optional ownership filter and release(), so a cluster worker scans only its own uids
+#   and can hand a session over to another process
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from health_wellness_agent.context import UserSessionContext
+
+
+# ────────────────────────────────────────────────────────────────────
+# Backends
+# ────────────────────────────────────────────────────────────────────
+
+class SessionBackend:
+    """Minimal storage interface: raw JSON payloads keyed by uid."""
+
+    def load(self, uid: int) -> Optional[str]:
+        raise NotImplementedError
+
+    def save_many(self, items: Iterable[Tuple[int, str]]) -> None:
+        """Persist a batch of (uid, payload) pairs durably, in one transaction."""
+        raise NotImplementedError
+
+    def uids(self) -> Iterator[int]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(SessionBackend):
+    """
+    One row per session; each flush is a single upsert transaction. Loads use
+    their own connection: under WAL a reader never waits for a writer's commit.
+    """
+
+    def __init__(self, path: str = "sessions.db") -> None:
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "uid INTEGER PRIMARY KEY, data TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._read_lock = threading.Lock()
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+
+    def load(self, uid: int) -> Optional[str]:
+        with self._read_lock:
+            row = self._reader.execute(
+                "SELECT data FROM sessions WHERE uid = ?", (uid,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def save_many(self, items: Iterable[Tuple[int, str]]) -> None:
+        rows = list(items)
+        if not rows:
+            return
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO sessions (uid, data) VALUES (?, ?) "
+                "ON CONFLICT(uid) DO UPDATE SET data = excluded.data",
+                rows,
+            )
+
+    def uids(self) -> Iterator[int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT uid FROM sessions").fetchall()
+        return iter([r[0] for r in rows])
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        with self._read_lock:
+            self._reader.close()
+
+
+class AppendLogBackend(SessionBackend):
+    """
+    Append-only JSONL log. Every flush appends the newest snapshot of each dirty
+    session; an in-memory offset index points at the latest record per uid.
+    The log is compacted once dead records outweigh live ones.
+
+    `_write_lock` serialises writers and is held across fsync and compaction;
+    `_lock` only guards the index and the file swap, so a load never waits on
+    an fsync.
+    """
+
+    def __init__(self, path: str = "sessions.log", compact_ratio: float = 2.0) -> None:
+        self._path = path
+        self._compact_ratio = compact_ratio
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._index: Dict[int, Tuple[int, int]] = {}   # uid → (offset, length)
+        self._records = 0
+        open(path, "ab").close()
+        self._rebuild_index()
+        self._fh = open(path, "ab")
+
+    def _rebuild_index(self) -> None:
+        offset = 0
+        with open(self._path, "r+b") as fh:
+            for line in fh:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("unterminated record")
+                    uid = json.loads(line)["uid"]
+                except (ValueError, KeyError):
+                    break                               # torn tail write
+                self._index[uid] = (offset, len(line))
+                self._records += 1
+                offset += len(line)
+            # Cut the torn tail off, or new records would be appended after it
+            # and lost on the next rebuild.
+            fh.truncate(offset)
+
+    def load(self, uid: int) -> Optional[str]:
+        with self._lock:                                # not _write_lock: never behind an fsync
+            loc = self._index.get(uid)
+            if loc is None:
+                return None
+            with open(self._path, "rb") as fh:
+                fh.seek(loc[0])
+                line = fh.read(loc[1])
+        return json.loads(line)["data"]
+
+    def save_many(self, items: Iterable[Tuple[int, str]]) -> None:
+        lines = [(uid, (json.dumps({"uid": uid, "data": data}) + "\n").encode()) for uid, data in items]
+        if not lines:
+            return
+        with self._write_lock:
+            offset = self._fh.tell()
+            self._fh.write(b"".join(line for _, line in lines))
+            self._fh.flush()                            # readable from here on
+            with self._lock:
+                for uid, line in lines:
+                    self._index[uid] = (offset, len(line))
+                    offset += len(line)
+                self._records += len(lines)
+            os.fsync(self._fh.fileno())
+            if self._records > self._compact_ratio * max(len(self._index), 1):
+                self._compact()
+
+    def _compact(self) -> None:
+        # Under _write_lock: nothing is appended meanwhile, and loads keep
+        # reading the old file until the swap.
+        tmp = self._path + ".compact"
+        with self._lock:
+            live = list(self._index.items())
+        index: Dict[int, Tuple[int, int]] = {}
+        with open(self._path, "rb") as src, open(tmp, "wb") as dst:
+            for uid, (off, length) in live:
+                src.seek(off)
+                line = src.read(length)
+                index[uid] = (dst.tell(), length)
+                dst.write(line)
+            dst.flush()
+            os.fsync(dst.fileno())
+        with self._lock:
+            self._fh.close()
+            os.replace(tmp, self._path)
+            self._fh = open(self._path, "ab")
+            self._index, self._records = index, len(index)
+
+    def uids(self) -> Iterator[int]:
+        with self._lock:
+            return iter(list(self._index))
+
+    def close(self) -> None:
+        with self._write_lock, self._lock:
+            self._fh.close()
+
+
+# ────────────────────────────────────────────────────────────────────
+# Store
+# ────────────────────────────────────────────────────────────────────
+
+class SessionStore:
+    """
+    Lazily loads sessions by uid into a bounded LRU and persists them write-behind.
+
+    `UserSessionContext.mark_dirty()` only records the uid in a set; a background
+    thread serialises dirty sessions and hands them to the backend in batches.
+    Evicted sessions that are still dirty are snapshotted into a pending buffer
+    so nothing is lost and a reload sees the latest state.
+    """
+
+    def __init__(
+        self,
+        backend: SessionBackend,
+        capacity: int = 1024,
+        flush_interval: float = 1.0,
+        max_batch: int = 500,
+        owns: Optional[Callable[[int], bool]] = None,
+    ) -> None:
+        self._backend = backend
+        self.owns = owns                                # shard filter for uids() scans
+        self._capacity = capacity
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+
+        self._lock = threading.RLock()
+        self._hot: "OrderedDict[int, UserSessionContext]" = OrderedDict()
+        self._dirty: set[int] = set()
+        self._pending: Dict[int, str] = {}          # evicted-but-unflushed payloads
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(
+            target=self._flush_loop, name="session-flusher", daemon=True
+        )
+        self._flusher.start()
+
+    # ── public API ──────────────────────────────────────────────────
+    def get(self, uid: int, name: str = "Guest") -> UserSessionContext:
+        """Return the hot session for `uid`, loading or creating it on first use."""
+        with self._lock:
+            ctx = self._hot.get(uid)
+            if ctx is not None:
+                self._hot.move_to_end(uid)
+                return ctx
+            payload = self._pending.get(uid)
+
+        if payload is None:
+            payload = self._backend.load(uid)
+        if payload is not None:
+            ctx = UserSessionContext.model_validate_json(payload)
+        else:
+            ctx = UserSessionContext(name=name, uid=uid)
+
+        with self._lock:
+            existing = self._hot.get(uid)               # lost a load race
+            if existing is not None:
+                return existing
+            ctx._on_change = self.mark_dirty
+            self._hot[uid] = ctx
+            if payload is None:
+                self._dirty.add(uid)
+            self._evict()
+        return ctx
+
+    def mark_dirty(self, uid: int) -> None:
+        with self._lock:
+            self._dirty.add(uid)
+            if len(self._dirty) >= self._max_batch:
+                self._wake.set()
+
+    def uids(self) -> Iterator[int]:
+        """Every uid known to the backend plus any not yet flushed."""
+        with self._lock:
+            extra = set(self._hot) | set(self._pending)
+        owns = self.owns or (lambda _uid: True)
+        seen = set()
+        for uid in self._backend.uids():
+            seen.add(uid)
+            if owns(uid):
+                yield uid
+        yield from (uid for uid in extra if uid not in seen and owns(uid))
+
+    def hot_uids(self) -> List[int]:
+        with self._lock:
+            return list(self._hot)
+
+    def release(self, uid: int) -> bool:
+        """
+        Drop `uid` from memory so another process can own it; unflushed state
+        moves to the pending buffer and goes out with the next flush(). The
+        caller makes sure no turn is running on it.
+        """
+        with self._lock:
+            ctx = self._hot.pop(uid, None)
+            if ctx is None:
+                return False
+            ctx._on_change = None
+            if uid in self._dirty:
+                self._dirty.discard(uid)
+                self._pending[uid] = ctx.model_dump_json()
+        return True
+
+    def iter_payloads(self) -> Iterator[Tuple[int, str]]:
+        """
+        (uid, JSON) for every session, newest state first from memory, without
+        loading anything into the LRU — for bulk scans such as reminder rebuilds.
+        """
+        for uid in self.uids():
+            with self._lock:
+                ctx = self._hot.get(uid)
+                payload = self._pending.get(uid)
+            if ctx is not None:
+                try:
+                    payload = ctx.model_dump_json()
+                except RuntimeError:                    # mutated mid-dump; use stored copy
+                    payload = None
+            if payload is None:
+                payload = self._backend.load(uid)
+            if payload is not None:
+                yield uid, payload
+
+    def flush(self) -> int:
+        """Synchronously persist every dirty session; returns the number written."""
+        with self._lock:
+            batch = dict(self._pending)
+            self._pending.clear()
+            dirty, self._dirty = self._dirty, set()
+            for uid in dirty:
+                ctx = self._hot.get(uid)
+                if ctx is None:
+                    continue
+                if ctx.in_transaction:                  # persist committed turns only
+                    self._dirty.add(uid)
+                    continue
+                try:
+                    batch[uid] = ctx.model_dump_json()
+                except RuntimeError:                    # mutated mid-dump; retry later
+                    self._dirty.add(uid)
+        if batch:
+            try:
+                self._backend.save_many(batch.items())
+            except Exception:
+                with self._lock:                        # keep data for the next attempt
+                    for uid, data in batch.items():
+                        self._pending.setdefault(uid, data)
+                raise
+        return len(batch)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        self._flusher.join()
+        self.flush()
+        self._backend.close()
+
+    def __len__(self) -> int:
+        return len(self._hot)
+
+    # ── internals ───────────────────────────────────────────────────
+    def _evict(self) -> None:
+        # Sessions in a turn stay hot: a reload while the turn still holds its
+        # object would make a second live copy. Oldest idle ones go first.
+        excess = len(self._hot) - self._capacity
+        if excess <= 0:
+            return
+        for uid in [u for u, c in self._hot.items() if not c.in_transaction][:excess]:
+            ctx = self._hot.pop(uid)
+            # Late mutations (e.g. a durable log from a coach worker) go to pending.
+            ctx._on_change = lambda _uid, c=ctx: self._stash(c)
+            if uid in self._dirty:
+                self._dirty.discard(uid)
+                self._pending[uid] = ctx.model_dump_json()
+
+    def _stash(self, ctx: UserSessionContext) -> None:
+        with self._lock:
+            if ctx.uid not in self._hot:
+                self._pending[ctx.uid] = ctx.model_dump_json()
+
+    def _flush_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as exc:                    # keep flusher alive
+                print(f"[SessionStore] flush failed: {exc}")
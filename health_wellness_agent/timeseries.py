@@ -0,0 +1,445 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: timeseries.py
+Description: Columnar, array-backed time-series storage for tracker progress logs, with
+range / rolling / min-max / downsampling queries and a retention-rollup policy.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • MetricSeries: timestamps and values in compact `array('d')` columns, notes on the side
+# • merge(): O(n + m) bulk insert of a time-sorted batch (imports)
+# • Bisect-based range queries, prefix-sum rolling means, bucketed downsampling
+# • RetentionPolicy that rolls old raw samples up into bucket means
+# • ProgressHistory: per-metric series that (de)serialises as a pydantic field
+
+from __future__ import annotations
+
+import base64
+import math
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from pydantic_core import core_schema
+
+
+Column = array  # array('d')
+
+
+def to_epoch(ts: Any) -> float:
+    """Accept epoch seconds, datetimes or ISO-8601 strings (with optional 'Z')."""
+    if ts is None:
+        return time.time()
+    if isinstance(ts, (int, float)):
+        return float(ts)
+    if isinstance(ts, datetime):
+        dt = ts
+    else:
+        dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def _pack(col: array) -> str:
+    if sys.byteorder != "little":
+        col = array("d", col)
+        col.byteswap()
+    return base64.b64encode(col.tobytes()).decode("ascii")
+
+
+def _unpack(data: str) -> array:
+    col = array("d")
+    col.frombytes(base64.b64decode(data))
+    if sys.byteorder != "little":
+        col.byteswap()
+    return col
+
+
+# ────────────────────────────────────────────────────────────────────
+# Retention
+# ────────────────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    """
+    Keep `raw_days` of raw samples; whole `rollup_seconds` buckets older than
+    that are rolled up into one mean sample each, carrying the bucket's notes.
+    """
+    raw_days: float = 180.0
+    rollup_seconds: float = 7 * 86400.0
+
+    @property
+    def raw_seconds(self) -> float:
+        return self.raw_days * 86400.0
+
+
+DEFAULT_RETENTION = RetentionPolicy()
+
+
+# ────────────────────────────────────────────────────────────────────
+# Per-metric series
+# ────────────────────────────────────────────────────────────────────
+
+class MetricSeries:
+    """Sorted (timestamp, value) columns for a single metric."""
+
+    __slots__ = ("ts", "values", "notes", "_rolled_until")
+
+    def __init__(
+        self,
+        ts: Optional[array] = None,
+        values: Optional[array] = None,
+        notes: Optional[Dict[int, str]] = None,
+        rolled_until: float = 0.0,
+    ) -> None:
+        self.ts: Column = ts if ts is not None else array("d")
+        self.values: Column = values if values is not None else array("d")
+        self.notes: Dict[int, str] = notes or {}
+        self._rolled_until = rolled_until         # samples before this are rollups
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def copy(self) -> "MetricSeries":
+        return MetricSeries(
+            array("d", self.ts), array("d", self.values), dict(self.notes), self._rolled_until
+        )
+
+    # ── writes ──────────────────────────────────────────────────────
+    def append(self, ts: float, value: float, note: Optional[str] = None) -> int:
+        """Insert a sample keeping timestamps sorted; O(1) for in-order appends."""
+        if not self.ts or ts >= self.ts[-1]:
+            idx = len(self.ts)
+            self.ts.append(ts)
+            self.values.append(value)
+        else:
+            idx = bisect_right(self.ts, ts)
+            self.ts.insert(idx, ts)
+            self.values.insert(idx, value)
+            self.notes = {(i + 1 if i >= idx else i): n for i, n in self.notes.items()}
+        if note:
+            self.notes[idx] = note
+        return idx
+
+    def merge(self, ts: array, values: array, notes: Optional[Dict[int, str]] = None) -> int:
+        """
+        Merge a batch already sorted by time in one O(n + m) pass instead of
+        m bisect-inserts; on equal timestamps existing samples come first.
+        Returns the number of samples added.
+        """
+        if not ts:
+            return 0
+        notes = notes or {}
+        if not self.ts or ts[0] >= self.ts[-1]:
+            base = len(self.ts)
+            self.ts.extend(ts)
+            self.values.extend(values)
+            self.notes.update((base + i, n) for i, n in notes.items())
+            return len(ts)
+        out_ts, out_vals, out_notes = array("d"), array("d"), {}
+        i = j = 0
+        n, m = len(self.ts), len(ts)
+        while i < n or j < m:
+            if j >= m or (i < n and self.ts[i] <= ts[j]):
+                note = self.notes.get(i)
+                out_ts.append(self.ts[i])
+                out_vals.append(self.values[i])
+                i += 1
+            else:
+                note = notes.get(j)
+                out_ts.append(ts[j])
+                out_vals.append(values[j])
+                j += 1
+            if note:
+                out_notes[len(out_ts) - 1] = note
+        self.ts, self.values, self.notes = out_ts, out_vals, out_notes
+        return m
+
+    def due_for_rollup(self, policy: RetentionPolicy, now: float) -> bool:
+        """True once the oldest raw sample is a full bucket past the raw window."""
+        lo = bisect_left(self.ts, self._rolled_until)
+        return lo < len(self.ts) and self.ts[lo] < now - policy.raw_seconds - policy.rollup_seconds
+
+    def apply_retention(self, policy: RetentionPolicy, now: Optional[float] = None) -> int:
+        """
+        Roll raw samples older than the policy window into bucket means. Only
+        whole buckets are rolled, so the next run starts a fresh bucket; a bucket
+        that already holds a rollup (series saved before that rule) is merged
+        into, the old rollup counting as one sample, never given a second one.
+        A bucket's notes are joined in time order onto its rollup, which is NaN
+        when the bucket held only free-text samples.
+        """
+        now = time.time() if now is None else now
+        width = policy.rollup_seconds
+        cutoff = math.floor((now - policy.raw_seconds) / width) * width
+        lo = bisect_left(self.ts, self._rolled_until)
+        hi = bisect_left(self.ts, cutoff)
+        if lo >= hi:
+            return 0
+        lo = bisect_left(self.ts, math.floor(self.ts[lo] / width) * width)
+
+        b_ts, b_vals, b_notes = array("d"), array("d"), {}
+        i = lo
+        while i < hi:
+            bucket = math.floor(self.ts[i] / width)
+            acc: List[float] = []
+            texts: List[str] = []
+            while i < hi and math.floor(self.ts[i] / width) == bucket:
+                v = self.values[i]
+                if v == v:
+                    acc.append(v)
+                if self.notes.get(i):
+                    texts.append(self.notes[i])
+                i += 1
+            if texts:
+                b_notes[lo + len(b_ts)] = "; ".join(texts)
+            b_ts.append(bucket * width)
+            b_vals.append(math.fsum(acc) / len(acc) if acc else math.nan)
+
+        removed = (hi - lo) - len(b_ts)
+        self.ts[lo:hi] = b_ts
+        self.values[lo:hi] = b_vals
+        self.notes = {
+            (i - removed if i >= hi else i): n
+            for i, n in self.notes.items()
+            if not lo <= i < hi
+        }
+        self.notes.update(b_notes)
+        self._rolled_until = cutoff
+        return removed
+
+    # ── queries ─────────────────────────────────────────────────────
+    def _bounds(self, start: Optional[float], end: Optional[float]) -> Tuple[int, int]:
+        lo = 0 if start is None else bisect_left(self.ts, start)
+        hi = len(self.ts) if end is None else bisect_right(self.ts, end)
+        return lo, hi
+
+    def range(
+        self, start: Optional[float] = None, end: Optional[float] = None
+    ) -> Tuple[array, array]:
+        """Timestamps and values within [start, end], as array slices."""
+        lo, hi = self._bounds(start, end)
+        return self.ts[lo:hi], self.values[lo:hi]
+
+    def min(self, start: Optional[float] = None, end: Optional[float] = None) -> float:
+        _, vals = self.range(start, end)
+        vals = [v for v in vals if v == v]        # skip NaN (free-text samples)
+        return min(vals) if vals else math.nan
+
+    def max(self, start: Optional[float] = None, end: Optional[float] = None) -> float:
+        _, vals = self.range(start, end)
+        vals = [v for v in vals if v == v]
+        return max(vals) if vals else math.nan
+
+    def contains(self, ts: float) -> bool:
+        i = bisect_left(self.ts, ts)
+        return i < len(self.ts) and self.ts[i] == ts
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        return (self.ts[-1], self.values[-1]) if self.ts else None
+
+    def rolling_mean(self, window: int) -> array:
+        """Trailing mean over `window` samples, via one prefix-sum pass."""
+        out = array("d")
+        if window <= 0:
+            return out
+        csum, ccount = 0.0, 0
+        sums, counts = [0.0], [0]
+        for v in self.values:
+            if v == v:
+                csum += v
+                ccount += 1
+            sums.append(csum)
+            counts.append(ccount)
+        for i in range(1, len(sums)):
+            j = max(0, i - window)
+            n = counts[i] - counts[j]
+            out.append((sums[i] - sums[j]) / n if n else math.nan)
+        return out
+
+    def downsample(
+        self,
+        bucket_seconds: float,
+        agg: str = "mean",
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+    ) -> Tuple[array, array]:
+        """Aggregate into fixed-width buckets (`mean`, `min`, `max`, `last`)."""
+        lo, hi = self._bounds(start, end)
+        return self._bucket(lo, hi, bucket_seconds, agg)
+
+    def _bucket(self, lo: int, hi: int, width: float, agg: str) -> Tuple[array, array]:
+        out_ts, out_vals = array("d"), array("d")
+        i = lo
+        while i < hi:
+            bucket = math.floor(self.ts[i] / width)
+            j = i
+            acc: List[float] = []
+            while j < hi and math.floor(self.ts[j] / width) == bucket:
+                v = self.values[j]
+                if v == v:
+                    acc.append(v)
+                j += 1
+            if acc:
+                if agg == "mean":
+                    val = math.fsum(acc) / len(acc)
+                elif agg == "min":
+                    val = min(acc)
+                elif agg == "max":
+                    val = max(acc)
+                elif agg == "last":
+                    val = acc[-1]
+                else:
+                    raise ValueError(f"unknown aggregation: {agg}")
+                out_ts.append(bucket * width)
+                out_vals.append(val)
+            i = j
+        return out_ts, out_vals
+
+    # ── (de)serialisation ───────────────────────────────────────────
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "t": _pack(self.ts),
+            "v": _pack(self.values),
+            "notes": {str(i): n for i, n in self.notes.items()},
+            "rolled_until": self._rolled_until,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MetricSeries":
+        return cls(
+            _unpack(data["t"]),
+            _unpack(data["v"]),
+            {int(i): n for i, n in data.get("notes", {}).items()},
+            float(data.get("rolled_until", 0.0)),
+        )
+
+
+# ────────────────────────────────────────────────────────────────────
+# Per-user history
+# ────────────────────────────────────────────────────────────────────
+
+class ProgressHistory:
+    """
+    All of a user's tracked metrics. Usable directly as a pydantic field type:
+    it validates from its own dict form (or a legacy list of log dicts) and
+    serialises back to compact base64 columns.
+    """
+
+    policy: RetentionPolicy = DEFAULT_RETENTION
+
+    def __init__(self, series: Optional[Dict[str, MetricSeries]] = None) -> None:
+        self.series: Dict[str, MetricSeries] = series or {}
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.series.values())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.series)
+
+    def __getitem__(self, metric: str) -> MetricSeries:
+        return self.series[metric]
+
+    def get(self, metric: str) -> Optional[MetricSeries]:
+        return self.series.get(metric)
+
+    def record(
+        self,
+        metric: str,
+        value: float | str,
+        ts: Any = None,
+        notes: Optional[str] = None,
+    ) -> MetricSeries:
+        """
+        Append one sample. Non-numeric values are stored as NaN with the text
+        kept in the notes column, so free-text check-ins are not lost.
+        """
+        metric = metric.lower().strip()
+        when = to_epoch(ts)
+        try:
+            num = float(value)
+        except (TypeError, ValueError):
+            num = math.nan
+            notes = f"{value} — {notes}" if notes else str(value)
+        s = self.series.get(metric)
+        if s is None:
+            s = self.series[metric] = MetricSeries()
+        s.append(when, num, notes)
+        if s.due_for_rollup(self.policy, when):
+            s.apply_retention(self.policy, now=when)
+        return s
+
+    def merge(
+        self, metric: str, ts: array, values: array, notes: Optional[Dict[int, str]] = None
+    ) -> MetricSeries:
+        """Bulk counterpart of record(): merge a time-sorted batch for one metric."""
+        metric = metric.lower().strip()
+        s = self.series.get(metric)
+        if s is None:
+            s = self.series[metric] = MetricSeries()
+        s.merge(ts, values, notes)
+        if s.ts and s.due_for_rollup(self.policy, s.ts[-1]):
+            s.apply_retention(self.policy, now=s.ts[-1])
+        return s
+
+    def merged(
+        self, metric: str, ts: array, values: array, notes: Optional[Dict[int, str]] = None
+    ) -> MetricSeries:
+        """What merge() would leave for `metric`, built on a copy (safe off the event loop)."""
+        base = self.series.get(metric.lower().strip())
+        s = base.copy() if base is not None else MetricSeries()
+        s.merge(ts, values, notes)
+        if s.ts and s.due_for_rollup(self.policy, s.ts[-1]):
+            s.apply_retention(self.policy, now=s.ts[-1])
+        return s
+
+    def apply_retention(self, now: Optional[float] = None) -> int:
+        return sum(s.apply_retention(self.policy, now) for s in self.series.values())
+
+    # ── (de)serialisation ───────────────────────────────────────────
+    def to_dict(self) -> Dict[str, Any]:
+        return {m: s.to_dict() for m, s in self.series.items()}
+
+    @classmethod
+    def from_legacy(cls, logs: List[Dict[str, Any]]) -> "ProgressHistory":
+        """Build from the old `progress_logs` list of per-entry dicts."""
+        hist = cls()
+        for entry in logs:
+            if "metric" not in entry:
+                continue                            # scheduler events etc.
+            hist.record(
+                entry["metric"],
+                entry.get("value"),
+                entry.get("timestamp"),
+                entry.get("notes"),
+            )
+        return hist
+
+    @classmethod
+    def _coerce(cls, value: Any) -> "ProgressHistory":
+        if isinstance(value, cls):
+            return value
+        if value is None:
+            return cls()
+        if isinstance(value, list):
+            return cls.from_legacy(value)
+        if isinstance(value, dict):
+            return cls({m: MetricSeries.from_dict(d) for m, d in value.items()})
+        raise TypeError(f"cannot build ProgressHistory from {type(value).__name__}")
+
+    @classmethod
+    def __get_pydantic_core_schema__(cls, source, handler):
+        return core_schema.no_info_plain_validator_function(
+            cls._coerce,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                lambda h: h.to_dict()
+            ),
+        )
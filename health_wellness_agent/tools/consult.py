@@ -0,0 +1,41 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: consult.py
+Description: Tool that lets the planner ask several specialists at once instead of handing off
+to them one at a time.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • consult_specialists: concurrent fan-out to the injury and nutrition specialists under one
+#   deadline, returning their merged answers for the planner to build a single reply on
+
+from typing import List, Literal
+from agents import function_tool, RunContextWrapper
+from pydantic import BaseModel, Field
+from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.fanout import active_fanout
+
+Specialist = Literal["InjurySupportAgent", "NutritionExpertAgent"]
+
+
+class ConsultInput(BaseModel):
+    question: str = Field(..., min_length=3, description="The user's request, with any details they gave.")
+    specialists: List[Specialist] = Field(
+        ..., min_length=1, description="Everyone whose field the request touches."
+    )
+
+
+@function_tool
+async def consult_specialists(
+    ctx: RunContextWrapper[UserSessionContext],
+    input: ConsultInput,
+) -> str:
+    """
+    Ask several specialists the same question concurrently, e.g. a weekly plan for someone
+    with both an injury and diabetes. Returns each answer under its own heading.
+    """
+    names = list(dict.fromkeys(input.specialists))
+    return await active_fanout().consult(input.question, ctx.context, names)
@@ -0,0 +1,199 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: encoding.py
+Description: Compact, lossless encoding for table-shaped tool outputs (meal and workout plans)
+so far fewer tokens go back into the model's context, and its inverse.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • encode_output(): one header line, one pipe-separated line per row, repeated rows as
+#   "=<label>" back-references and repeated cells as "^" (same as the row above)
+# • Per-turn references: a plan already sent to the model this turn (e.g. the planner
+#   and then a specialist both asking for it) goes out as its digest only
+# • Non-string cells go out as JSON, so numbers, booleans and null keep their types
+# • expand_output(): the inverse, for reading what the model was sent (transcripts, traces);
+#   references resolve against the plans stored in UserSessionContext
+# • Per-tool token accounting (raw vs sent) for /health and /metrics
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from health_wellness_agent.history import estimate_tokens
+
+_SAME_ROW = "="
+_DITTO = "^"
+_REF_NOTE = "unchanged: identical to the plan with this digest sent earlier in this turn"
+
+_stats_lock = threading.Lock()
+ENCODING_STATS: Dict[str, Dict[str, int]] = {}
+
+
+def digest(rows: Sequence[Mapping[str, Any]]) -> str:
+    """Short content hash of a table, stable across processes."""
+    raw = json.dumps([list(r.items()) for r in rows], ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(raw.encode(), digest_size=4).hexdigest()
+
+
+def _text(value: Any) -> str:
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+def _needs_quoting(values: Sequence[Any]) -> bool:
+    """True if a plain line could not carry these cells (or their types) unambiguously."""
+    for v in values:
+        c = _text(v)
+        if "|" in c or "\n" in c or c.startswith((_SAME_ROW, _DITTO, "[", "{", '"')) or c != c.strip():
+            return True
+        if isinstance(v, str) and _is_json(c):          # "42" must not come back as 42
+            return True
+    return False
+
+
+def _cell(text: str) -> Any:
+    """A plain-line cell: non-string values were written as JSON, strings never parse as JSON."""
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _encode_rows(rows: Sequence[Mapping[str, Any]], columns: Sequence[str], labelled: bool) -> List[str]:
+    seen: Dict[Tuple[str, ...], str] = {}
+    lines: List[str] = []
+    previous: Optional[Tuple[str, ...]] = None
+    for n, row in enumerate(rows, 1):
+        values = [row[c] for c in columns]
+        cells = tuple(_text(v) for v in values)
+        keys = tuple(json.dumps(v, ensure_ascii=False) for v in values)     # 42 ≠ "42"
+        label = cells[0] if labelled else f"#{n}"
+        body = keys[1:] if labelled else keys
+        ref = seen.get(body)
+        if ref is not None and not (labelled and _needs_quoting(values[:1])):
+            lines.append(f"{label}|{_SAME_ROW}{ref}" if labelled else f"{_SAME_ROW}{ref}")
+        elif _needs_quoting(values):
+            lines.append(json.dumps(values, ensure_ascii=False))
+        else:
+            out = list(cells)
+            if previous is not None:
+                for i in range(1 if labelled else 0, len(cells)):
+                    if keys[i] == previous[i] and len(cells[i]) > 1:
+                        out[i] = _DITTO
+            lines.append("|".join(out))
+        seen.setdefault(body, label)
+        previous = keys
+    return lines
+
+
+def _decode_rows(lines: Sequence[str], columns: Sequence[str], labelled: bool) -> List[Dict[str, Any]]:
+    rows: List[Tuple[Any, ...]] = []
+    by_label: Dict[str, Tuple[Any, ...]] = {}
+    for n, line in enumerate(lines, 1):
+        parts = line.split("|")
+        if line.startswith("["):
+            cells = tuple(json.loads(line))
+        elif labelled and len(parts) == 2 and parts[1].startswith(_SAME_ROW) and len(columns) > 1:
+            cells = (_cell(parts[0]),) + by_label[parts[1][1:]][1:]
+        elif not labelled and line.startswith(_SAME_ROW):
+            cells = by_label[line[1:]]
+        else:
+            cells = tuple(rows[-1][i] if p == _DITTO else _cell(p) for i, p in enumerate(parts))
+        rows.append(cells)
+        by_label.setdefault(_text(cells[0]) if labelled else f"#{n}", cells)
+    return [dict(zip(columns, cells)) for cells in rows]
+
+
+def encode_output(
+    tool: str,
+    session: Any,
+    payload: Mapping[str, Any],
+    table: str,
+) -> str:
+    """
+    Encode `payload` (a tool's dict result whose `table` key holds a list of
+    flat dicts) for the model. Every other key is sent as `key: <json>`.
+    """
+    rows = payload[table]
+    columns = list(rows[0].keys()) if rows else []
+    ref = f"{table}#{digest(rows)}"
+    txn = getattr(session, "_txn", None)
+    shown = txn.shown if txn is not None else None
+
+    labelled = bool(columns) and len({_text(r[columns[0]]) for r in rows}) == len(rows)
+    head = f"{ref} rows={len(rows)} cols={'|'.join(columns)}" + (" by=label" if labelled else "")
+    lines = [head]
+    if shown is not None and ref in shown:
+        lines[0] += " ref"
+        lines.append(_REF_NOTE)
+    else:
+        lines += _encode_rows(rows, columns, labelled)
+        if shown is not None:
+            shown.add(ref)
+    lines += [f"{k}: {json.dumps(v, ensure_ascii=False)}" for k, v in payload.items() if k != table]
+    text = "\n".join(lines)
+
+    raw_tokens = estimate_tokens(str({k: v for k, v in payload.items()}))
+    sent_tokens = estimate_tokens(text)
+    with _stats_lock:
+        s = ENCODING_STATS.setdefault(tool, {"calls": 0, "refs": 0, "raw_tokens": 0, "sent_tokens": 0})
+        s["calls"] += 1
+        s["refs"] += shown is not None and lines[0].endswith(" ref")
+        s["raw_tokens"] += raw_tokens
+        s["sent_tokens"] += sent_tokens
+    return text
+
+
+def expand_output(text: str, session: Any = None) -> Dict[str, Any]:
+    """
+    Inverse of encode_output, for reading what the model was sent: the full
+    dict, with the table as a list of dicts (JSON-equal to the original). A
+    reference resolves against the session's stored plan whose digest
+    matches; KeyError if it cannot be found.
+    """
+    lines = text.split("\n")
+    header = lines[0].split(" ")
+    ref, n_rows = header[0], int(header[1].split("=", 1)[1])
+    table, want = ref.split("#", 1)
+    columns = [c for c in header[2].split("=", 1)[1].split("|") if c]
+    labelled = "by=label" in header
+    result: Dict[str, Any] = {}
+    if header[-1] == "ref":
+        stored = getattr(session, table, None) if session is not None else None
+        if stored is None or digest(stored) != want:
+            raise KeyError(f"{ref} is not stored in this session")
+        result[table] = [dict(r) for r in stored]
+        rest = lines[2:]
+    else:
+        result[table] = _decode_rows(lines[1:1 + n_rows], columns, labelled)
+        rest = lines[1 + n_rows:]
+    for line in rest:
+        key, _, value = line.partition(": ")
+        result[key] = json.loads(value)
+    return result
+
+
+def encoding_report() -> Dict[str, Dict[str, Any]]:
+    """Per-tool token savings since start-up."""
+    with _stats_lock:
+        return {
+            tool: {
+                **s,
+                "saved_tokens": s["raw_tokens"] - s["sent_tokens"],
+                "saved_ratio": round(1 - s["sent_tokens"] / s["raw_tokens"], 4) if s["raw_tokens"] else 0.0,
+            }
+            for tool, s in ENCODING_STATS.items()
+        }
@@ -0,0 +1,76 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: escalation.py
+Description: Tool that opens (or updates) the user's ticket in the human-coach escalation queue.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • request_coach tool for the EscalationAgent, backed by the running EscalationQueue
+# • Priority floor from the safety classifier, so an emergency is never filed as routine
+# • Honest fallback (logged, no ticket) when no coach service is running, e.g. in the CLI
+
+from typing_extensions import Literal, TypedDict
+from typing import Optional
+from agents import function_tool, RunContextWrapper
+from pydantic import BaseModel, Field
+from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.escalations import PRIORITIES, active_queue
+from health_wellness_agent.guardrails import EMERGENCY, INJURY, MEDICAL, SafetyClassifier
+
+Urgency = Literal["urgent", "high", "routine"]
+
+_CLASSIFIER = SafetyClassifier()
+_FLOOR = {EMERGENCY: "urgent", MEDICAL: "urgent", INJURY: "high"}
+
+
+class EscalationInput(BaseModel):
+    reason: str = Field(..., min_length=3, description="What the coach needs to know, in one or two sentences.")
+    urgency: Urgency = Field(
+        "routine",
+        description="urgent: possible emergency or acute injury; high: pain/injury; routine: everything else.",
+    )
+
+
+class EscalationOut(TypedDict):
+    status: str
+    ticket: Optional[int]
+    priority: str
+    queue_position: Optional[int]
+
+
+def request_escalation(session: UserSessionContext, input: EscalationInput) -> EscalationOut:
+    """File the escalation, raising its priority if the reason itself reads as urgent."""
+    priority = input.urgency
+    floor = _FLOOR.get(_CLASSIFIER.classify(input.reason).category)
+    if floor is not None and PRIORITIES.index(floor) < PRIORITIES.index(priority):
+        priority = floor
+
+    queue = active_queue()
+    if queue is None:
+        with session.mutate() as changes:
+            changes.append(
+                "handoff_logs",
+                f"escalation requested ({priority}), no coach service running: {input.reason}",
+            )
+        return {"status": "unavailable", "ticket": None, "priority": priority, "queue_position": None}
+
+    ticket = queue.submit(session.uid, input.reason, priority, session=session)
+    position = queue.position(ticket) if ticket.status == "queued" else None
+    return {
+        "status": ticket.status,
+        "ticket": ticket.id,
+        "priority": ticket.priority,
+        "queue_position": position,
+    }
+
+
+@function_tool
+async def request_coach(
+    ctx: RunContextWrapper[UserSessionContext],
+    input: EscalationInput,
+) -> EscalationOut:
+    """Put the user in the queue for a human coach (one open request per user; repeats update it)."""
+    return request_escalation(ctx.context, input)
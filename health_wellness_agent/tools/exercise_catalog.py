@@ -0,0 +1,164 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: exercise_catalog.py
+Description: Bundled exercise catalog (data/exercises.csv) with precomputed bitmask indexes
+by category, muscle group, equipment, contraindication and minimum level.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • ExerciseCatalog: columnar rows + one int bitmask per index value
+# • allowed(): level / equipment / injury constraints, one mask operation each
+# • parse_injuries() / parse_equipment(): free text and lists → catalog tags
+
+from __future__ import annotations
+
+import csv
+import re
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from health_wellness_agent.tools.plan_cache import bit_indices
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "exercises.csv"
+
+LEVELS: Tuple[str, ...] = ("beginner", "intermediate", "advanced")
+
+EQUIPMENT: Tuple[str, ...] = (
+    "band", "barbell", "bench", "bike", "dumbbell", "foam_roller", "kettlebell",
+    "machine", "pool", "pull_up_bar", "rower",
+)
+_EQUIPMENT_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "none": (), "bodyweight": (), "body weight": (), "no equipment": (),
+    "home": ("dumbbell", "band"), "home gym": ("dumbbell", "band", "bench", "pull_up_bar"),
+    "gym": EQUIPMENT, "full gym": EQUIPMENT,
+    "dumbbells": ("dumbbell",), "db": ("dumbbell",), "bands": ("band",),
+    "resistance band": ("band",), "resistance bands": ("band",), "bar": ("barbell",),
+    "pull up bar": ("pull_up_bar",), "pullup bar": ("pull_up_bar",), "chin up bar": ("pull_up_bar",),
+    "kettlebells": ("kettlebell",), "kb": ("kettlebell",), "cycle": ("bike",),
+    "exercise bike": ("bike",), "rowing machine": ("rower",), "erg": ("rower",),
+    "swimming pool": ("pool",), "foam roller": ("foam_roller",), "machines": ("machine",),
+    "cable": ("machine",), "cables": ("machine",), "treadmill": ("machine",),
+}
+
+# Body regions used as contraindication tags, and the words that point at them.
+_INJURY_WORDS: Dict[str, Tuple[str, ...]] = {
+    "knee": ("knee", "knees", "acl", "mcl", "meniscus", "patella", "patellar"),
+    "lower_back": ("back", "lumbar", "disc", "sciatica", "spine", "spinal"),
+    "shoulder": ("shoulder", "shoulders", "rotator", "labrum"),
+    "wrist": ("wrist", "wrists", "carpal"),
+    "ankle": ("ankle", "ankles", "achilles", "plantar", "foot"),
+    "hip": ("hip", "hips", "groin"),
+    "neck": ("neck", "cervical", "whiplash"),
+    "elbow": ("elbow", "elbows", "golfer"),
+}
+_INJURY_LOOKUP = {w: region for region, words in _INJURY_WORDS.items() for w in words}
+_WORD = re.compile(r"[a-z]+")
+
+
+def parse_injuries(value: str | Iterable[str] | None) -> FrozenSet[str]:
+    """Contraindication tags (knee, lower_back, …) mentioned in notes or a list."""
+    if not value:
+        return frozenset()
+    text = value if isinstance(value, str) else " ".join(value)
+    text = text.lower().replace("_", " ")
+    found = {_INJURY_LOOKUP[w] for w in _WORD.findall(text) if w in _INJURY_LOOKUP}
+    if "lower back" in text or "low back" in text:
+        found.add("lower_back")
+    return frozenset(found)
+
+
+def parse_equipment(value: Iterable[str] | None) -> Optional[FrozenSet[str]]:
+    """Available equipment tags; None means "not specified" (treated as a full gym)."""
+    if value is None:
+        return None
+    found = set()
+    for item in value:
+        key = " ".join(item.lower().replace("-", " ").replace("_", " ").split())
+        if key.replace(" ", "_") in EQUIPMENT:
+            found.add(key.replace(" ", "_"))
+        elif key in _EQUIPMENT_ALIASES:
+            found.update(_EQUIPMENT_ALIASES[key])
+        elif key.rstrip("s") in EQUIPMENT:
+            found.add(key.rstrip("s"))
+    return frozenset(found)
+
+
+class ExerciseCatalog:
+    """
+    Row i of every column is the same exercise. Each index maps a tag to the
+    bitmask of rows carrying it, so every constraint is one AND (or AND-NOT)
+    regardless of catalog size.
+    """
+
+    def __init__(self, rows: List[Dict[str, str]]) -> None:
+        self.names: Tuple[str, ...] = tuple(r["name"] for r in rows)
+        self.categories: Tuple[str, ...] = tuple(r["category"] for r in rows)
+        self.minutes = array("d", (float(r["minutes"]) for r in rows))
+
+        self.by_category: Dict[str, int] = {}
+        self.by_muscle: Dict[str, int] = {}
+        self.by_primary_muscle: Dict[str, int] = {}                      # first-listed muscle
+        self.by_equipment: Dict[str, int] = {e: 0 for e in EQUIPMENT}   # rows *requiring* e
+        self.by_contraindication: Dict[str, int] = {r: 0 for r in _INJURY_WORDS}
+        self.by_level: Dict[str, int] = {lv: 0 for lv in LEVELS}         # rows doable at lv
+        for i, r in enumerate(rows):
+            bit = 1 << i
+            self.by_category[r["category"]] = self.by_category.get(r["category"], 0) | bit
+            for tag, index in (
+                (r["muscles"], self.by_muscle),
+                (r["equipment"], self.by_equipment),
+                (r["contraindications"], self.by_contraindication),
+            ):
+                for value in filter(None, tag.split(";")):
+                    if value != "none":
+                        index[value] = index.get(value, 0) | bit
+            primary = r["muscles"].split(";")[0]
+            self.by_primary_muscle[primary] = self.by_primary_muscle.get(primary, 0) | bit
+            for level in LEVELS[LEVELS.index(r["level"]):]:
+                self.by_level[level] |= bit
+
+    @classmethod
+    def from_csv(cls, path: Path = DATA_PATH) -> "ExerciseCatalog":
+        with open(path, newline="", encoding="utf-8") as fh:
+            return cls(list(csv.DictReader(fh)))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def allowed(
+        self,
+        level: str,
+        equipment: Optional[FrozenSet[str]] = None,
+        injuries: FrozenSet[str] = frozenset(),
+    ) -> int:
+        """Mask of exercises a user at `level` can do with `equipment`, avoiding `injuries`."""
+        mask = self.by_level.get(level, self.by_level["beginner"])
+        if equipment is not None:
+            for item, rows in self.by_equipment.items():
+                if item not in equipment:
+                    mask &= ~rows
+        for region in injuries:
+            mask &= ~self.by_contraindication.get(region, 0)
+        return mask
+
+    def pick(self, mask: int, category: str, muscle: Optional[str] = None) -> Tuple[int, ...]:
+        """
+        Row indices within `mask` for a category (and muscle group). Exercises
+        that mainly train `muscle` win; ones that only involve it are the fallback.
+        """
+        mask &= self.by_category.get(category, 0)
+        if muscle is None:
+            return bit_indices(mask)
+        return bit_indices(mask & self.by_primary_muscle.get(muscle, 0)) or bit_indices(
+            mask & self.by_muscle.get(muscle, 0)
+        )
+
+
+@lru_cache(maxsize=None)
+def load_exercise_catalog() -> ExerciseCatalog:
+    return ExerciseCatalog.from_csv()
@@ -0,0 +1,132 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: food_db.py
+Description: Bundled food/nutrient table (data/foods.csv) loaded into columnar arrays with
+bitmask indexes by meal slot, diet style and allergen.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • FoodDB: one array per nutrient column, one int bitmask per slot / diet / allergen
+# • select(): candidate rows for (slot, diet, excluded allergens) as cached index tuples
+# • parse_allergens(): map free text ("nut allergy, lactose intolerant") to allergen tags
+
+from __future__ import annotations
+
+import csv
+import re
+from array import array
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+from health_wellness_agent.tools.plan_cache import bit_indices
+
+DATA_PATH = Path(__file__).resolve().parent.parent / "data" / "foods.csv"
+
+SLOTS: Tuple[str, ...] = ("breakfast", "lunch", "dinner", "snack")
+
+ALLERGENS: Tuple[str, ...] = (
+    "dairy", "egg", "fish", "gluten", "nut", "peanut", "sesame", "shellfish", "soy",
+)
+_ALLERGEN_ALIASES = {
+    "milk": "dairy", "lactose": "dairy", "cheese": "dairy", "eggs": "egg",
+    "wheat": "gluten", "nuts": "nut",
+    "tree nut": "nut", "tree nuts": "nut", "almond": "nut", "walnut": "nut",
+    "peanuts": "peanut", "shrimp": "shellfish", "prawn": "shellfish",
+    "crustacean": "shellfish", "seafood": "shellfish", "soya": "soy",
+    "celiac": "gluten", "coeliac": "gluten",
+}
+# In free text only words in an allergy context count: "vegan, loves tofu" bans nothing.
+_ALLERGY_CONTEXT = re.compile(
+    r"\b(?:allergic\s+to|allergy\s+to|intolerant\s+to|no|avoid|avoids|without)\s+([a-z]+(?:\s+nuts?)?)"
+    r"|\b([a-z]+(?:\s+nuts?)?)[\s-]+(?:allergy|allergies|allergic|free|intolerant|intolerance)"
+    r"|(celiac|coeliac)"
+)
+
+
+def _tag(word: str) -> str | None:
+    word = " ".join(word.lower().replace("-", " ").split())
+    for candidate in (word, word.rstrip("s"), word.split()[0] if word else ""):
+        if candidate in ALLERGENS:
+            return candidate
+        if candidate in _ALLERGEN_ALIASES:
+            return _ALLERGEN_ALIASES[candidate]
+    return None
+
+
+def parse_allergens(value: str | Iterable[str] | None) -> FrozenSet[str]:
+    """
+    Allergen tags from a list of names (each item mapped via aliases) or from
+    free text such as diet_preferences ("nut allergy, lactose intolerant").
+    Unknown words are ignored.
+    """
+    if not value:
+        return frozenset()
+    if not isinstance(value, str):
+        return frozenset(filter(None, (_tag(v) for v in value)))
+    found = set()
+    for m in _ALLERGY_CONTEXT.finditer(value.lower()):
+        tag = _tag(next(g for g in m.groups() if g))
+        if tag:
+            found.add(tag)
+    return frozenset(found)
+
+
+class FoodDB:
+    """
+    Column store over the bundled table. Row i of every column is the same dish;
+    nutrient columns are `array('d')` values for one serving. Filtering is a few
+    integer ANDs over the bitmask indexes.
+    """
+
+    def __init__(self, rows: List[Dict[str, str]]) -> None:
+        self.names: Tuple[str, ...] = tuple(r["name"] for r in rows)
+        self.slots: Tuple[str, ...] = tuple(r["slot"] for r in rows)
+        self.kcal = array("d", (float(r["kcal"]) for r in rows))
+        self.protein = array("d", (float(r["protein_g"]) for r in rows))
+        self.carbs = array("d", (float(r["carbs_g"]) for r in rows))
+        self.fat = array("d", (float(r["fat_g"]) for r in rows))
+
+        self.by_slot: Dict[str, int] = {}
+        self.by_diet: Dict[str, int] = {}
+        self.by_allergen: Dict[str, int] = {a: 0 for a in ALLERGENS}
+        for i, r in enumerate(rows):
+            bit = 1 << i
+            self.by_slot[r["slot"]] = self.by_slot.get(r["slot"], 0) | bit
+            for diet in filter(None, r["diets"].split(";")):
+                self.by_diet[diet] = self.by_diet.get(diet, 0) | bit
+            for allergen in filter(None, r["allergens"].split(";")):
+                self.by_allergen[allergen] = self.by_allergen.get(allergen, 0) | bit
+        self._select_cache: Dict[Tuple[str, str, FrozenSet[str]], Tuple[int, ...]] = {}
+
+    @classmethod
+    def from_csv(cls, path: Path = DATA_PATH) -> "FoodDB":
+        with open(path, newline="", encoding="utf-8") as fh:
+            return cls(list(csv.DictReader(fh)))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @property
+    def diets(self) -> Tuple[str, ...]:
+        return tuple(self.by_diet)
+
+    def select(self, slot: str, diet: str, exclude: FrozenSet[str] = frozenset()) -> Tuple[int, ...]:
+        """Row indices for `slot` tagged with `diet` and free of every allergen in `exclude`."""
+        key = (slot, diet, exclude)
+        rows = self._select_cache.get(key)
+        if rows is None:
+            banned = 0
+            for allergen in exclude:
+                banned |= self.by_allergen.get(allergen, 0)
+            mask = self.by_slot.get(slot, 0) & self.by_diet.get(diet, 0) & ~banned
+            rows = self._select_cache[key] = bit_indices(mask)
+        return rows
+
+
+@lru_cache(maxsize=None)
+def load_food_db() -> FoodDB:
+    return FoodDB.from_csv()
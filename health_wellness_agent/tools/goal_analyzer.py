@@ -11,25 +11,52 @@ Date Created: 2025-07-01
 # • Pydantic-based input guardrails to validate goal structure (+15 guardrails)
 # • Async @tool decorated method for clean agent-tool separation (+20 tool design & async)
 # • Structured goal storage in session context with RunContextWrapper (+10 context)
+# • goal_progress tool: trend fit over the tracked metric, ETA and on/off-track status
+#   (fitted on the tool thread pool; the goal is written through session.mutate())
+# • tracked_unit: the unit progress is logged in, so 'lose 10 lbs' works on a kg series
 
 
-from typing_extensions import TypedDict
+from datetime import datetime, timezone
+from typing_extensions import TypedDict, Literal
 from agents import function_tool, RunContextWrapper
 from pydantic import BaseModel, Field, field_validator
 from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.projection import project_session
+from health_wellness_agent.transaction import offload
 
 class GoalInput(BaseModel):
     quantity: float = Field(..., gt=0, description="Number of units to change (e.g. 5)")
     metric: str = Field(..., description="Measurement unit (e.g. kg, lbs)")
     duration: str = Field(..., description="Duration (e.g. '3 months')")
+    direction: Literal["lose", "gain"] = Field("lose", description="Whether the tracked value should go down or up")
+    tracked_metric: str = Field("weight", description="Progress metric the goal is measured on")
+    tracked_unit: str | None = Field(
+        None, description="Unit the tracked metric is logged in, if not kg for weight (e.g. lbs)"
+    )
 
-    @field_validator("metric")
+    @field_validator("metric", "tracked_metric", "tracked_unit")
     def metric_lower(cls, v):
-        return v.lower().strip()
+        return v.lower().strip() if v is not None else v
 
 class GoalAnalyzerOut(TypedDict):
     parsed_goal: dict
 
+class GoalProgressOut(TypedDict):
+    progress: dict
+
+
+def store_goal(session: UserSessionContext, input: GoalInput) -> GoalAnalyzerOut:
+    """Save a validated goal on the session, anchored to the latest tracked value."""
+    goal_dict = input.model_dump()
+    series = session.progress.get(input.tracked_metric)
+    latest = series.latest() if series is not None else None
+    goal_dict["baseline"] = latest[1] if latest and latest[1] == latest[1] else None
+    goal_dict["set_at"] = datetime.now(timezone.utc).isoformat()
+    with session.mutate() as changes:
+        changes.set("goal", goal_dict)
+    return {"parsed_goal": goal_dict}
+
+
 @function_tool
 async def goal_analyzer(
     ctx: RunContextWrapper[UserSessionContext],
@@ -39,6 +66,14 @@ async def goal_analyzer(
     Parse and validate a user's fitness goal (e.g. 'lose 5 kg in 3 months'),
     save it in the user session context, and return as JSON.
     """
-    goal_dict = input.model_dump()
-    ctx.context.goal = goal_dict  
-    return {"parsed_goal": goal_dict}
+    return store_goal(ctx.context, input)
+
+
+@function_tool
+async def goal_progress(ctx: RunContextWrapper[UserSessionContext]) -> GoalProgressOut:
+    """
+    Check progress toward the saved goal: trend of the tracked metric, estimated
+    date the goal is reached, and whether the user is on track, behind or off track.
+    """
+    projection = await offload(project_session, ctx.context)
+    return {"progress": projection.as_dict()}
@@ -8,16 +8,27 @@ Date Created: 2025-07-01
 """
 
 # In this file I have implemented:
-# • Async meal planner tool with fixed 7-day structured response (+20 tool design)
+# • Async meal planner tool with 7-day structured response (+20 tool design)
 # • Context-aware planning with potential goal/diet integration (+10 context)
 # • Clean modular tool definition with @tool integration for agent use
+# • Memoised, precomputed plans shared as immutable objects via PlanCache
+# • Calorie/macro-targeted optimiser over the bundled food table, allergen-aware
+# • get_meal_plans(): batch planning for bulk refreshes, one optimisation per distinct key
+# • Cache misses are optimised on the tool thread pool, off the event loop
+# • The model receives the compact table encoding (tools/encoding.py), not the raw dicts
+# • The achieved kcal per day are reported next to the target, with a shortfall flag
+#   when restrictions or portion limits keep the plan off it
 
 
-from typing_extensions import TypedDict, Annotated
-from typing import List
+from typing_extensions import TypedDict, Annotated, NotRequired
+from typing import Dict, FrozenSet, Iterable, List, Sequence, Tuple
 from agents import function_tool, RunContextWrapper
 from pydantic import BaseModel, Field
 from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.tools.encoding import encode_output
+from health_wellness_agent.tools.food_db import FoodDB, load_food_db, parse_allergens
+from health_wellness_agent.tools.plan_cache import PlanCache, resolve_choice
+from health_wellness_agent.transaction import offload
 
 
 # ────────────────────────────────────────────────────────────────────
@@ -31,16 +42,226 @@ class MealPlanInput(BaseModel):
         description="Overall dietary preference.",
     )
     calories_per_day: Annotated[int | None, Field(gt=0)] = None
+    allergens: List[str] = Field(
+        default_factory=list,
+        examples=[["nut", "dairy"]],
+        description="Allergens/intolerances to exclude (dairy, egg, fish, gluten, nut, peanut, sesame, shellfish, soy).",
+    )
 
 
 class DailyMeals(TypedDict):
     breakfast: str
     lunch: str
     dinner: str
+    snack: str
+    kcal: int
+    totals: str
 
 
 class MealPlanOutput(TypedDict):
-    meal_plan: List[DailyMeals]
+    meal_plan: Sequence[DailyMeals]
+    calories_per_day: int                   # the target
+    requested_calories_per_day: NotRequired[int]   # set when outside _CALORIE_RANGE
+    achieved_calories_per_day: List[int]
+    shortfall: bool
+    excluded_allergens: List[str]
+    note: NotRequired[str]
+
+
+# ────────────────────────────────────────────────────────────────────
+# Optimiser over the bundled food table (data/foods.csv)
+# ────────────────────────────────────────────────────────────────────
+
+STYLES: Tuple[str, ...] = ("balanced", "vegetarian", "vegan", "keto", "mediterranean")
+
+_STYLE_ALIASES = {
+    "standard": "balanced", "normal": "balanced", "omnivore": "balanced",
+    "healthy": "balanced", "veg": "vegetarian", "veggie": "vegetarian",
+    "pescatarian": "mediterranean", "plant based": "vegan", "plantbased": "vegan",
+    "low carb": "keto", "lowcarb": "keto", "ketogenic": "keto", "atkins": "keto",
+}
+
+# Energy share of (protein, carbs, fat) each style aims for.
+_MACRO_TARGETS: Dict[str, Tuple[float, float, float]] = {
+    "balanced":      (0.25, 0.50, 0.25),
+    "vegetarian":    (0.20, 0.55, 0.25),
+    "vegan":         (0.18, 0.55, 0.27),
+    "keto":          (0.25, 0.07, 0.68),
+    "mediterranean": (0.20, 0.45, 0.35),
+}
+# Fraction of the day's calories each slot starts out with; later slots absorb
+# whatever earlier portions over- or undershot.
+_SLOT_SHARES: Tuple[Tuple[str, float], ...] = (
+    ("breakfast", 0.25), ("lunch", 0.32), ("dinner", 0.33), ("snack", 0.10),
+)
+_MIN_PORTION, _MAX_PORTION = 0.5, 2.0      # servings, in quarter steps
+_MACRO_WEIGHT = 4.0
+_REPEAT_PENALTY = 0.35                     # per earlier use this week
+_YESTERDAY_PENALTY = 1.0
+
+DEFAULT_CALORIES = 2000
+# Beyond this range the portion limits can't get near the target.
+_CALORIE_RANGE = (1000, 4500)
+_COMMON_CALORIES = range(1500, 3001, 250)
+# A day further than this from the target counts as missing it.
+_TARGET_TOLERANCE = 0.05
+_UNFILLED = "— (no option fits these restrictions; ask the nutrition expert)"
+
+PLAN_CACHE = PlanCache(maxsize=1024)
+
+PlanKey = Tuple[str, int, FrozenSet[str]]
+
+
+class _Pool:
+    """Candidate dishes for one (slot, style, allergens), as parallel tuples."""
+
+    __slots__ = ("rows", "kcal", "p_kcal", "c_kcal", "f_kcal")
+
+    def __init__(self, db: FoodDB, rows: Tuple[int, ...]) -> None:
+        self.rows = rows
+        self.kcal = tuple(db.kcal[i] for i in rows)
+        self.p_kcal = tuple(db.protein[i] * 4 for i in rows)
+        self.c_kcal = tuple(db.carbs[i] * 4 for i in rows)
+        self.f_kcal = tuple(db.fat[i] * 9 for i in rows)
+
+
+def _portion(target: float, kcal: float) -> float:
+    servings = round(target / kcal * 4) / 4
+    return min(_MAX_PORTION, max(_MIN_PORTION, servings))
+
+
+def _describe(name: str, servings: float, kcal: float) -> str:
+    unit = "serving" if servings == 1 else "servings"
+    return f"{name} ({servings:g} {unit}, {kcal:.0f} kcal)"
+
+
+def normalize(input: MealPlanInput, extra_allergens: Iterable[str] = ()) -> PlanKey:
+    """Cache key: supported style, calories clamped and rounded to 50 kcal, allergen tags."""
+    style = resolve_choice(input.diet_style, STYLES, _STYLE_ALIASES, "balanced")
+    cals = input.calories_per_day or DEFAULT_CALORIES
+    cals = min(_CALORIE_RANGE[1], max(_CALORIE_RANGE[0], cals))
+    allergens = parse_allergens(list(input.allergens) + list(extra_allergens))
+    return style, int(round(cals / 50.0) * 50), allergens
+
+
+def _build(style: str, cals: int, allergens: FrozenSet[str] = frozenset()) -> List[DailyMeals]:
+    """
+    Greedy day-by-day fill: each slot picks the dish (and portion) that best
+    keeps the day on its calorie target and the style's macro split, with
+    penalties for repeating dishes so the week varies.
+
+    Scoring is column-wise over the pool's precomputed tuples (portions, then
+    calorie error, macro error and penalties for every candidate at once)
+    rather than numpy arrays: the project has no numpy dependency, and with
+    ~15 candidates per slot numpy's per-call overhead would outweigh the maths.
+    """
+    db = load_food_db()
+    tp, tc, tf = _MACRO_TARGETS[style]
+    pools = {slot: _Pool(db, db.select(slot, style, allergens)) for slot, _ in _SLOT_SHARES}
+    uses = [0] * len(db)
+    yesterday: set = set()
+
+    plan: List[DailyMeals] = []
+    for _ in range(7):
+        remaining, share_left = float(cals), 1.0
+        day_p = day_c = day_f = 0.0
+        today: set = set()
+        meals: Dict[str, object] = {}
+        for slot, share in _SLOT_SHARES:
+            pool = pools[slot]
+            target = max(remaining * share / share_left, 0.0)
+            share_left -= share
+            if not pool.rows:
+                meals[slot] = _UNFILLED
+                continue
+            if target <= 0:
+                meals[slot] = "—"
+                continue
+            servings = [_portion(target, k) for k in pool.kcal]
+            ps = [day_p + s * x for s, x in zip(servings, pool.p_kcal)]
+            cs = [day_c + s * x for s, x in zip(servings, pool.c_kcal)]
+            fs = [day_f + s * x for s, x in zip(servings, pool.f_kcal)]
+            scores = [
+                abs(s * k - target) / target
+                + _MACRO_WEIGHT * ((p / (p + c + f) - tp) ** 2 + (c / (p + c + f) - tc) ** 2
+                                   + (f / (p + c + f) - tf) ** 2)
+                + _REPEAT_PENALTY * uses[row]
+                + (_YESTERDAY_PENALTY if row in yesterday else 0.0)
+                for s, k, p, c, f, row in zip(servings, pool.kcal, ps, cs, fs, pool.rows)
+            ]
+            best = min(range(len(scores)), key=scores.__getitem__)
+            row, s = pool.rows[best], servings[best]
+            kcal = s * pool.kcal[best]
+            day_p += s * pool.p_kcal[best]
+            day_c += s * pool.c_kcal[best]
+            day_f += s * pool.f_kcal[best]
+            remaining -= kcal
+            uses[row] += 1
+            today.add(row)
+            meals[slot] = _describe(db.names[row], s, kcal)
+        total = day_p + day_c + day_f
+        meals["kcal"] = round(total)
+        meals["totals"] = (
+            f"{total:.0f} kcal · protein {day_p / total:.0%} / carbs {day_c / total:.0%} / fat {day_f / total:.0%}"
+            if total else "0 kcal"
+        )
+        yesterday = today
+        plan.append(meals)  # type: ignore[arg-type]
+    return plan
+
+
+def check_plan(plan: Sequence[DailyMeals], cals: int) -> Dict[str, object]:
+    """
+    What the plan actually delivers against `cals`: per-day kcal, whether any day
+    misses the target by more than _TARGET_TOLERANCE, and a note saying why.
+    """
+    achieved = [day["kcal"] for day in plan]
+    off = [n for n, kcal in enumerate(achieved, 1) if abs(kcal - cals) > cals * _TARGET_TOLERANCE]
+    unfilled = sorted({slot for day in plan for slot, _ in _SLOT_SHARES if day[slot] == _UNFILLED})
+    result: Dict[str, object] = {"achieved_calories_per_day": achieved, "shortfall": bool(off)}
+    if off or unfilled:
+        reasons = []
+        if off:
+            low, high = min(achieved[n - 1] for n in off), max(achieved[n - 1] for n in off)
+            reached = f"{low}" if low == high else f"{low}–{high}"
+            days = f"day {off[0]} reaches" if len(off) == 1 else f"days {', '.join(map(str, off))} reach"
+            reasons.append(f"{days} {reached} kcal against the {cals} kcal target")
+        if unfilled:
+            reasons.append(f"no {'/'.join(unfilled)} option fits these restrictions")
+        result["note"] = (
+            "; ".join(reasons).capitalize()
+            + ". Tell the user the plan does not meet the target as stated; "
+            "relaxing the diet or allergens, or the nutrition expert, can close the gap."
+        )
+    return result
+
+
+def get_meal_plan(input: MealPlanInput, extra_allergens: Iterable[str] = ()) -> Sequence[DailyMeals]:
+    """Immutable, shared 7-day plan for the (normalised) input."""
+    key = normalize(input, extra_allergens)
+    return PLAN_CACHE.get_or_build(key, lambda: _build(*key))
+
+
+def get_meal_plans(inputs: Iterable[MealPlanInput | dict]) -> List[Sequence[DailyMeals]]:
+    """
+    Batch API for bulk refreshes: plans for many users in one pass, aligned with
+    `inputs`. Users are grouped by normalised key, so each distinct
+    (style, calories, allergens) combination is optimised once.
+    """
+    keys = [
+        normalize(i if isinstance(i, MealPlanInput) else MealPlanInput.model_validate(i))
+        for i in inputs
+    ]
+    built = {key: PLAN_CACHE.get_or_build(key, lambda k=key: _build(*k)) for key in dict.fromkeys(keys)}
+    return [built[key] for key in keys]
+
+
+# Registered only: built on first use, or by plan_cache.warm_in_background() after startup.
+PLAN_CACHE.preload(
+    ((style, cals, frozenset()), (lambda s=style, c=cals: _build(s, c)))
+    for style in STYLES
+    for cals in _COMMON_CALORIES
+)
 
 
 # ────────────────────────────────────────────────────────────────────
@@ -51,43 +272,31 @@ class MealPlanOutput(TypedDict):
 async def meal_planner(
     ctx: RunContextWrapper[UserSessionContext],
     input: MealPlanInput,
-) -> MealPlanOutput:
-    """Generate a stubbed 7-day meal plan."""
-    style = input.diet_style.lower()
-    cals = input.calories_per_day or 2000
-
-    # Very naive templates — swap with real generator later.
-    breakfast = {
-        "balanced":      "Oatmeal with berries & almond butter",
-        "vegetarian":    "Greek yogurt, banana & honey",
-        "vegan":         "Tofu scramble with spinach & toast",
-        "keto":          "Avocado, smoked salmon & eggs",
-        "mediterranean": "Tomato-feta omelette & whole-grain bread",
-    }[style]
-
-    lunch = {
-        "balanced":      "Quinoa salad with chicken & veggies",
-        "vegetarian":    "Lentil soup & mixed-greens salad",
-        "vegan":         "Chickpea bowl with brown rice & tahini",
-        "keto":          "Grilled chicken caesar (no croutons)",
-        "mediterranean": "Falafel wrap & side tabbouleh",
-    }[style]
-
-    dinner = {
-        "balanced":      "Baked salmon, sweet potato, broccoli",
-        "vegetarian":    "Vegetable stir-fry & tofu",
-        "vegan":         "Black-bean chili & avocado",
-        "keto":          "Steak, asparagus & cauliflower mash",
-        "mediterranean": "Grilled sea-bass, couscous & salad",
-    }[style]
-
-    plan: List[DailyMeals] = [
-        {"breakfast": breakfast,
-         "lunch": lunch,
-         "dinner": dinner}
-        for _ in range(7)
-    ]
+) -> str:
+    """Generate a varied 7-day meal plan that hits the calorie target and the diet's macro split, excluding allergens."""
+    # Allergies mentioned earlier ("nut allergy") apply even if the model omits them.
+    _, cals, allergens = key = normalize(input, parse_allergens(ctx.context.diet_preferences))
+    plan = PLAN_CACHE.peek(key)
+    if plan is None:
+        plan = await offload(PLAN_CACHE.get_or_build, key, lambda: _build(*key))
 
     # Persist to session if useful later
-    ctx.context.meal_plan = plan
-    return {"meal_plan": plan}
+    with ctx.context.mutate() as changes:
+        changes.set("meal_plan", plan)
+    output: MealPlanOutput = {
+        "meal_plan": plan,
+        "calories_per_day": cals,
+        **check_plan(plan, cals),  # type: ignore[typeddict-item]
+        "excluded_allergens": sorted(allergens),
+    }
+    requested = input.calories_per_day
+    if requested and not _CALORIE_RANGE[0] <= requested <= _CALORIE_RANGE[1]:
+        # normalize() clamped the target; say so rather than pass it off as the user's.
+        output["requested_calories_per_day"] = requested
+        adjusted = (
+            f"The requested {requested} kcal/day is outside the supported "
+            f"{_CALORIE_RANGE[0]}–{_CALORIE_RANGE[1]} kcal range, so this plan targets {cals} kcal; "
+            "tell the user the target was adjusted."
+        )
+        output["note"] = f"{adjusted} {output['note']}" if "note" in output else adjusted
+    return encode_output("meal_planner", ctx.context, output, table="meal_plan")
@@ -0,0 +1,199 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: plan_cache.py
+Description: Shared memoisation helpers for the plan tools — immutable plan objects, a
+bounded LRU keyed on normalised input, and nearest-match resolution of plan options.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • FrozenDict / freeze() so cached plans can be shared safely between callers
+# • PlanCache: bounded LRU with pinned (precomputed) entries and hit/miss counters
+# • warm_in_background(): builds every cache's preloads on a daemon thread after startup
+# • resolve_choice(): alias + fuzzy lookup so unknown styles/levels map to a real plan
+# • bit_indices(): row numbers set in a bitmask index (food table, exercise catalog)
+
+from __future__ import annotations
+
+import difflib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Mapping, Tuple
+
+
+class FrozenDict(dict):
+    """A dict that refuses mutation; it still serialises and prints like a dict."""
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("cached plans are immutable; copy before editing")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self) -> int:
+        return hash(tuple(sorted(self.items())))
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(value: Any) -> Any:
+    """Recursively turn dicts into FrozenDicts and lists into tuples."""
+    if isinstance(value, Mapping):
+        return FrozenDict({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+class PlanCache:
+    """
+    LRU of built plans. Entries registered through `preload` are pinned and
+    never evicted, so the common parameter combinations are always a dict
+    lookup once built. They are built on first use of their key or by `warm()`
+    (see warm_in_background), never at registration — importing a tool module
+    must not run its optimiser.
+    """
+
+    def __init__(self, maxsize: int = 256) -> None:
+        self.maxsize = maxsize
+        self._pinned: Dict[Hashable, Any] = {}
+        self._pending: Dict[Hashable, Callable[[], Any]] = {}
+        self._lru: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def peek(self, key: Hashable) -> Any:
+        """The cached plan for `key`, or None — never builds."""
+        plan = self._pinned.get(key)
+        if plan is None:
+            with self._lock:
+                plan = self._lru.get(key)
+                if plan is not None:
+                    self._lru.move_to_end(key)
+        if plan is not None:
+            self.hits += 1
+        return plan
+
+    def get_or_build(self, key: Hashable, build: Callable[[], Any]) -> Any:
+        plan = self._pinned.get(key)
+        if plan is not None:
+            self.hits += 1
+            return plan
+        if key in self._pending:
+            plan = self._pin(key)
+            if plan is not None:
+                self.misses += 1
+                return plan
+        with self._lock:
+            plan = self._lru.get(key)
+            if plan is not None:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return plan
+        plan = freeze(build())
+        with self._lock:
+            self.misses += 1
+            self._lru[key] = plan
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+        return plan
+
+    def preload(self, items: Iterable[Tuple[Hashable, Callable[[], Any]]]) -> None:
+        """Register builds for the common keys; each runs on first use or in `warm()`."""
+        with self._lock:
+            for key, build in items:
+                if key not in self._pinned:
+                    self._pending[key] = build
+        with _REGISTRY_LOCK:
+            if self not in _PRELOADED:
+                _PRELOADED.append(self)
+
+    def warm(self) -> None:
+        """Build and pin every registered preload that has not been used yet."""
+        for key in list(self._pending):
+            self._pin(key)
+
+    def _pin(self, key: Hashable) -> Any:
+        build = self._pending.get(key)
+        if build is None:                       # another thread pinned it meanwhile
+            return self._pinned.get(key)
+        plan = freeze(build())
+        with self._lock:
+            plan = self._pinned.setdefault(key, plan)
+            self._pending.pop(key, None)
+        return plan
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits, "misses": self.misses,
+            "pinned": len(self._pinned), "pending": len(self._pending), "lru": len(self._lru),
+        }
+
+
+_PRELOADED: List[PlanCache] = []
+_REGISTRY_LOCK = threading.Lock()
+
+
+def warm_in_background() -> threading.Thread:
+    """
+    Build every cache's registered preloads on a daemon thread. Entrypoints call
+    this once they are serving, so the first turn is not held up by it; a key
+    asked for before its turn here is simply built on demand.
+    """
+    def run() -> None:
+        with _REGISTRY_LOCK:
+            caches = list(_PRELOADED)
+        for cache in caches:
+            try:
+                cache.warm()
+            except Exception as exc:            # a failed warm-up only costs a later miss
+                print(f"[PlanCache] preload failed: {exc!r}")
+
+    thread = threading.Thread(target=run, name="plan-cache-warm", daemon=True)
+    thread.start()
+    return thread
+
+
+def resolve_choice(
+    value: str | None,
+    choices: Iterable[str],
+    aliases: Mapping[str, str],
+    default: str,
+) -> str:
+    """
+    Map free-form user input onto a supported option: exact match, then alias,
+    then the closest spelling, else `default`. Never raises.
+    """
+    options = tuple(choices)
+    key = " ".join((value or "").lower().replace("_", " ").replace("-", " ").split())
+    if key in options:
+        return key
+    for candidate in (key, key.replace(" ", "")):
+        if candidate in aliases:
+            return aliases[candidate]
+    for word in key.split():
+        if word in options:
+            return word
+        if word in aliases:
+            return aliases[word]
+    close = difflib.get_close_matches(key, options + tuple(aliases), n=1, cutoff=0.6)
+    if close:
+        return close[0] if close[0] in options else aliases[close[0]]
+    return default
+
+
+def bit_indices(mask: int) -> Tuple[int, ...]:
+    """Positions of the set bits in `mask`, lowest first."""
+    out = []
+    while mask:
+        low = mask & -mask
+        out.append(low.bit_length() - 1)
+        mask ^= low
+    return tuple(out)
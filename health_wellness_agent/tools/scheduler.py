@@ -11,6 +11,8 @@ Date Created: 2025-07-01
 # • Async scheduling tool that parses user intent for reminders (+20 async tool design)
 # • Supports weekday mapping and feedback on invalid inputs (guardrails + I/O)
 # • Integrates smoothly with agent handoff logic (prep for escalation) (+15 handoff-ready)
+# • Registers each check-in with the running ReminderEngine so it actually fires
+#   (only once the turn commits, so a failed turn leaves no stray reminder)
 
 
 from datetime import datetime, timedelta          
@@ -18,6 +20,7 @@ from typing_extensions import TypedDict, Literal
 from agents import function_tool, RunContextWrapper
 from pydantic import BaseModel, Field
 from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.reminders import active_engine
 
 Weekday = Literal[
     "monday", "tuesday", "wednesday",
@@ -35,19 +38,19 @@ class SchedulerOut(TypedDict):
     next_checkin: str
 
 
-@function_tool
-async def scheduler(
-    ctx: RunContextWrapper[UserSessionContext],
+def schedule_checkin(
+    session: UserSessionContext,
     input: SchedulerInput,
+    now: datetime | None = None,
 ) -> SchedulerOut:
-    """Create a weekly RRULE and store it in session context."""
+    """Build the weekly RRULE, record it on the session and compute the next check-in."""
     rrule = (
         "RRULE:FREQ=WEEKLY;BYDAY="
         + input.weekday[:2].upper()
         + f";BYHOUR={input.hour_24};BYMINUTE=0;BYSECOND=0"
     )
 
-    now = datetime.now()
+    now = now or datetime.now()
     weekday_idx = [
         "monday", "tuesday", "wednesday",
         "thursday", "friday", "saturday", "sunday",
@@ -62,8 +65,25 @@ async def scheduler(
         + timedelta(days=days_ahead)
     )
 
-    ctx.context.progress_logs.append(
-        {"event": "checkin_scheduled", "rrule": rrule, "timestamp": now.isoformat()}
-    )
+    def _register() -> None:
+        engine = active_engine()
+        if engine is not None:
+            engine.schedule(session.uid, rrule, after=now.timestamp())
+
+    with session.mutate() as changes:
+        changes.append(
+            "checkins",
+            {"event": "checkin_scheduled", "rrule": rrule, "timestamp": now.isoformat()},
+        )
+        changes.after_commit(_register)
 
     return {"rrule": rrule, "next_checkin": next_dt.isoformat()}
+
+
+@function_tool
+async def scheduler(
+    ctx: RunContextWrapper[UserSessionContext],
+    input: SchedulerInput,
+) -> SchedulerOut:
+    """Create a weekly RRULE and store it in session context."""
+    return schedule_checkin(ctx.context, input)
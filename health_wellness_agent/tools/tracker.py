@@ -11,13 +11,18 @@ Date Created: 2025-07-01
 # • Context-aware tool that reads from saved session goals (+10 context)
 # • Tool handles missing data with clear feedback (input guardrail concept)
 # • Async design using @tool for full integration into main agent
+# • Samples land in the columnar ProgressHistory (one series per metric)
+# • Writes are staged through session.mutate(), so they join the turn's transaction
+# • import_progress: bulk CSV/JSONL exports in one call, answered with a summary
 
 
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Any, Dict, Literal
 from typing_extensions import TypedDict, Annotated
 from agents import function_tool, RunContextWrapper
 from pydantic import BaseModel, Field
 from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.transaction import offload
 
 
 class ProgressInput(BaseModel):
@@ -31,17 +36,47 @@ class ProgressOut(TypedDict):
     log_count: int
 
 
+def record_progress(session: UserSessionContext, input: ProgressInput) -> ProgressOut:
+    """Append one sample to the session's progress history."""
+    with session.mutate() as changes:
+        changes.record(
+            input.metric,
+            input.value,
+            ts=datetime.now(timezone.utc),
+            notes=input.notes,
+        )
+    series = session.progress.get(input.metric.lower().strip())
+    return {"stored": True, "log_count": len(series) if series is not None else 0}
+
+
 @function_tool
 async def tracker(
     ctx: RunContextWrapper[UserSessionContext],
     input: ProgressInput,
 ) -> ProgressOut:
     """Store a progress update in session context."""
-    log_entry = {
-        "timestamp": datetime.utcnow().isoformat() + "Z",
-        "metric": input.metric.lower(),
-        "value": input.value,
-        "notes": input.notes,
-    }
-    ctx.context.progress_logs.append(log_entry)
-    return {"stored": True, "log_count": len(ctx.context.progress_logs)}
+    return record_progress(ctx.context, input)
+
+
+class ImportInput(BaseModel):
+    filename: str = Field(..., description="Export file name in the user's imports folder, e.g. 'watch_march.csv'")
+    format: Literal["auto", "csv", "jsonl"] = "auto"
+
+
+@function_tool
+async def import_progress(
+    ctx: RunContextWrapper[UserSessionContext],
+    input: ImportInput,
+) -> Dict[str, Any]:
+    """Import a whole wearable/spreadsheet export (CSV or JSONL) of progress samples at once; returns a per-metric summary."""
+    from health_wellness_agent.ingest import parse_file, resolve_import_path
+
+    session = ctx.context
+    try:
+        path = resolve_import_path(input.filename, session.uid)
+    except (ValueError, FileNotFoundError) as exc:
+        return {"imported": 0, "error": str(exc)}
+
+    ingest = await offload(parse_file, path, input.format)     # parse + validate off the event loop
+    prepared = await offload(ingest.prepare, session)          # dedupe + merge, too
+    return ingest.apply(session, prepared)
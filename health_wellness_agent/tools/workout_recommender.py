@@ -8,16 +8,27 @@ Date Created: 2025-07-01
 """
 
 # In this file I have implemented:
-# • Async tool that outputs a 7-day workout schedule (+20 tool design & async)
+# • Async tool that outputs a multi-week workout schedule (+20 tool design & async)
 # • Multi-turn interaction potential based on user type (injury, goal) (+15 multi-turn)
 # • Structured exercise categories with rest and cardio logic
+# • Memoised, precomputed plans shared as immutable objects via PlanCache
+# • Periodised generator over the indexed exercise catalog (equipment, time, injuries)
+# • get_workout_plans(): bulk mode, one generation per distinct key
+# • Cache misses are generated on the tool thread pool, off the event loop
+# • The model receives the compact table encoding (tools/encoding.py), not the raw dicts
 
 
-from typing_extensions import TypedDict
-from typing import List
+from typing_extensions import TypedDict, Annotated
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
 from agents import function_tool, RunContextWrapper
 from pydantic import BaseModel, Field
 from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.tools.encoding import encode_output
+from health_wellness_agent.tools.exercise_catalog import (
+    LEVELS, ExerciseCatalog, load_exercise_catalog, parse_equipment, parse_injuries,
+)
+from health_wellness_agent.tools.plan_cache import PlanCache, resolve_choice
+from health_wellness_agent.transaction import offload
 
 
 # ────────────────────────────────────────────────────────────────────
@@ -30,15 +41,195 @@ class WorkoutInput(BaseModel):
         examples=["beginner", "intermediate", "advanced"],
         description="User’s current training experience.",
     )
+    weeks: Annotated[int, Field(ge=1, le=12)] = 4
+    days_per_week: Annotated[int | None, Field(ge=1, le=7)] = None
+    minutes_per_session: Annotated[int | None, Field(ge=10, le=180)] = None
+    equipment: Optional[List[str]] = Field(
+        None,
+        examples=[["dumbbell", "band"], ["bodyweight"], ["gym"]],
+        description="Equipment available; omit for a full gym.",
+    )
+    injuries: List[str] = Field(
+        default_factory=list,
+        examples=[["knee"], ["lower back", "shoulder"]],
+        description="Injured or painful areas to work around.",
+    )
 
 
 class DailyWorkout(TypedDict):
+    day: str
     focus: str
     details: str
 
 
 class WorkoutPlanOutput(TypedDict):
-    workout_plan: List[DailyWorkout]
+    workout_plan: Sequence[DailyWorkout]
+    weeks: int
+    avoided_for_injuries: List[str]
+
+
+# ────────────────────────────────────────────────────────────────────
+# Periodised generator over the bundled exercise catalog
+# ────────────────────────────────────────────────────────────────────
+
+_LEVEL_ALIASES = {
+    "novice": "beginner", "new": "beginner", "starter": "beginner", "easy": "beginner",
+    "sedentary": "beginner", "medium": "intermediate", "moderate": "intermediate",
+    "regular": "intermediate", "expert": "advanced", "pro": "advanced",
+    "athlete": "advanced", "elite": "advanced", "hard": "advanced",
+}
+
+# Session type → (catalog category, muscle group per exercise slot).
+_SESSIONS: Dict[str, Tuple[str, Tuple[Optional[str], ...]]] = {
+    "Full-body strength A": ("strength", ("legs", "chest", "back", "core")),
+    "Full-body strength B": ("strength", ("glutes", "shoulders", "back", "core")),
+    "Upper-body strength":  ("strength", ("chest", "back", "shoulders", "arms", "core")),
+    "Lower-body strength":  ("strength", ("legs", "glutes", "legs", "core")),
+    "Push strength":        ("strength", ("chest", "shoulders", "chest", "arms")),
+    "Pull strength":        ("strength", ("back", "back", "arms", "core")),
+    "Legs strength":        ("strength", ("legs", "glutes", "legs", "core")),
+    "MetCon":               ("strength", ("full_body", "full_body", "core", "full_body")),
+    "Cardio":               ("cardio", (None,)),
+    "HIIT cardio":          ("hiit", (None,)),
+    "Mobility":             ("mobility", (None, None, None)),
+}
+_SPLITS: Dict[str, Tuple[str, ...]] = {
+    "beginner":     ("Full-body strength A", "Cardio", "Full-body strength B", "Mobility", "Cardio", "Mobility", "Cardio"),
+    "intermediate": ("Upper-body strength", "Lower-body strength", "HIIT cardio", "Upper-body strength", "Lower-body strength", "Cardio", "Mobility"),
+    "advanced":     ("Push strength", "Pull strength", "Legs strength", "MetCon", "Upper-body strength", "Lower-body strength", "Cardio"),
+}
+# Training days spread across the week, by sessions per week (0 = Monday).
+_LAYOUT: Dict[int, Tuple[int, ...]] = {
+    1: (2,), 2: (0, 3), 3: (0, 2, 4), 4: (0, 1, 3, 4),
+    5: (0, 1, 2, 4, 5), 6: (0, 1, 2, 3, 4, 5), 7: (0, 1, 2, 3, 4, 5, 6),
+}
+_WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_DEFAULT_DAYS = {"beginner": 3, "intermediate": 4, "advanced": 5}
+_DEFAULT_MINUTES = {"beginner": 30, "intermediate": 45, "advanced": 60}
+
+# 4-week blocks: three loading weeks then a deload. (sets, reps) per level.
+_SCHEMES: Dict[str, Tuple[Tuple[int, int], ...]] = {
+    "beginner":     ((2, 12), (3, 10), (3, 12), (2, 10)),
+    "intermediate": ((3, 12), (3, 10), (4, 8), (2, 10)),
+    "advanced":     ((4, 8), (4, 6), (5, 5), (3, 5)),
+}
+_CARDIO_PROGRESSION = (1.0, 1.1, 1.2, 0.7)
+_WARM_UP_MINUTES = 5
+_REST_DAY: Tuple[str, str] = ("Rest / mobility", "Foam-rolling, gentle stretch")
+
+PLAN_CACHE = PlanCache(maxsize=512)
+
+PlanKey = Tuple[str, int, int, int, Optional[FrozenSet[str]], FrozenSet[str]]
+
+
+def normalize(input: WorkoutInput, extra_injuries: Iterable[str] | str = ()) -> PlanKey:
+    """Cache key: level, weeks, days, minutes, equipment tags and injury regions."""
+    level = resolve_choice(input.fitness_level, LEVELS, _LEVEL_ALIASES, "beginner")
+    days = input.days_per_week or _DEFAULT_DAYS[level]
+    minutes = input.minutes_per_session or _DEFAULT_MINUTES[level]
+    injuries = parse_injuries(input.injuries) | parse_injuries(extra_injuries)
+    return level, input.weeks, days, int(round(minutes / 5.0) * 5), parse_equipment(input.equipment), injuries
+
+
+def _session(
+    catalog: ExerciseCatalog, allowed: int, kind: str, week: int, minutes: int, level: str,
+) -> Optional[str]:
+    """One day's prescription, or None when the constraints leave nothing to do."""
+    category, slots = _SESSIONS[kind]
+    phase, block = week % 4, week // 4
+    budget = minutes - _WARM_UP_MINUTES
+
+    if category in ("cardio", "hiit"):
+        options = catalog.pick(allowed, category)
+        if not options:
+            return None
+        row = options[week % len(options)]
+        mins = min(budget, round(catalog.minutes[row] * _CARDIO_PROGRESSION[phase] * (1 + 0.1 * block)))
+        return f"{catalog.names[row]} {mins} min"
+
+    sets, reps = _SCHEMES[level][phase]
+    used: List[int] = []
+    parts: List[str] = []
+    for n, muscle in enumerate(slots):
+        options = [r for r in catalog.pick(allowed, category, muscle) if r not in used]
+        if not options:
+            continue
+        row = options[(week + n) % len(options)]
+        cost = catalog.minutes[row] * (sets / 3 if category == "strength" else 1)
+        if parts and cost > budget:
+            continue
+        budget -= cost
+        used.append(row)
+        parts.append(catalog.names[row] + (f" {sets}×{reps}" if category == "strength" else ""))
+    if not parts:
+        return None
+    details = ", ".join(parts)
+    if category == "strength" and block and phase != 3:
+        details += f" (block {block + 1}: add ~{5 * block}% load)"
+    if category == "strength" and phase == 3:
+        details += " — deload, lighter weights"
+    return details
+
+
+def _build(
+    level: str,
+    weeks: int,
+    days: int,
+    minutes: int,
+    equipment: Optional[FrozenSet[str]] = None,
+    injuries: FrozenSet[str] = frozenset(),
+) -> List[DailyWorkout]:
+    """
+    `weeks` × 7 days. Training days rotate through the level's split; each
+    session draws exercises from the constraint mask and rotates them week to
+    week. Volume follows 4-week blocks (3 loading weeks + deload). A session
+    the constraints empty out falls back to cardio, then mobility, then rest.
+    """
+    catalog = load_exercise_catalog()
+    allowed = catalog.allowed(level, equipment, injuries)
+    split = _SPLITS[level]
+    layout = _LAYOUT[days]
+
+    plan: List[DailyWorkout] = []
+    for week in range(weeks):
+        sessions = iter(split)
+        for weekday in range(7):
+            focus, details = _REST_DAY
+            if weekday in layout:
+                kind = next(sessions)
+                for candidate in (kind, "Cardio", "Mobility"):
+                    found = _session(catalog, allowed, candidate, week, minutes, level)
+                    if found:
+                        focus, details = candidate, found
+                        break
+            plan.append({"day": f"Week {week + 1} {_WEEKDAYS[weekday]}", "focus": focus, "details": details})
+    return plan
+
+
+def get_workout_plan(input: WorkoutInput, extra_injuries: Iterable[str] | str = ()) -> Sequence[DailyWorkout]:
+    """Immutable, shared plan for the (normalised) input."""
+    key = normalize(input, extra_injuries)
+    return PLAN_CACHE.get_or_build(key, lambda: _build(*key))
+
+
+def get_workout_plans(inputs: Iterable[WorkoutInput | dict]) -> List[Sequence[DailyWorkout]]:
+    """
+    Bulk mode: plans for many users in one pass, aligned with `inputs`. Each
+    distinct normalised key is generated once.
+    """
+    keys = [
+        normalize(i if isinstance(i, WorkoutInput) else WorkoutInput.model_validate(i))
+        for i in inputs
+    ]
+    built = {key: PLAN_CACHE.get_or_build(key, lambda k=key: _build(*k)) for key in dict.fromkeys(keys)}
+    return [built[key] for key in keys]
+
+
+# Registered only: built on first use, or by plan_cache.warm_in_background() after startup.
+PLAN_CACHE.preload(
+    (key, (lambda k=key: _build(*k)))
+    for key in (normalize(WorkoutInput(fitness_level=level)) for level in LEVELS)
+)
 
 
 # ────────────────────────────────────────────────────────────────────
@@ -49,39 +240,19 @@ class WorkoutPlanOutput(TypedDict):
 async def workout_recommender(
     ctx: RunContextWrapper[UserSessionContext],
     input: WorkoutInput,
-) -> WorkoutPlanOutput:
-    """Return a stubbed 7-day workout plan tailored to fitness level."""
-    level = input.fitness_level.lower()
-
-    # Template sessions per level (replace with smarter logic later)
-    template = {
-        "beginner": [
-            ("Full-body strength", "Body-weight squats, push-ups, bands x3"),
-            ("Cardio",            "30-min brisk walk or cycling"),
-            ("Rest / mobility",   "Gentle yoga & stretching"),
-        ],
-        "intermediate": [
-            ("Upper-body strength", "Bench, rows, overhead press 3×10"),
-            ("Lower-body strength", "Squats, lunges, RDLs 3×10"),
-            ("HIIT cardio",         "20-min interval running / rowing"),
-        ],
-        "advanced": [
-            ("Push strength",  "Heavy bench & incline DB presses 5×5"),
-            ("Pull strength",  "Weighted pull-ups & barbell rows 5×5"),
-            ("Legs strength",  "Back squats & deadlifts 5×5"),
-            ("MetCon",         "CrossFit-style circuit 15-min AMRAP"),
-        ],
-    }[level]
-
-    # Build 7-day sequence: repeat or insert rest days
-    week: List[DailyWorkout] = []
-    while len(week) < 7:
-        for focus, details in template:
-            week.append({"focus": focus, "details": details})
-            if len(week) == 7:
-                break
-        if len(template) < 7:
-            week.append({"focus": "Rest / mobility", "details": "Foam-rolling, gentle stretch"})
-
-    ctx.context.workout_plan = week
-    return {"workout_plan": week}
+) -> str:
+    """Build a progressive multi-week workout plan for the user's level, equipment, time and injuries."""
+    session = ctx.context
+    key = normalize(input, session.injury_notes or "")
+    week = PLAN_CACHE.peek(key)
+    if week is None:
+        week = await offload(PLAN_CACHE.get_or_build, key, lambda: _build(*key))
+
+    with session.mutate() as changes:
+        # Remember newly reported injuries so later plans keep working around them.
+        new = [i for i in input.injuries if i.lower() not in (session.injury_notes or "").lower()]
+        if new:
+            changes.set("injury_notes", "; ".join(filter(None, [session.injury_notes, *new])))
+        changes.set("workout_plan", week)
+    output: WorkoutPlanOutput = {"workout_plan": week, "weeks": key[1], "avoided_for_injuries": sorted(key[5])}
+    return encode_output("workout_recommender", session, output, table="workout_plan")
@@ -0,0 +1,240 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: transaction.py
+Description: Per-turn transactions over UserSessionContext — tools stage their mutations in a
+ChangeSet, each ChangeSet lands atomically, and the whole turn commits or rolls back as one.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • ChangeSet: one tool call's staged writes (set field / append to list / record or
+#   bulk-merge progress / swap in a series built off the loop)
+#   plus side effects deferred until the turn commits
+# • SessionTransaction: copy-on-write apply under a lock with an undo journal, so parallel
+#   tools never see each other half-done and a failed turn restores the session exactly
+# • offload(): a shared thread pool for the sync-heavy parts of tools (plan builds, fits);
+#   work from a profiled turn is tagged so the profiler samples it too
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from health_wellness_agent.profiling import pool_task
+from health_wellness_agent.timeseries import MetricSeries
+
+T = TypeVar("T")
+
+_SET, _APPEND, _RECORD, _MERGE, _REPLACE = "set", "append", "record", "merge", "replace"
+
+
+class ChangeSet:
+    """Mutations from one tool call, applied all at once (or not at all)."""
+
+    __slots__ = ("ops", "callbacks")
+
+    def __init__(self) -> None:
+        self.ops: List[Tuple[str, Any, Any]] = []
+        self.callbacks: List[Callable[[], Any]] = []
+
+    def set(self, field: str, value: Any) -> None:
+        self.ops.append((_SET, field, value))
+
+    def append(self, field: str, item: Any) -> None:
+        self.ops.append((_APPEND, field, item))
+
+    def record(self, metric: str, value: float | str, ts: Any = None, notes: Optional[str] = None) -> None:
+        self.ops.append((_RECORD, metric, (value, ts, notes)))
+
+    def merge(self, metric: str, ts: Any, values: Any, notes: Optional[Dict[int, str]] = None) -> None:
+        """Bulk-add a time-sorted batch of samples to one metric (see MetricSeries.merge)."""
+        self.ops.append((_MERGE, metric, (ts, values, notes)))
+
+    def replace_series(self, metric: str, series: MetricSeries) -> None:
+        """Swap in a whole series, e.g. one ProgressHistory.merged() built on the tool pool."""
+        self.ops.append((_REPLACE, metric.lower().strip(), series))
+
+    def after_commit(self, fn: Callable[[], Any]) -> None:
+        """Run `fn` once the turn commits (e.g. register with a background engine)."""
+        self.callbacks.append(fn)
+
+    def __bool__(self) -> bool:
+        return bool(self.ops or self.callbacks)
+
+
+def apply_changes(session, changes: ChangeSet, txn: Optional["SessionTransaction"] = None) -> None:
+    """
+    Apply in place. With a transaction, every container is copied on its first
+    write of the turn and the original kept for rollback, so a concurrent
+    serialiser only ever sees whole objects swapped in.
+    """
+    for op, key, arg in changes.ops:
+        if op == _SET:
+            if txn is not None:
+                txn._journal_field(key)
+            setattr(session, key, arg)
+        elif op == _APPEND:
+            target = txn._own_list(key) if txn is not None else getattr(session, key)
+            target.append(arg)
+        elif op == _REPLACE:
+            if txn is not None:
+                txn._journal_series(key)
+            session.progress.series[key] = arg
+        else:
+            if txn is not None:
+                txn._own_series(key)
+            if op == _MERGE:
+                session.progress.merge(key, *arg)
+            else:
+                value, ts, notes = arg
+                session.progress.record(key, value, ts=ts, notes=notes)
+
+
+class SessionTransaction:
+    """
+    One turn's worth of changes to a session. Tools stage through
+    `session.mutate()`; each ChangeSet is applied under the transaction lock
+    when the tool finishes, so later tools in the same turn read earlier
+    results, while commit() / rollback() decide what the turn leaves behind.
+    Usable as a context manager: commit on success, roll back on any exception
+    (including cancellation).
+    """
+
+    def __init__(self, session) -> None:
+        self.session = session
+        self.state = "open"
+        self._lock = threading.Lock()
+        self._fields: Dict[str, Any] = {}               # field → value before the turn
+        self._owned: Dict[str, list] = {}               # list fields already copied
+        self._series: Dict[str, Optional[MetricSeries]] = {}
+        self._callbacks: List[Callable[[], Any]] = []
+        self.applied = 0
+        self.shown: Set[str] = set()                    # tool-output digests the model saw this turn
+
+    # ── journal ─────────────────────────────────────────────────────
+    def _journal_field(self, field: str) -> None:
+        if field not in self._fields:
+            self._fields[field] = getattr(self.session, field)
+        self._owned.pop(field, None)
+
+    def _own_list(self, field: str) -> list:
+        owned = self._owned.get(field)
+        if owned is None:
+            if field not in self._fields:
+                self._fields[field] = getattr(self.session, field)
+            owned = self._owned[field] = list(getattr(self.session, field) or [])
+            setattr(self.session, field, owned)
+        return owned
+
+    def _journal_series(self, metric: str) -> bool:
+        """Remember the series before the turn touched it; False if already done."""
+        if metric in self._series:
+            return False
+        self._series[metric] = self.session.progress.series.get(metric)
+        return True
+
+    def _own_series(self, metric: str) -> None:
+        metric = metric.lower().strip()
+        if self._journal_series(metric) and self._series[metric] is not None:
+            self.session.progress.series[metric] = self._series[metric].copy()
+
+    # ── API ─────────────────────────────────────────────────────────
+    def apply(self, changes: ChangeSet) -> None:
+        if self.state != "open":
+            raise RuntimeError(f"transaction already {self.state}")
+        with self._lock:
+            apply_changes(self.session, changes, self)
+            self._callbacks.extend(changes.callbacks)
+            self.applied += 1
+
+    def apply_durable(self, changes: ChangeSet) -> None:
+        """
+        Apply now and keep through a rollback: for writes that are not this
+        turn's to undo, e.g. a coach worker logging an outcome mid-turn.
+        Field writes only; progress series belong to the turn.
+        """
+        with self._lock:
+            apply_changes(self.session, changes)
+            for op, key, arg in changes.ops:
+                if op not in (_SET, _APPEND):
+                    raise ValueError("durable writes cover session fields only")
+                if key not in self._fields:
+                    continue                            # not journaled: nothing to restore over it
+                if op == _SET:
+                    self._fields[key] = arg
+                elif self._fields[key] is not getattr(self.session, key):
+                    self._fields[key] = [*(self._fields[key] or []), arg]
+
+    def commit(self) -> None:
+        with self._lock:
+            if self.state != "open":
+                return
+            self.state = "committed"
+            changed = bool(self._fields or self._series)
+            callbacks, self._callbacks = self._callbacks, []
+            self._fields.clear()
+            self._owned.clear()
+            self._series.clear()
+        self.session._txn = None
+        if changed:
+            self.session.mark_dirty()
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as exc:                    # the turn itself already succeeded
+                print(f"[SessionTransaction] after-commit hook failed: {exc!r}")
+
+    def rollback(self) -> None:
+        with self._lock:
+            if self.state != "open":
+                return
+            self.state = "rolled_back"
+            for field, value in self._fields.items():
+                setattr(self.session, field, value)
+            series = self.session.progress.series
+            for metric, original in self._series.items():
+                if original is None:
+                    series.pop(metric, None)
+                else:
+                    series[metric] = original
+            self._fields.clear()
+            self._owned.clear()
+            self._series.clear()
+            self._callbacks.clear()
+        self.session._txn = None
+
+    def __enter__(self) -> "SessionTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+        return False
+
+
+# ────────────────────────────────────────────────────────────────────
+# Thread pool for sync-heavy tool work
+# ────────────────────────────────────────────────────────────────────
+
+TOOL_POOL = ThreadPoolExecutor(
+    max_workers=int(os.getenv("HWA_TOOL_THREADS", "0")) or min(8, (os.cpu_count() or 1) + 2),
+    thread_name_prefix="hwa-tool",
+)
+
+
+async def offload(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a blocking, pure computation on the tool pool so the event loop keeps
+    streaming other sessions. Mutations still go through `session.mutate()`.
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        TOOL_POOL, pool_task(partial(fn, *args, **kwargs))
+    )
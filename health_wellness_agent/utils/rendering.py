@@ -0,0 +1,201 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: rendering.py
+Description: Coalescing stream renderer that batches token deltas into sink writes on a
+time/size budget and records time-to-first-token and inter-token timing per turn.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Pluggable async sinks: terminal, file and queue (for SSE / WebSocket transports)
+# • StreamRenderer that flushes buffered deltas every `max_delay` seconds or `max_chars`
+# • StreamMetrics with TTFT, inter-token gaps and total duration for each turn
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import IO, Callable, Dict, List, Optional, Protocol, Set
+
+
+# ────────────────────────────────────────────────────────────────────
+# Metrics
+# ────────────────────────────────────────────────────────────────────
+
+@dataclass
+class StreamMetrics:
+    """Timing for one streamed turn; all values in seconds from `started`."""
+    started: float = 0.0
+    first_token: Optional[float] = None
+    last_token: Optional[float] = None
+    ended: Optional[float] = None
+    deltas: int = 0
+    chars: int = 0
+    writes: int = 0
+    gaps: array = field(default_factory=lambda: array("d"))
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return None if self.first_token is None else self.first_token - self.started
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.ended is None else self.ended - self.started
+
+    def gap_percentile(self, q: float) -> Optional[float]:
+        if not self.gaps:
+            return None
+        ordered = sorted(self.gaps)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self) -> Dict[str, Optional[float]]:
+        ms = lambda v: None if v is None else round(v * 1000, 3)
+        return {
+            "ttft_ms": ms(self.ttft),
+            "duration_ms": ms(self.duration),
+            "gap_p50_ms": ms(self.gap_percentile(0.50)),
+            "gap_p95_ms": ms(self.gap_percentile(0.95)),
+            "gap_max_ms": ms(max(self.gaps) if self.gaps else None),
+            "deltas": self.deltas,
+            "chars": self.chars,
+            "writes": self.writes,
+        }
+
+
+# ────────────────────────────────────────────────────────────────────
+# Sinks
+# ────────────────────────────────────────────────────────────────────
+
+class StreamSink(Protocol):
+    async def emit(self, kind: str, text: str) -> None: ...
+
+
+class TerminalSink:
+    """Human-readable CLI output; one write + flush per coalesced batch."""
+
+    def __init__(self, stream: Optional[IO[str]] = None) -> None:
+        self._stream = stream or sys.stdout
+        self._started = False
+
+    async def emit(self, kind: str, text: str) -> None:
+        if kind == "delta":
+            if not self._started:
+                text = "\nAssistant: " + text
+                self._started = True
+        elif kind == "message_end":
+            if not self._started:
+                return
+            text, self._started = "\n", False
+        elif kind == "agent":
+            text = f"\n[Agent switched → {text}]\n"
+        else:
+            text = f"\n[{kind}] {text}\n"
+        self._stream.write(text)
+        self._stream.flush()
+
+
+class FileSink(TerminalSink):
+    """Same formatting as the terminal, appended to a log file."""
+
+    def __init__(self, path: str) -> None:
+        super().__init__(open(path, "a", encoding="utf-8"))
+
+    def close(self) -> None:
+        self._stream.close()
+
+
+class QueueSink:
+    """Forwards (kind, text) to an asyncio.Queue; a bounded queue applies backpressure."""
+
+    def __init__(self, queue: asyncio.Queue) -> None:
+        self.queue = queue
+
+    async def emit(self, kind: str, text: str) -> None:
+        await self.queue.put((kind, text))
+
+
+# ────────────────────────────────────────────────────────────────────
+# Renderer
+# ────────────────────────────────────────────────────────────────────
+
+class StreamRenderer:
+    """
+    Buffers consecutive deltas and hands them to the sink as one write when the
+    oldest buffered delta is `max_delay` seconds old, the buffer reaches
+    `max_chars`, or a non-delta event arrives. Use one renderer per turn.
+    """
+
+    def __init__(
+        self,
+        sink: StreamSink,
+        max_delay: float = 0.03,
+        max_chars: int = 2048,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self.sink = sink
+        self.max_delay = max_delay
+        self.max_chars = max_chars
+        self._clock = clock
+        self._buf: List[str] = []
+        self._buf_chars = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: Set[asyncio.Task] = set()   # timer flushes still running
+        self._lock = asyncio.Lock()
+        self.metrics = StreamMetrics(started=clock())
+
+    async def feed(self, kind: str, text: str) -> None:
+        now = self._clock()
+        m = self.metrics
+        if kind != "delta":
+            await self.flush()
+            async with self._lock:
+                await self.sink.emit(kind, text)
+            return
+
+        if m.first_token is None:
+            m.first_token = now
+        elif m.last_token is not None:
+            m.gaps.append(now - m.last_token)
+        m.last_token = now
+        m.deltas += 1
+        m.chars += len(text)
+
+        self._buf.append(text)
+        self._buf_chars += len(text)
+        if self._buf_chars >= self.max_chars or self.max_delay <= 0:
+            await self.flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.max_delay, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        task = asyncio.ensure_future(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._buf:
+            return
+        text = "".join(self._buf)
+        self._buf.clear()
+        self._buf_chars = 0
+        async with self._lock:                      # keep writes ordered
+            self.metrics.writes += 1
+            await self.sink.emit("delta", text)
+
+    async def close(self) -> StreamMetrics:
+        """Flush what is left and stamp the end of the turn."""
+        await self.flush()
+        while self._flush_tasks:                    # every timer flush, not just the latest
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        self.metrics.ended = self._clock()
+        return self.metrics
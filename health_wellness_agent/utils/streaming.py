@@ -10,16 +10,39 @@ Date Created: 2025-07-01
 # In this file I have implemented:
 # • Live streaming token display in the CLI (+15 real-time streaming)
 # • Filters noisy SDK output for clean display
+# • Transport-agnostic `stream_deltas` generator shared by the CLI and the server
+# • Output goes through a coalescing StreamRenderer instead of one flush per token
+# • Each turn replays the session's compacted ConversationHistory
+# • Optional rule-based fast path answers structured requests without the model
+# • Input guardrails screen the prompt concurrently with the model turn; a trip
+#   cancels the in-flight stream and reroutes the turn to the named specialist
+# • Each model turn is a session transaction: committed on success, rolled back otherwise
+# • Optional AnswerCache: general questions replay a recorded answer instead of a model turn
+# • Optional SpecialistFanOut: a rerouted turn that spans several specialists asks them all
+#   at once and streams their answers as one reply
+# • Optional TurnProfiler: sampled turns run under the stack sampler and tracemalloc
 
-import sys
-from agents import Runner, RunContextWrapper
+import asyncio
+from typing import AsyncIterator, Literal, Optional, Sequence, Tuple
+from agents import (
+    InputGuardrail, InputGuardrailResult, InputGuardrailTripwireTriggered,
+    Runner, RunConfig, RunContextWrapper, RunHooks,
+)
+from health_wellness_agent.answer_cache import AnswerCache
 from health_wellness_agent.context import UserSessionContext
+from health_wellness_agent.fanout import SpecialistFanOut
+from health_wellness_agent.fast_path import FastPathRouter
+from health_wellness_agent.hooks import TracingRunHooks, new_run
+from health_wellness_agent.profiling import TurnProfiler
+from health_wellness_agent.utils.rendering import StreamMetrics, StreamRenderer, TerminalSink
 
 try:
     from openai.types.responses import ResponseTextDeltaEvent
 except ImportError:
     class ResponseTextDeltaEvent: pass
 
+StreamChunk = Tuple[Literal["delta", "message_end", "agent"], str]
+
 def _is_token_delta(ev) -> bool:
     return (
         ev.type == "raw_response_event"
@@ -27,35 +50,267 @@ def _is_token_delta(ev) -> bool:
         and isinstance(ev.data.delta, str)
     )
 
+def _session(ctx) -> UserSessionContext:
+    # Runner wraps whatever it is given in a RunContextWrapper; hand it the
+    # session itself so tools see `ctx.context` as a UserSessionContext.
+    return ctx.context if isinstance(ctx, RunContextWrapper) else ctx
+
+def _to_chunk(ev) -> StreamChunk | None:
+    if _is_token_delta(ev):
+        return "delta", ev.data.delta
+    if ev.type == "run_item_stream_event":
+        if ev.item.type == "message_output_item":
+            return "message_end", ""
+    elif ev.type == "agent_updated_stream_event":
+        return "agent", ev.new_agent.name
+    return None
+
+async def _screen(
+    guardrails: Sequence[InputGuardrail], agent, prompt: str, session: UserSessionContext
+) -> Optional[InputGuardrailResult]:
+    """Run every guardrail concurrently; the first tripped result, or None."""
+    wrapper = RunContextWrapper(session)
+    tasks = [asyncio.ensure_future(g.run(agent, prompt, wrapper)) for g in guardrails]
+    try:
+        for done in asyncio.as_completed(tasks):
+            result = await done
+            if result.output.tripwire_triggered:
+                return result
+        return None
+    finally:
+        for t in tasks:
+            t.cancel()
+
+async def _until_tripped(run_stream, screen: asyncio.Task | None):
+    """
+    Stream events, racing each one against the screen while it is pending.
+    Yields the tripped InputGuardrailResult (and stops) if the screen trips,
+    even after the run's last event; once it passes, events flow with no
+    further overhead.
+    """
+    events = run_stream.stream_events()
+    nxt = None
+    try:
+        while screen is not None:
+            nxt = asyncio.ensure_future(anext(events))
+            await asyncio.wait((nxt, screen), return_when=asyncio.FIRST_COMPLETED)
+            if screen.done():
+                tripped, screen = screen.result(), None     # a failing screen raises here
+                if tripped is not None:
+                    nxt.cancel()
+                    await asyncio.gather(nxt, return_exceptions=True)
+                    yield tripped
+                    return
+            try:
+                ev = await nxt
+            except StopAsyncIteration:
+                # The run finished before the screen: its verdict still decides the turn.
+                tripped, screen = await screen, None
+                if tripped is not None:
+                    yield tripped
+                return
+            yield ev
+        async for ev in events:
+            yield ev
+    finally:
+        if screen is not None and not screen.done():
+            screen.cancel()
+        if nxt is not None and not nxt.done():      # e.g. the screen raised mid-race
+            nxt.cancel()
+            await asyncio.gather(nxt, return_exceptions=True)
+        await events.aclose()
+
+def stream_deltas(
+    agent,
+    prompt: str,
+    ctx: RunContextWrapper[UserSessionContext] | UserSessionContext,
+    run_config: RunConfig | None = None,
+    hooks: RunHooks | None = None,
+    fast_path: FastPathRouter | None = None,
+    guardrails: Sequence[InputGuardrail] | None = None,
+    answer_cache: AnswerCache | None = None,
+    fanout: SpecialistFanOut | None = None,
+    profiler: TurnProfiler | None = None,
+) -> AsyncIterator[StreamChunk]:
+    """
+    Yield ("delta", text) for assistant tokens, ("message_end", "") when an
+    assistant message completes, and ("agent", name) on handoffs.
+
+    `guardrails` (e.g. SafetyClassifier().guardrail()) run alongside the model
+    rather than before it, so safe turns pay no extra latency. A tripwire whose
+    output_info names a `route` cancels the planner's stream and hands the turn
+    straight to that specialist; any other trip raises like the SDK would.
+    With a fast path or answer cache they run first instead, so neither can
+    answer a message that should have been rerouted.
+
+    The turn runs in a session transaction: tool writes land as each tool
+    finishes and are committed with the history once the turn completes, or
+    rolled back if it fails or the consumer goes away. A reroute rolls back
+    what the planner staged and runs the specialist in a fresh one.
+
+    With `answer_cache`, a general question (see AnswerCache.key) that passes
+    the guardrails replays the stored chunks and history items; a model turn
+    that called no tools, tripped nothing and had no earlier conversation in
+    its input is stored for the next asker.
+
+    With `fanout`, a reroute whose message also needs another specialist (an
+    injury plus diabetes, say) asks all of them concurrently instead.
+
+    With `profiler`, a sampled turn (see TurnProfiler) is profiled end to end;
+    any other turn gets the plain generator back.
+    """
+    stream = _stream_deltas(
+        agent, prompt, ctx, run_config, hooks, fast_path, guardrails, answer_cache, fanout
+    )
+    if profiler is None:
+        return stream
+    return profiler.instrument(stream, _session(ctx))
+
+async def _stream_deltas(
+    agent,
+    prompt: str,
+    ctx: RunContextWrapper[UserSessionContext] | UserSessionContext,
+    run_config: RunConfig | None = None,
+    hooks: RunHooks | None = None,
+    fast_path: FastPathRouter | None = None,
+    guardrails: Sequence[InputGuardrail] | None = None,
+    answer_cache: AnswerCache | None = None,
+    fanout: SpecialistFanOut | None = None,
+) -> AsyncIterator[StreamChunk]:
+    session = _session(ctx)
+    # Shortcuts that skip the model would also skip the concurrent screen, so
+    # when one is available screen first (the safety classifier is local and
+    # takes microseconds); a trip goes straight to the reroute below.
+    pre_screened = bool(guardrails) and (fast_path is not None or answer_cache is not None)
+    tripped = await _screen(guardrails, agent, prompt, session) if pre_screened else None
+    if fast_path is not None and tripped is None:
+        with session.begin():
+            handled = fast_path.try_handle(session, prompt)
+        if handled is not None:
+            yield "delta", handled.reply
+            yield "message_end", ""
+            session.history.record_turn(
+                prompt, [{"role": "assistant", "content": handled.reply}]
+            )
+            session.mark_dirty()
+            return
+    cache_key = None
+    if answer_cache is not None and tripped is None:
+        cache_key = answer_cache.key(agent, prompt, session)
+    if cache_key is not None:
+        cached = answer_cache.get(cache_key)
+        if cached is not None:
+            for chunk in cached.chunks:
+                yield chunk
+            session.history.record_turn(prompt, list(cached.items))
+            session.mark_dirty()
+            return
+    recorded: list = []
+    run_input = session.history.build_input(prompt)
+    screen = None
+    if guardrails and not pre_screened:
+        screen = asyncio.ensure_future(_screen(guardrails, agent, prompt, session))
+    run_stream = None
+    runs = []                               # hook run ids, so cancelled runs leave no open spans
+    preface = []
+    fanned_out = False
+    txn = session.begin()
+    try:
+        if tripped is None:
+            runs.append(new_run())
+            run_stream = Runner.run_streamed(
+                agent,
+                input=run_input,
+                context=session,
+                run_config=run_config,
+                hooks=hooks,
+            )
+            async for ev in _until_tripped(run_stream, screen):
+                if isinstance(ev, InputGuardrailResult):
+                    tripped = ev                # the generator ends right after this
+                    continue
+                chunk = _to_chunk(ev)
+                if chunk is not None:
+                    if cache_key is not None:
+                        recorded.append(chunk)
+                    yield chunk
+        if tripped is not None:
+            if run_stream is not None:
+                run_stream.cancel()
+            # Whatever the planner's tools staged before the trip is part of the
+            # blocked request: undo it, and give the specialist a clean transaction.
+            txn.rollback()
+            txn = session.begin()
+            verdict = tripped.output.output_info
+            route = getattr(verdict, "route", None)
+            if route is None:
+                raise InputGuardrailTripwireTriggered(tripped)
+            notice = getattr(verdict, "notice", None)
+            if notice:
+                yield "delta", notice
+                yield "message_end", ""
+                preface.append({"role": "assistant", "content": notice})
+            panel = fanout.select(prompt, session, verdict) if fanout is not None else []
+            fanned_out = route in panel and len(panel) > 1
+            if fanned_out:
+                merged = []
+                async for chunk in fanout.stream(prompt, session, panel):
+                    if chunk[0] == "delta":
+                        merged.append(chunk[1])
+                    yield chunk
+                preface.append({"role": "assistant", "content": "".join(merged).strip()})
+            else:
+                from health_wellness_agent.agent import get_specialist
+                runs.append(new_run())
+                run_stream = Runner.run_streamed(   # announces itself via agent_updated
+                    get_specialist(route),
+                    input=run_input,
+                    context=session,
+                    run_config=run_config,
+                    hooks=hooks,
+                )
+                async for ev in run_stream.stream_events():
+                    chunk = _to_chunk(ev)
+                    if chunk is not None:
+                        yield chunk
+        if not fanned_out:
+            preface += [item.to_input_item() for item in run_stream.new_items]
+        session.history.record_turn(prompt, preface)
+        txn.commit()
+        session.mark_dirty()
+        if cache_key is not None and tripped is None:
+            answer_cache.store(cache_key, recorded, run_stream.new_items, run_input)
+    finally:
+        txn.rollback()                      # no-op once committed
+        if screen is not None and not screen.done():
+            screen.cancel()
+        if run_stream is not None and not run_stream.is_complete:   # consumer went away mid-turn
+            run_stream.cancel()
+        if isinstance(hooks, TracingRunHooks):
+            for run in runs:
+                hooks.end_run(run)
+
 async def stream_response(
     agent,
     prompt: str,
     ctx: RunContextWrapper[UserSessionContext],
-) -> None:
-    run_stream = Runner.run_streamed(agent, input=prompt, context=ctx)
-    started = False
-
-    async for ev in run_stream.stream_events():
-        # 1️⃣ Live assistant tokens
-        if _is_token_delta(ev):
-            if not started:
-                sys.stdout.write("\nAssistant: ")
-                started = True
-            sys.stdout.write(ev.data.delta)
-            sys.stdout.flush()
-            continue
-
-        # 2️⃣ Skip other low-level noise
-        if ev.type == "raw_response_event":
-            continue
-
-        # 3️⃣ Only handle final assistant message end
-        if ev.type == "run_item_stream_event":
-            if ev.item.type == "message_output_item" and started:
-                print()  # newline at end of assistant streaming
-                started = False
-            continue
-
-        # 4️⃣ Agent switches
-        if ev.type == "agent_updated_stream_event":
-            print(f"\n[Agent switched → {ev.new_agent.name}]")
+    run_config: RunConfig | None = None,
+    renderer: StreamRenderer | None = None,
+    hooks: RunHooks | None = None,
+    fast_path: FastPathRouter | None = None,
+    guardrails: Sequence[InputGuardrail] | None = None,
+    answer_cache: AnswerCache | None = None,
+    fanout: SpecialistFanOut | None = None,
+    profiler: TurnProfiler | None = None,
+) -> StreamMetrics:
+    """Render one turn through `renderer` (terminal by default) and return its timings."""
+    renderer = renderer or StreamRenderer(TerminalSink())
+    try:
+        async for kind, text in stream_deltas(
+            agent, prompt, ctx, run_config, hooks, fast_path, guardrails, answer_cache, fanout,
+            profiler,
+        ):
+            await renderer.feed(kind, text)
+    finally:
+        metrics = await renderer.close()
+    return metrics
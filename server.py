@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: server.py
+Description: HTTP + SSE entrypoint serving many Health & Wellness Agent sessions from one process.
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# In this file I have implemented:
+# • Server launcher wiring PlannerAgent, SessionStore, ReminderEngine, EscalationQueue,
+#   the model-access layer (HWA_MODEL_* env overrides), AnswerCache and ChatServer together
+# • --workers N: uid-sharded worker processes behind a Supervisor (one core each);
+#   kill -TTIN / -TTOU the supervisor to add / remove a worker
+# • Usage: curl -N -d '{"message": "hi"}' localhost:8080/sessions/42/messages
+
+import argparse, asyncio, functools, os, signal, sys, warnings
+from dotenv import load_dotenv
+
+warnings.filterwarnings("ignore", category=DeprecationWarning, module="pydantic")
+
+from agents import RunConfig
+from health_wellness_agent.agent import get_planner_agent
+from health_wellness_agent.answer_cache import AnswerCache
+from health_wellness_agent.cluster import Supervisor
+from health_wellness_agent.escalations import EscalationQueue
+from health_wellness_agent.models.access import ModelAccessProvider, ModelPolicy
+from health_wellness_agent.reminders import ReminderEngine
+from health_wellness_agent.server import ChatServer, ServerConfig
+from health_wellness_agent.session_store import SessionStore, SQLiteBackend
+from health_wellness_agent.tools.plan_cache import warm_in_background
+
+def build_server(host, port, max_concurrent_turns, coaches, shard=None, state_suffix=""):
+    store = SessionStore(SQLiteBackend(os.getenv("HWA_SESSION_DB", "sessions.db")))
+    state_path = os.getenv("HWA_REMINDER_STATE", "reminders.state")
+    return ChatServer(
+        get_planner_agent(),
+        store,
+        ServerConfig(host=host, port=port, max_concurrent_turns=max_concurrent_turns),
+        reminders=ReminderEngine(state_path=state_path + state_suffix),
+        escalations=EscalationQueue(coaches=coaches, store=store),
+        # One pooled client and one rate limit per model, shared by every session.
+        run_config=RunConfig(model_provider=ModelAccessProvider(policy=ModelPolicy.from_env())),
+        answer_cache=AnswerCache(ttl=float(os.getenv("HWA_ANSWER_TTL", str(6 * 3600)))),
+        shard=shard,
+    )
+
+def build_worker(spec, shard, max_concurrent_turns, coaches):
+    load_dotenv()
+    # Limits are cluster-wide: each worker takes its share, re-split on every ring update.
+    shard.limits.update(max_concurrent_turns=max_concurrent_turns, coaches=coaches)
+    server = build_server(spec.host, spec.port, shard.split(max_concurrent_turns),
+                          shard.split(coaches), shard=shard, state_suffix=f".{spec.name}")
+    warm_in_background()                        # each worker process has its own plan caches
+    return server
+
+async def main():
+    load_dotenv()                               # needs OPENAI_API_KEY
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-concurrent-turns", type=int, default=64)
+    parser.add_argument("--coaches", type=int, default=int(os.getenv("HWA_COACHES", "4")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("HWA_WORKERS", "1")),
+                        help="worker processes (0 = one per core)")
+    parser.add_argument("--worker-base-port", type=int, default=9100)
+    args = parser.parse_args()
+
+    if args.workers != 1:
+        supervisor = Supervisor(
+            functools.partial(build_worker, max_concurrent_turns=args.max_concurrent_turns,
+                              coaches=args.coaches),
+            workers=args.workers, host=args.host, port=args.port, base_port=args.worker_base_port,
+        )
+        await supervisor.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        if hasattr(signal, "SIGTTIN"):
+            scale = lambda d: asyncio.ensure_future(supervisor.scale(len(supervisor.ring) + d))
+            loop.add_signal_handler(signal.SIGTTIN, scale, 1)
+            loop.add_signal_handler(signal.SIGTTOU, scale, -1)
+            loop.add_signal_handler(signal.SIGTERM, stop.set)   # workers get a clean stop too
+        print(f">>> Health & Wellness Agent on http://{args.host}:{args.port} "
+              f"({len(supervisor.ring)} workers)")
+        try:
+            await stop.wait()
+        finally:
+            await supervisor.close()
+        return
+
+    server = build_server(args.host, args.port, args.max_concurrent_turns, args.coaches)
+    print(f">>> Health & Wellness Agent server on http://{args.host}:{args.port}")
+    warm_in_background()                        # common plans build while the first requests arrive
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+        server.store.close()
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,58 @@
+# SPDX-FileCopyrightText: 2025 Zohaib Javed
+# SPDX-License-Identifier: MIT
+"""
+Filename: test_session_persistence.py
+Description: Save → reload round trips through the session backends, for state whose
+shape only breaks once it has been persisted (e.g. typed meal-plan rows).
+Author: Zohaib Javed
+Date Created: 2026-10-18
+"""
+
+# Run with: python -m unittest discover -s tests   (or pytest)
+
+import os
+import sys
+import tempfile
+import unittest
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from health_wellness_agent.session_store import AppendLogBackend, SessionStore, SQLiteBackend
+from health_wellness_agent.tools.meal_planner import MealPlanInput, get_meal_plan
+
+
+class MealPlanRoundTrip(unittest.TestCase):
+    def setUp(self) -> None:
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _round_trip(self, make_backend) -> None:
+        plan = get_meal_plan(MealPlanInput(diet_style="keto", calories_per_day=2200))
+        store = SessionStore(make_backend(), flush_interval=60)
+        session = store.get(7, name="Ada")
+        with session.mutate() as changes:
+            changes.set("meal_plan", plan)
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")              # pydantic serializer warnings fail the test
+            store.flush()
+        store.close()
+
+        store = SessionStore(make_backend(), flush_interval=60)
+        self.addCleanup(store.close)
+        reloaded = store.get(7)
+        self.assertEqual(len(reloaded.meal_plan), 7)
+        self.assertEqual([dict(day) for day in reloaded.meal_plan], [dict(day) for day in plan])
+        self.assertIsInstance(reloaded.meal_plan[0]["kcal"], int)
+
+    def test_sqlite(self) -> None:
+        path = os.path.join(self.dir.name, "sessions.db")
+        self._round_trip(lambda: SQLiteBackend(path))
+
+    def test_append_log(self) -> None:
+        path = os.path.join(self.dir.name, "sessions.log")
+        self._round_trip(lambda: AppendLogBackend(path))
+
+
+if __name__ == "__main__":
+    unittest.main()